@@ -190,8 +190,7 @@ if __name__ == "__main__":
             if args.mean_quality_scores:
                 quals.append( f5.get_mean_qscore(readtype) )
             else:
-                ## TODO: make a direct way in f5class to get intquals (even if this terrible way)
-                quals += [int(e) for e in (' '.join(f5.get_quals_as_int(readtype).split('\n')[1:])).split()]
+                quals += f5.get_int_quals(readtype).tolist()
  
     ##  Plot
     qualhist(quals, filename=outfile, minrange=minrange, maxrange=maxrange, step=step, density=args.density, cumulative=args.cumulative, text_only=args.no_plot)
@@ -176,8 +176,7 @@ if __name__ == "__main__":
         if meets_all_criteria(f5, args.readtype, args.minlen, args.maxlen, args.minq, args.maxq):
             filesused += f5.abspath + '\n'
             readtype = define_read_type(f5, args.readtype)
-            ## TODO: make a direct way in f5class to get intquals (even if this terrible way)
-            quals = [int(e) for e in (' '.join(f5.get_quals_as_int(readtype).split('\n')[1:])).split()]
+            quals = f5.get_int_quals(readtype).tolist()
             update_qualpos(quals, qualpos, bin_width=args.bin_width, zscores=args.zscores, robust=args.robust_zscores)
 
     ##  Plot
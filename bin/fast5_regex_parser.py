@@ -10,6 +10,7 @@ import re
 import sys
 import string
 from cStringIO import StringIO
+from functools import partial
 
 
 #################################################
@@ -202,6 +203,10 @@ It will just prevent pipelines from breaking.
 However, not specifying this will still also result in the tarlite approach.
 Use --notarlite to turn it off.''')
 
+parser.add_argument('-p', '--threads', type=int, default=1, help='''Number of worker processes used to read fast5 files in parallel.
+Default: 1 (serial). Does not apply to --fasta/--fastq input.
+Output order is the same regardless of the number of processes.''')
+
 args = parser.parse_args()
 
 
@@ -275,14 +280,24 @@ if __name__ == "__main__":
     else:
         #regex_parseFast5(args.fast5, args.type, re_f, re_r, regex_function, outformat=args.outformat, count_gtract=args.numtracts, noreverse=args.noreverse)
         ## Iterate over fast5s
-        for f5 in Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite), filemode='r', downsample=args.nfiles, random=args.random, randomseed=args.randomseed):
-            if meets_all_criteria(f5, args.readtype, args.minlen, args.maxlen, args.minq, args.maxq):
-                filesused += f5.abspath + '\n'
-                readtype = define_read_type(f5, args.readtype)
-                seq = f5.get_seq(readtype)
-                #seq_name = f5.abspath
-                seq_name = f5.get_pore_info_name(readtype)
-                regex_function(seq, seq_name, fwd_re, rev_re, args.outformat, count_gtract=args.numtracts, noreverse=args.noreverse)
+        f5list = Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite), filemode='r', downsample=args.nfiles, random=args.random, randomseed=args.randomseed)
+        if args.threads > 1:
+            ## Workers read the sequences; regex matching and printing stay here to keep output in order
+            fxn = partial(get_regex_fast5_seq, readtype=args.readtype, minlen=args.minlen, maxlen=args.maxlen, minq=args.minq, maxq=args.maxq)
+            for record in f5list.imap(fxn, processes=args.threads):
+                if record is not None:
+                    abspath, seq_name, seq = record
+                    filesused += abspath + '\n'
+                    regex_function(seq, seq_name, fwd_re, rev_re, args.outformat, count_gtract=args.numtracts, noreverse=args.noreverse)
+        else:
+            for f5 in f5list:
+                if meets_all_criteria(f5, args.readtype, args.minlen, args.maxlen, args.minq, args.maxq):
+                    filesused += f5.abspath + '\n'
+                    readtype = define_read_type(f5, args.readtype)
+                    seq = f5.get_seq(readtype)
+                    #seq_name = f5.abspath
+                    seq_name = f5.get_pore_info_name(readtype)
+                    regex_function(seq, seq_name, fwd_re, rev_re, args.outformat, count_gtract=args.numtracts, noreverse=args.noreverse)
 
     ## Files used
     process_filesused(trigger=args.filename, filesused=filesused, outdir=args.outdir)
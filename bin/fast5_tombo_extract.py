@@ -5,6 +5,7 @@ import cStringIO as StringIO
 from Bio import SeqIO
 from fast5tools.f5class import *
 from fast5tools.f5ops import *
+from fast5tools.eventarchiveclass import *
 import argparse
 from glob import glob
 
@@ -109,6 +110,14 @@ parser.add_argument('--targzout', type=str, default=False,
                     Provide a tarchive name - this script insists on using .tar.gz at the end, and will add it if absent.
                     This will put the tarchive into the specified outdir whether or not the outdir is included as part of the given name here.''')
 
+parser.add_argument('-A', '--archive', type=str, default=False,
+                    help=''' Only relevant to --getevents and --getgenomicevents.
+                    Write the events of all reads into this one columnar event archive (HDF5) in outdir instead of per-read text files:
+                    one concatenated dataset per events column plus a per-read offset table.
+                    With --getgenomicevents, each read's mapped chrom, pos (mapped start) and strand are stored in the read table
+                    (event i of a read is at pos + i).
+                    Read it back (memory-mapped) with fast5tools.eventarchiveclass.EventArchive -- or give it to kmerParams.py with -a/--archive.''')
+
 args = parser.parse_args()
 
 
@@ -170,6 +179,17 @@ if __name__ == "__main__":
                 if not f5.tombo_exists():
                     print "No_Tombo_traces_found...\t" + f5.filename
 ##    elif f5listlen > 1:
+    elif (args.getevents or args.getgenomicevents) and args.archive and not args.header:
+        with EventArchiveWriter(args.outdir + args.archive) as archive:
+            for f5 in f5list:
+                if f5.tombo_events_exist():
+                    if args.getevents:
+                        archive.add_read(f5.filebasename, f5.get_tombo_events())
+                    else:
+                        info = {'chrom':f5.get_tombo_alignment_attribute('mapped_chrom'),
+                                'pos':f5.get_tombo_alignment_attribute('mapped_start'),
+                                'strand':f5.get_tombo_alignment_attribute('mapped_strand')}
+                        archive.add_read(f5.filebasename, f5.get_tombo_events(), info)
     elif (args.getevents or args.getgenomicevents): #getevents or getgenomicevents
         ## Only matters when extracting events
         for f5 in f5list:
@@ -0,0 +1,76 @@
+#!/usr/bin/env python2.7
+
+import os, sys
+import argparse
+from fast5tools.f5class import *
+from fast5tools.f5ops import *
+
+parser = argparse.ArgumentParser(description = """
+
+Given path(s) to fast5 file(s) and/or directories of fast5s,
+add simulated raw signal to files that have events but no raw signal (e.g. older, pre-raw MinION files),
+so tools that need raw signal (e.g. Tombo) can use them.
+Each event contributes event-length values drawn from a normal distribution with the event's mean and stdv.
+
+Files are modified in place.
+Files that are skipped (already have raw signal, no events, corrupt, ...) are reported on stderr with the reason.
+
+John Urban (2015, 2016, 2017, 2018)
+
+    """, formatter_class = argparse.RawTextHelpFormatter)
+
+
+parser.add_argument('fast5', metavar='fast5', nargs='+',
+                   type= str,
+                   help='''Paths to as many fast5 files and/or directories filled with fast5 files as you want.
+Assumes all fast5 files have '.fast5' extension.
+Fast5s in tarballs are not supported (they would be modified in temporary copies).''')
+
+parser.add_argument('-r', '--readtype', default="template",
+                   type= str,
+                   help='''Strand to simulate signal for: template or complement. Default: template.''')
+
+parser.add_argument('--dtype', type=str, default='float16',
+                   help='''Data type of simulated signal: float16, float64 or int16. Default: float16.''')
+
+parser.add_argument('--basecalled_events', action='store_true', default=False,
+                   help='''Simulate from basecalled events instead of input events.''')
+
+parser.add_argument('--add_flanking_signal', action='store_true', default=False,
+                   help='''Add signal from input events flanking the strand.''')
+
+parser.add_argument('--hairpin_flank', type=int, default=5,
+                   help='''Number of input events around the hairpin to add with --add_flanking_signal. Default: 5.''')
+
+parser.add_argument('--force', action='store_true', default=False,
+                   help='''Overwrite raw signal that was simulated earlier (real raw signal is never overwritten).''')
+
+parser.add_argument('-S', '--seed', type=int, default=None,
+                   help='''Seed for reproducible signal (the same whatever the number of threads).''')
+
+parser.add_argument('--chunksize', type=int, default=65536,
+                   help='''Signal is stored gzip-compressed in chunks of this many values. Default: 65536.''')
+
+parser.add_argument('-p', '--threads', type=int, default=1,
+                   help='''Number of worker processes. Default: 1.''')
+
+args = parser.parse_args()
+
+
+#################################################
+#### EXECUTE @@@@@@@@@@@@
+#################################################
+
+if __name__ == "__main__":
+    f5list = Fast5List(args.fast5, filemode='r+', expand_multi_read=False)
+    nadded = 0
+    nskipped = 0
+    for abspath, skipped in add_simulated_raw_data(f5list, processes=args.threads, readtype=args.readtype, dtype=args.dtype, force=args.force,
+                                                   from_input_events=(not args.basecalled_events), add_flanking_signal=args.add_flanking_signal,
+                                                   hairpin_flank=args.hairpin_flank, seed=args.seed, chunksize=args.chunksize):
+        if skipped is None:
+            nadded += 1
+        else:
+            nskipped += 1
+            sys.stderr.write("Skipped " + abspath + ": " + skipped + "\n")
+    sys.stderr.write("Added simulated raw signal to " + str(nadded) + " files. Skipped " + str(nskipped) + ".\n")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python2.7
+
+import os, sys
+from fast5tools.f5class import *
+from fast5tools.f5catalogclass import *
+import argparse
+
+#################################################
+## Argument Parser
+#################################################
+parser = argparse.ArgumentParser(description = """
+
+Given path(s) to fast5 file(s) and/or directories of fast5s (and/or FOFNs, tarballs),
+build or refresh a catalog (SQLite file) of per-read attributes:
+    sequence length and mean qscore for template, complement, 2d,
+    molecule/MoleQual read type, channel, read number, run_id.
+
+Entries are keyed by absolute path plus file mtime and size.
+Tar members are keyed by absolute tarball path plus member name.
+Re-running on the same catalog only opens files that are new or have changed.
+
+Scripts that accept --catalog (e.g. fast5tofastx.py) can then skip reads
+that fail length/quality filters without opening the fast5 files.
+
+    """, formatter_class = argparse.RawTextHelpFormatter)
+
+
+parser.add_argument('fast5', metavar='fast5', nargs='+',
+                   type= str,
+                   help='''Paths to as many fast5 files and/or directories filled with fast5 files as you want.
+Assumes all fast5 files have '.fast5' extension.
+If inside dir of dirs with .fast5 files, then can just do "*" to get all files from all dirs.''')
+
+parser.add_argument('--catalog', type=str, required=True,
+                    help='''Path to catalog file. Created if it does not exist, otherwise refreshed.''')
+
+parser.add_argument('-p', '--threads', type=int, default=1,
+                    help='''Number of worker processes used to read fast5 files in parallel. Default: 1 (serial).''')
+
+args = parser.parse_args()
+
+
+#################################################
+#### EXECUTE @@@@@@@@@@@@
+#################################################
+
+if __name__ == "__main__":
+    catalog = Fast5Catalog(args.catalog)
+    nfound, nscanned = catalog.refresh(args.fast5, processes=args.threads)
+    catalog.close()
+    sys.stderr.write("fast5 files found: %d\tnew or changed (scanned): %d\n" % (nfound, nscanned))
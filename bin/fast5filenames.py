@@ -33,6 +33,7 @@ args = parser.parse_args()
 
 
 if __name__ == "__main__":
-    for f in Fast5List(args.fast5, tar_filenames_only=True):
+    ## only names are needed: lazy Fast5s are never opened
+    for f in Fast5List(args.fast5, tar_filenames_only=True, lazy_fast5=True):
         print f
 
@@ -166,7 +166,7 @@ if __name__ == "__main__":
         outname = '.'.join([e for e in outname.split('.') if e])
         x = []
         y = []
-        raw = f5.get_raw_signal()
+        raw = f5.get_raw_signal_dataset() ## sliced below -- only the plotted part is read
         nraw = range(f5.get_raw_duration())
         if args.segments:
             events = f5.get_events('input')
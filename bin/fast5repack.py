@@ -0,0 +1,81 @@
+#!/usr/bin/env python2.7
+
+import os, sys
+from fast5tools.f5class import *
+from fast5tools.f5multiops import *
+import argparse
+
+#################################################
+## Argument Parser
+#################################################
+parser = argparse.ArgumentParser(description = """
+
+Given path(s) to single-read fast5 file(s) and/or directories of fast5s (and/or FOFNs),
+pack them into multi-read fast5 files with up to --reads-per-file reads each.
+All groups and attributes are kept:
+    /UniqueGlobalKey/X      -> /read_<read_id>/X
+    /Raw/Reads/Read_N       -> /read_<read_id>/Raw
+    /Analyses, /Sequences   -> /read_<read_id>/Analyses, /read_<read_id>/Sequences
+The original file name and root attributes are stored on the read group.
+
+With --split, does the inverse: each read of the given multi-read file(s)
+is written out as its own single-read fast5 (named after the file it was packed from, if known).
+
+Reading a few multi-read files is much faster than opening thousands of single-read files.
+All fast5tools scripts read multi-read files transparently.
+
+Tarballs are not expanded: extract them first.
+
+    """, formatter_class = argparse.RawTextHelpFormatter)
+
+
+parser.add_argument('fast5', metavar='fast5', nargs='+',
+                   type= str,
+                   help='''Paths to as many fast5 files and/or directories filled with fast5 files as you want.
+Assumes all fast5 files have '.fast5' extension.
+If inside dir of dirs with .fast5 files, then can just do "*" to get all files from all dirs.''')
+
+parser.add_argument('-o', '--outdir', type=str, required=True,
+                    help='''Directory to write fast5 files to. Created if it does not exist.''')
+
+parser.add_argument('-s', '--split', action='store_true', default=False,
+                    help='''Split multi-read files into single-read files instead of packing.''')
+
+parser.add_argument('-n', '--reads-per-file', type=int, default=4000,
+                    help='''Maximum number of reads per multi-read file. Default: 4000.''')
+
+parser.add_argument('--prefix', type=str, default='multi',
+                    help='''Multi-read files are named <prefix>_<i>.fast5. Default: multi.''')
+
+parser.add_argument('-c', '--compression', type=str, default='none', choices=['none', 'gzip', 'lzf'],
+                    help='''Re-write datasets chunked and compressed with gzip or lzf.
+Default: none -- datasets are copied as they are (fastest).''')
+
+parser.add_argument('-l', '--level', type=int, default=1,
+                    help='''gzip compression level (0-9). Default: 1.''')
+
+parser.add_argument('-p', '--threads', type=int, default=1,
+                    help='''Number of worker processes -- each writes (or splits) one file at a time. Default: 1 (serial).''')
+
+args = parser.parse_args()
+
+
+#################################################
+#### EXECUTE @@@@@@@@@@@@
+#################################################
+
+if __name__ == "__main__":
+    if not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    compression = None if args.compression == 'none' else args.compression
+    compression_opts = args.level if compression == 'gzip' else None
+    if args.split:
+        results = split_to_single_read(args.fast5, args.outdir, processes=args.threads, compression=compression, compression_opts=compression_opts)
+    else:
+        results = repack_to_multi_read(args.fast5, args.outdir, prefix=args.prefix, reads_per_file=args.reads_per_file, processes=args.threads, compression=compression, compression_opts=compression_opts)
+    nfiles = 0
+    nreads = 0
+    for filename, n in results:
+        nfiles += 1
+        nreads += n
+    sys.stderr.write("files: %d\treads: %d\n" % (nfiles, nreads))
@@ -7,6 +7,7 @@ from fast5tools.f5class import *
 from fast5tools.f5ops import *
 import argparse
 from glob import glob
+from functools import partial
 
 ## JOHN URBAN (2015,2016)
 #################################################
@@ -104,6 +105,10 @@ Use --notarlite to turn it off.''')
 parser.add_argument('--verbose', type=str, default=False,
                     help='''Spit out information to progress file or stderr. Specify filename or 'stderr'. ''')
 
+parser.add_argument('-p', '--threads', type=int, default=1,
+                    help='''Number of worker processes used to read fast5 files in parallel. Default: 1 (serial).
+Output order is the same regardless of the number of processes.''')
+
 
 args = parser.parse_args()
 
@@ -143,6 +148,16 @@ def get_fast5_stats(f5cmds, f5, delim="\t"):
 def get_error_fast5_stats(f5, delim="\t"):
     return (delim).join([ str(f5fxn[f5cmd](f5)) for f5cmd in [19,11,20] ])
 
+def get_fast5_stats_record(f5, f5cmds, delim="\t"):
+    ## Per-file work unit for Fast5List.imap -- returns (filename, stats line or None, error line or None)
+    if f5.is_not_corrupt() and f5.is_nonempty():
+        if f5.has_reads():
+            return f5.filename, get_fast5_stats(f5cmds, f5, delim), None
+        else:
+            return f5.filename, None, get_error_fast5_stats(f5, delim) + "\n"
+    else:
+        return f5.filename, None, f5fxn[19](f5) + "\t" + str(-1) + "\tCould-not-open,maybe-corrupt-or-empty.\n"
+
 #################################################
 #### EXECUTE @@@@@@@@@@@@
 #################################################
@@ -155,16 +170,14 @@ if __name__ == "__main__":
             err = sys.stderr
 	else:
             err = open(args.verbose,'w')
-    for f5 in Fast5List(args.fast5, keep_tar_footprint_small=(not args.tarlite)):
-	if args.verbose:
-	    err.write(f5.filename + "\n")
-        if f5.is_not_corrupt() and f5.is_nonempty():
-	    if f5.has_reads():
-		print get_fast5_stats(f5cmds, f5, args.delimiter)
-	    else:
-		errfile.write( get_error_fast5_stats(f5, args.delimiter) + "\n" )
-	else:
-	    errfile.write( f5fxn[19](f5) + "\t" + str(-1) + "\tCould-not-open,maybe-corrupt-or-empty.\n" )
+    fxn = partial(get_fast5_stats_record, f5cmds=list(f5cmds), delim=args.delimiter)
+    for filename, stats, error in Fast5List(args.fast5, keep_tar_footprint_small=(not args.tarlite), lazy=True).imap(fxn, processes=args.threads):
+        if args.verbose:
+            err.write(filename + "\n")
+        if stats is not None:
+            print stats
+        else:
+            errfile.write( error )
 
 if args.errfile:
     errfile.close()
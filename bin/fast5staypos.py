@@ -132,17 +132,9 @@ if __name__ == "__main__":
 
 
     ## Iterate over fast5s
-    for f5 in  Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite), filemode='r', downsample=args.nfiles, random=args.random, randomseed=args.randomseed):
-        if meets_all_criteria(f5, args.readtype, args.minlen, args.maxlen, args.minq, args.maxq):
-            filesused += f5.abspath + '\n'
-            readtype = define_read_type(f5, args.readtype)
-            ## TODO: make a direct way in f5class to get intquals (even if this terrible way)
-            abspath = f5.abspath
-            name = f5.get_pore_info_name(readtype)
-            #pos = f5.map_stay_events_to_read(readtype)
-            pos = f5.map_stay_event_coverage_in_read(readtype)
-            for e in sorted(pos.keys()):
-                print '\t'.join([str(e) for e in [name, e, e+1, pos[e], abspath]])
+    f5list = Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite), filemode='r', downsample=args.nfiles, random=args.random, randomseed=args.randomseed)
+    for abspath in write_stay_event_coverage_bed(sys.stdout, f5list, args.readtype, args.minlen, args.maxlen, args.minq, args.maxq):
+        filesused += abspath + '\n'
 
 
 
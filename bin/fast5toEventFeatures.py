@@ -0,0 +1,79 @@
+#!/usr/bin/env python2.7
+
+import os, sys
+import argparse
+from fast5tools.f5class import *
+from fast5tools.eventfeatureclass import *
+
+parser = argparse.ArgumentParser(description = """
+
+Given path(s) to fast5 file(s) and/or directories of fast5s,
+extract per-event features (e.g. for training models) from all reads into a few large shard files.
+
+Each read's Events table is read once and the requested fields are taken from it.
+With --raw_stats, the mean, stdv, start and length of each event's raw signal segment are added
+(raw_mean, raw_stdv, raw_start, raw_length -- needs events in raw sample indices).
+
+Shards hold about --shard_rows events each (reads are not split across shards) and are named <prefix>.<n>.npz
+(or <prefix>.<n>.events.h5 with --format archive). Each has one fixed-width array per feature,
+plus read_name and read_offset: the events of read i are rows read_offset[i]:read_offset[i+1].
+Load them with eventfeatureclass.load_event_feature_shard().
+
+Files that are skipped (no events of the read type, corrupt, ...) are reported on stderr.
+
+John Urban (2015, 2016, 2017, 2018)
+
+    """, formatter_class = argparse.RawTextHelpFormatter)
+
+
+parser.add_argument('fast5', metavar='fast5', nargs='+',
+                   type= str,
+                   help='''Paths to as many fast5 files and/or directories filled with fast5 files as you want.
+Assumes all fast5 files have '.fast5' extension.
+If inside dir of dirs with .fast5 files, then can just do "*" to get all files from all dirs.''')
+
+parser.add_argument('-r', '--readtype', default="template",
+                   type= str,
+                   help='''Events to use: template, complement or input. Default: template.''')
+
+parser.add_argument('-f', '--fields', type=str, default=(",").join(EVENT_FEATURES),
+                   help='''Comma-separated events fields to keep (those a file does not have are left out).
+Default: ''' + (",").join(EVENT_FEATURES))
+
+parser.add_argument('--raw_stats', action='store_true', default=False,
+                   help='''Add stats of the raw signal segment of each event.''')
+
+parser.add_argument('--median_normalized', action='store_true', default=False,
+                   help='''With --raw_stats, use median-normalized raw signal.''')
+
+parser.add_argument('-o', '--outprefix', type=str, default="event_features",
+                   help='''Prefix (may include a directory) for shard files. Default: event_features''')
+
+parser.add_argument('-n', '--shard_rows', type=int, default=1000000,
+                   help='''Approximate number of events per shard. Default: 1000000.''')
+
+parser.add_argument('--format', type=str, default='npz',
+                   help='''Shard format: npz or archive (memory-mappable HDF5 event archive). Default: npz.''')
+
+parser.add_argument('-p', '--threads', type=int, default=1,
+                   help='''Number of worker processes. Default: 1.''')
+
+parser.add_argument('--notarlite', action='store_true', default=False, help=''' The default methof (called tarlite) extracts 1 file from a given tarchive at a time, processes, and deletes it.
+This options says to turn tarlite off resulting in extracting entire tarchive before proceeding (and finally deleting).''')
+
+args = parser.parse_args()
+
+
+#################################################
+#### EXECUTE @@@@@@@@@@@@
+#################################################
+
+if __name__ == "__main__":
+    assert args.format in SHARD_FORMATS
+    f5list = Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite))
+    shards, skipped = extract_event_features(f5list, args.outprefix, args.readtype, args.fields.split(","), args.raw_stats, args.median_normalized,
+                                             shard_rows=args.shard_rows, format=args.format, processes=args.threads)
+    for name, reason in skipped:
+        sys.stderr.write("Skipped " + name + ": " + reason + "\n")
+    for shard in shards:
+        print shard
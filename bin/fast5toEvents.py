@@ -1,10 +1,12 @@
 #!/usr/bin/env python
 
 import h5py, os, sys
+import numpy as np
 import cStringIO as StringIO
 from Bio import SeqIO
 from fast5tools.f5class import *
 from fast5tools.f5ops import *
+from fast5tools.eventarchiveclass import *
 import argparse
 from glob import glob
 
@@ -83,6 +85,18 @@ If multiple fast5s are specified, they will be saved to files in the working dir
 This flag allows you to specify a different output directory.
 Filenames will be the the name of the fast5 file with .events.txt appended.''')
 
+parser.add_argument('-B', '--binary', action='store_true', default=False,
+                    help = '''Save each events table as a numpy structured array (.npy) instead of text -- no number formatting, so much faster on long reads.
+Load with numpy.load(). Always written to files (in --outdir), even for a single fast5.
+Filenames will be the the name of the fast5 file with .<readtype>.events.npy appended.''')
+
+parser.add_argument('-A', '--archive', type=str, default=False,
+                    help = '''Write the events of all reads into this one columnar event archive (HDF5) instead of per-read files:
+concatenated mean, stdv, start, length and base columns plus a per-read offset table.
+base is the central base of each event's model_state (N for input events, which have none);
+stdv is taken from stdv/stddev, or as the square root of variance for non-basecalled input events.
+Read it back (memory-mapped) with fast5tools.eventarchiveclass.EventArchive -- or give it to kmerParams.py with -a/--archive.''')
+
 parser.add_argument('--notarlite', action='store_true', default=False, help=''' The default methof (called tarlite) extracts 1 file from a given tarchive at a time, processes, and deletes it.
 This options says to turn tarlite off resulting in extracting entire tarchive before proceeding (and finally deleting).
 It is possible that --notarlite is faster, but at the expense of exceeding file number limits or disk storage quotas.
@@ -130,7 +144,16 @@ if args.outdir:
 
 if __name__ == "__main__":
     f5list = Fast5List(args.fast5, keep_tar_footprint_small=(not args.tarlite))
-    if len(f5list) == 1: ## if only one f5, print to stdout
+    if args.archive and not args.header:
+        with EventArchiveWriter(args.outdir + args.archive) as archive:
+            for f5 in f5list:
+                if f5.has_read(args.readtype):
+                    archive.add_read(f5.filebasename, get_kmer_event_records(f5.get_events(args.readtype)))
+    elif args.binary and not args.header:
+        for f5 in f5list:
+            if f5.has_read(args.readtype):
+                np.save(args.outdir + f5.filebasename + "." + args.readtype + ".events.npy", f5.get_events(args.readtype))
+    elif len(f5list) == 1: ## if only one f5, print to stdout
         for f5 in f5list:
             if f5.has_read(args.readtype):
                 if args.header:
@@ -141,13 +164,14 @@ if __name__ == "__main__":
                 else:
                     if args.withheader:
                         print f5.get_events_header_string(args.readtype)
-                    print f5.get_events_string(args.readtype)
+                    f5.write_events(sys.stdout, args.readtype)
+                    sys.stdout.write("\n")
     elif len(f5list) > 1: ## if more than one, print each f5 to own text file
         for f5 in f5list:
             if f5.has_read(args.readtype):
                 if args.header:
                     if args.headertable:
-                        print ("\t").join([f5.filename, f5.get_events_header(args.readtype)])
+                        print ("\t").join([f5.filename, (",").join( e for e in f5.get_events_header(args.readtype))])
                     else:
                         out = open(args.outdir + f5.filebasename + "." + args.readtype + ".eventsheader.txt", 'w')
                         out.write(f5.get_events_header_string(args.readtype))
@@ -155,10 +179,8 @@ if __name__ == "__main__":
                 else:
                     out = open(args.outdir + f5.filebasename + "." + args.readtype + ".events.txt", 'w')
                     if args.withheader:
-                        out.write(f5.get_events_header_string(args.readtype))
-                    out.write(f5.get_events_string(args.readtype))
+                        out.write(f5.get_events_header_string(args.readtype) + "\n")
+                    f5.write_events(out, args.readtype)
                     out.close()
 
         ## TODO TEST
-
-
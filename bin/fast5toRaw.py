@@ -1,6 +1,7 @@
 #!/usr/bin/env python2.7
 
 import h5py, os, sys
+import numpy as np
 import cStringIO as StringIO
 from Bio import SeqIO
 from fast5tools.f5class import *
@@ -65,6 +66,13 @@ If multiple fast5s are specified, they will be saved to files in the working dir
 This flag allows you to specify a different output directory.
 Filenames will be the the name of the fast5 file with .rawsignal.txt appended.''')
 
+parser.add_argument('-B', '--binary', action='store_true', default=False,
+                    help = '''Save numpy arrays instead of text -- no number formatting, so much faster on long reads.
+Load with numpy.load(). Always written to files (in --outdir), even for a single fast5:
+    default:            <name>.rawsignal.npy  -- the raw signal.
+    -S/--segmented:     <name>.rawsignal.npz  -- raw (signal) and offsets (event i is raw[offsets[i]:offsets[i+1]]; 5' and 3' clips are the first and last segments).
+    -x/--eventstats:    <name>.raweventstats.npz -- name, mean, stdv, start, length columns.''')
+
 parser.add_argument('--notarlite', action='store_true', default=False, help=''' The default methof (called tarlite) extracts 1 file from a given tarchive at a time, processes, and deletes it.
 This options says to turn tarlite off resulting in extracting entire tarchive before proceeding (and finally deleting).
 It is possible that --notarlite is faster, but at the expense of exceeding file number limits or disk storage quotas.
@@ -122,36 +130,44 @@ clips = not args.noclips
 if __name__ == "__main__":
     f5list = Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite))
 
-    if args.segmented:
+    if args.binary:
+        for f5 in f5list:
+            prefix = args.outdir + f5.filebasename + ".template."
+            if args.segmented:
+                raw, offsets = f5.get_segmented_raw_signal_arrays(readtype='template', median_normalized=args.mediannorm, includeclips=True)
+                np.savez(prefix + "rawsignal.npz", raw=raw, offsets=offsets)
+            elif args.eventstats:
+                names, mean, stdv, start, length = f5.get_segmented_raw_signal_stats_columns(includeclips=clips, readtype='template', median_normalized=args.mediannorm)
+                np.savez(prefix + "raweventstats.npz", name=np.array(names, dtype=str), mean=mean, stdv=stdv, start=start, length=length)
+            else:
+                np.save(prefix + "rawsignal.npy", f5.get_raw_signal(median_normalized=args.mediannorm))
+    elif args.segmented:
         if len(f5list) == 1: ## if only one f5, print to stdout
             for f5 in f5list:
-                print f5.get_segmented_raw_signal_string(includeclips=clips, datadelim=delimiter, eventdelim=eventdelim, readtype='template', median_normalized=args.mediannorm)
+                f5.write_segmented_raw_signal(sys.stdout, includeclips=clips, datadelim=delimiter, eventdelim=eventdelim, readtype='template', median_normalized=args.mediannorm)
+                sys.stdout.write("\n")
         elif len(f5list) > 1: ## if more than one, print each f5 to own text file
             for f5 in f5list:
-                out = open(args.outdir + f5.filebasename + "." + args.readtype + ".rawsignal.txt", 'w')
-                out.write(f5.get_segmented_raw_signal_string(includeclips=clips, datadelim=datadelim, eventdelim=delimiter, readtype='template', median_normalized=args.mediannorm))
+                out = open(args.outdir + f5.filebasename + ".template.rawsignal.txt", 'w')
+                f5.write_segmented_raw_signal(out, includeclips=clips, datadelim=delimiter, eventdelim=eventdelim, readtype='template', median_normalized=args.mediannorm)
                 out.close()
     elif args.eventstats:
         if len(f5list) == 1: ## if only one f5, print to stdout
             for f5 in f5list:
-                print f5.get_segmented_raw_signal_stats_string(includeclips=clips, readtype='template', median_normalized=args.mediannorm)
+                f5.write_segmented_raw_signal_stats(sys.stdout, includeclips=clips, readtype='template', median_normalized=args.mediannorm)
+                sys.stdout.write("\n")
         elif len(f5list) > 1: ## if more than one, print each f5 to own text file
             for f5 in f5list:
-                out = open(args.outdir + f5.filebasename + "." + args.readtype + ".rawsignal.txt", 'w')
-                out.write('')
+                out = open(args.outdir + f5.filebasename + ".template.raweventstats.txt", 'w')
+                f5.write_segmented_raw_signal_stats(out, includeclips=clips, readtype='template', median_normalized=args.mediannorm)
                 out.close()
     else:
         if len(f5list) == 1: ## if only one f5, print to stdout
             for f5 in f5list:
-                print f5.get_raw_signal_string(delimiter, median_normalized=args.mediannorm)
+                f5.write_raw_signal(sys.stdout, delimiter, median_normalized=args.mediannorm)
+                sys.stdout.write("\n")
         elif len(f5list) > 1: ## if more than one, print each f5 to own text file
             for f5 in f5list:
-                out = open(args.outdir + f5.filebasename + "." + args.readtype + ".rawsignal.txt", 'w')
-                out.write(f5.get_raw_signal_string(delimiter, median_normalized=args.mediannorm))
+                out = open(args.outdir + f5.filebasename + ".template.rawsignal.txt", 'w')
+                f5.write_raw_signal(out, delimiter, median_normalized=args.mediannorm)
                 out.close()
-                
-
-
-
-
-
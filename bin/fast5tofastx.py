@@ -1,12 +1,13 @@
 #!/usr/bin/env python2.7
 
 import h5py, os, sys
-import cStringIO as StringIO
-from Bio import SeqIO
 from fast5tools.f5class import *
 from fast5tools.f5ops import *
+from fast5tools.f5catalogclass import *
+from fast5tools.fastxwriterclass import *
 import argparse
 from glob import glob
+from functools import partial
 
 
 #################################################
@@ -47,7 +48,7 @@ It differs only in choosing between template and complement when a 2D is not pre
 Instead of choosing the longer one, it chooses the one with a higher quality mean quality score.''')
 
 parser.add_argument('-o', '--outtype', type=str, default="fasta",
-                    help = '''Choices: fasta, fastq, qual, intqual, details, falcon, oldfalcon, newfalcon, fasta_readstatsname, fastq_readstatsname, qual_readstatsname.
+                    help = '''Choices: fasta, fastq, qual, intqual, details, falcon, oldfalcon, newfalcon, fasta_readstatsname, fastq_readstatsname, qual_readstatsname, bam.
 Additional choices:
 Add _with_abspath to fasta/fastq/qual options (and readstatname versions) to add absolute f5 file path to read name.
 Add _with_filename to fasta/fastq/qual options (and readstatname versions) to add only the basename of each f5 file (excluding fast5 extension) to read name.
@@ -55,6 +56,9 @@ If only want abs path in name, add _only_abspath to fasta/fastq/qual options (an
 If only want basename of file in read name, add _only_filename to fasta/fastq/qualoptions (and readstatname versions).
 
 Default: fasta.
+bam writes unaligned BAM (use with --outfile): pore_info read names, sequences, qualities,
+and --comments as tags -- one tag per field of the naming schemes, each with a fixed type (e.g. ch:i channel, qs:f mean qscore, rt:Z read type, ai:Z asic id),
+F5:Z with --samflag (as an aligner copying fastq comments would give), CO:Z for other text.
 If details, sequence not reported, but name, seqlen, and meanq are.
 falcon/oldfalcon/newfalcon output fasta files that are compatible with FALCON assembler.
 falcon and oldfalcon put out the same thing and might be safest choice as it should work with old and new FALCON versions.
@@ -112,6 +116,38 @@ parser.add_argument('-S', '--samflag', action='store_true', default=False, help=
 
 ''')
 
+parser.add_argument('--catalog', type=str, default=False, help='''Path to a catalog made with fast5catalog.py.
+Reads that the catalog says fail --minlen/--maxlen/--minq/--maxq are skipped without opening their fast5 files.
+Files missing from the catalog (or changed since it was made) are opened and filtered as usual.
+''')
+
+parser.add_argument('-p', '--threads', type=int, default=1, help='''Number of worker processes used to read fast5 files in parallel.
+Default: 1 (serial).
+Output order is the same as with 1 process (unless --unordered).
+Note: with falcon outtypes and more than 1 process, well numbers are random rather than sequential.
+''')
+
+parser.add_argument('--unordered', action='store_true', default=False, help='''With --threads > 1, write reads as workers finish them rather than in input order (faster).''')
+
+parser.add_argument('--chunksize', type=int, default=16, help='''With --threads > 1, number of fast5 files handed to a worker at a time. Default: 16.''')
+
+parser.add_argument('--outfile', type=str, default='-', help='''Write reads to this file instead of stdout.
+With --shards or --shard_by, this is the prefix of the output files: <outfile>.<shard>.<outtype>[.gz]
+''')
+
+parser.add_argument('--shards', type=int, default=None, help='''Split output into this many files (reads dealt round-robin). Requires --outfile.''')
+
+parser.add_argument('--shard_by', type=str, default=None, choices=sorted(SHARD_KEY_FXNS.keys()), help='''Split output into one file per channel or per run_id. Requires --outfile.
+At most --max_open_shards files are open at once (e.g. ~3000 channels on PromethION would pass the usual limit of 1024 open files):
+beyond that, the least recently written file is flushed and closed, and reopened for appending when it gets reads again.''')
+parser.add_argument('--max_open_shards', type=int, default=256, help='''Most shard files open at once (each also holds a 1 MB buffer). Default: 256.''')
+
+parser.add_argument('--gzip', action='store_true', default=False, help='''gzip-compress output.''')
+
+parser.add_argument('--bgzip', action='store_true', default=False, help='''Compress output as BGZF (block gzip: readable by gzip, and indexable by samtools faidx for fasta).''')
+
+parser.add_argument('--compression_threads', type=int, default=1, help='''Number of threads compressing output with --gzip/--bgzip (and for bam). Default: 1.''')
+
 
 args = parser.parse_args()
 
@@ -124,6 +160,7 @@ legalouts = ("fasta", "fastq", "qual", "intqual", "details", "falcon", "oldfalco
 legalouts += ("fasta_readstatsname", "fasta_readstatsname_with_abspath", "fasta_readstatsname_with_filename")
 legalouts += ("fastq_readstatsname", "fastq_readstatsname_with_abspath", "fastq_readstatsname_with_filename")
 legalouts += ("qual_readstatsname", "qual_readstatsname_with_abspath", "qual_readstatsname_with_filename")
+legalouts += ("bam",)
 assert args.outtype in legalouts
 
 
@@ -145,6 +182,14 @@ assert args.outtype in legalouts
 ##    args.readtype = "MoleQual"
 args.readtype = assert_readtype(args.readtype, legaloptions="tc2maM")
 
+assert not (args.gzip and args.bgzip)
+if args.outtype == "bam":
+    assert not args.gzip, "bam output is always BGZF-compressed"
+    args.bgzip = True
+assert not (args.shards and args.shard_by)
+if args.shards or args.shard_by:
+    assert args.outfile != '-', "--shards and --shard_by need --outfile"
+
 #################################################
 ### uses output functions from f5ops.py
 ### fasta(), fastq(), qual(), intqual()
@@ -280,14 +325,35 @@ if __name__ == "__main__":
     if args.samflag:
         samflag = "F5:Z:"
 
-    falcon_i = 0
-    for f5 in Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite)):
-        if f5.is_not_corrupt() and f5.is_nonempty:
-            ## counter in case using falcon options
-            falcon_i += 1
-            ## Process args.comments
-            read = getread(f5, args.minlen, args.maxlen, args.minq, args.maxq, output, comments=args.comments, falcon_i=falcon_i, samflag=samflag)
+    f5list = Fast5List(args.fast5, keep_tar_footprint_small=(not args.notarlite), lazy=True)
+    if args.catalog:
+        catalog = Fast5Catalog(args.catalog)
+        catalog.filter_fast5list(f5list, args.readtype, args.minlen, args.maxlen, args.minq, args.maxq)
+        catalog.close()
+
+    compression = 'gzip' if args.gzip else ('bgzip' if args.bgzip else None)
+    writerclass = BamWriter if args.outtype == "bam" else FastxWriter
+    if args.shards or args.shard_by:
+        suffix = "." + args.outtype.split("_")[0] + (".gz" if compression and args.outtype != "bam" else "")
+        writer = ShardedFastxWriter(args.outfile, suffix, nshards=args.shards, compression=compression, threads=args.compression_threads, writer=writerclass, maxopen=args.max_open_shards)
+    else:
+        writer = writerclass(args.outfile, compression=compression, threads=args.compression_threads)
+
+    if args.threads > 1:
+        fxn = partial(fast5tofastx_keyed_read, shard_by=args.shard_by, getread=getread, output=output, minlen=args.minlen, maxlen=args.maxlen, minq=args.minq, maxq=args.maxq, comments=args.comments, samflag=samflag)
+        for key, read in f5list.imap(fxn, processes=args.threads, ordered=(not args.unordered), chunksize=args.chunksize):
             if read:
-                print read
+                writer.write(read, key)
+    else:
+        falcon_i = 0
+        for f5 in f5list:
+            if f5.is_not_corrupt() and f5.is_nonempty:
+                ## counter in case using falcon options
+                falcon_i += 1
+                ## Process args.comments
+                read = getread(f5, args.minlen, args.maxlen, args.minq, args.maxq, output, comments=args.comments, falcon_i=falcon_i, samflag=samflag)
+                if read:
+                    writer.write(read, SHARD_KEY_FXNS[args.shard_by](f5) if args.shard_by else None)
+    writer.close()
 
 
@@ -172,6 +172,9 @@ It will just prevent pipelines from breaking.
 However, not specifying this will still also result in the tarlite approach.
 Use --notarlite to turn it off.''')
 
+parser.add_argument('-p', '--threads', type=int, default=1, help='''Number of worker processes used to read fast5 files in parallel.
+Default: 1 (serial). Does not apply to --fasta/--fastq input.''')
+
 args = parser.parse_args()
 
 
@@ -201,7 +204,8 @@ if __name__ == "__main__":
                                  minlen=args.minlen, \
                                  maxlen=args.maxlen, \
                                  minq=args.minq, \
-                                 maxq=args.maxq)
+                                 maxq=args.maxq, \
+                                 threads=args.threads)
 
 
     ## Write
@@ -232,7 +236,8 @@ if __name__ == "__main__":
                                  minlen=args.minlen, \
                                  maxlen=args.maxlen, \
                                  minq=args.minq, \
-                                 maxq=args.maxq)
+                                 maxq=args.maxq, \
+                                 threads=args.threads)
         ## Write
         writekmer(refdict, refoutfile)
         
@@ -2,6 +2,7 @@
 
 import os, sys, itertools
 from fast5tools.fileListClass import *
+from fast5tools.eventarchiveclass import *
 import argparse
 from collections import defaultdict
 import numpy as np
@@ -35,13 +36,19 @@ John Urban (2015, 2016, 2017, 2018)
     """, formatter_class = argparse.RawTextHelpFormatter)
 
 
-parser.add_argument('files', metavar='files', nargs='+',
+parser.add_argument('files', metavar='files', nargs='*',
                    type= str, 
                    help='''Paths to as many files and/or directories filled with files as you want.
 Assumes all fast5 files have '.txt' extension.
 If inside dir of dirs with .txt files, then can just do "*" to get all files from all dirs.
 IF file extension is anything other than .txt, change it with --extension/-e''')
 
+parser.add_argument('-a', '--archive', type=str, nargs='+', default=[],
+                    help='''Event archive(s) made by fast5_tombo_extract.py or fast5toEvents.py with -A/--archive.
+Each read in the archive is used as if it were its own events text file -- but without any parsing.
+Columns are found by name: mean (or norm_mean), stdv (or norm_stdev), start, length and base; an archive lacking one is an error.
+Can be used instead of, or together with, text event files.''')
+
 parser.add_argument('-e','--extension', type=str, default=".txt", help='''Provide the common file extension for target files.
 Default is .txt.
 Note that no other file type in target directory, fofn, etc should have this extension.
@@ -260,6 +267,53 @@ def get_genomic_events(flines, nlines):
     return mu, sd, start, n, b, chrom, pos, strand
 
 
+def get_archive_events(columns, nlines):
+    ## same arrays get_events() makes from the text columns -- columns are the archive's mean, stdv, start, length, base (get_kmer_event_column_names)
+    mu = np.asarray(columns[0], dtype=float)
+    sd = np.asarray(columns[1], dtype=float)
+    start = np.asarray(columns[2], dtype=float)
+    n = np.asarray(columns[3], dtype=float)
+    b = np.asarray(columns[4]).astype(str).astype('S1')
+    return mu, sd, start, n, b
+
+
+def get_archive_genomic_events(columns, info, nlines):
+    ## same arrays get_genomic_events() makes from text -- chrom/pos/strand come from the archive's read table
+    mu, sd, start, n, b = get_archive_events(columns, nlines)
+    chrom = np.zeros(shape=nlines, dtype=str)
+    chrom[:] = str(info['chrom'])
+    pos = float(info['pos']) + np.arange(nlines, dtype=float)
+    strand = np.zeros(shape=nlines, dtype=str)
+    strand[:] = str(info['strand'])
+    return mu, sd, start, n, b, chrom, pos, strand
+
+
+def iter_event_sources(files, archives, extension, keep_tar_footprint_small, k, genomic=False):
+    ''' Yields (name, nlines, events) for each events text file, then for each read of each event archive.
+        name is the file name without extension (or the read name); events is the tuple get_events()/get_genomic_events() returns,
+        or None when there are not more than k events.'''
+    if files:
+        for fh in FileList(files, extension=extension, keep_tar_footprint_small=keep_tar_footprint_small):
+            with open(fh, 'r') as f:
+                flines = f.readlines()
+            nlines = len(flines)
+            events = None
+            if nlines > k:
+                events = get_genomic_events(flines, nlines) if genomic else get_events(flines, nlines)
+            yield ('.').join(os.path.basename(fh).split('.')[:-1]), nlines, events
+    for archivename in archives:
+        archive = EventArchive(archivename)
+        colnames = get_kmer_event_column_names(archive.columns)
+        for i, name in enumerate(archive.read_names):
+            read = archive.get_read(i)
+            columns = [read[col] for col in colnames]
+            nlines = len(columns[0])
+            events = None
+            if nlines > k:
+                events = get_archive_genomic_events(columns, archive.get_read_info(i), nlines) if genomic else get_archive_events(columns, nlines)
+            yield name, nlines, events
+
+
 def get_kmer_dist(mu, sd, start, n, b, k, kmers, nlines, uniform=False, rewrite_events=False, rewrite_name=False):
     '''
     mu = list of event means
@@ -542,30 +596,26 @@ if __name__ == "__main__":
 
 
     ## FOR EACH EVENTS TXT FILE, READ IN AND PROCESS KMER INFO
-    filelist = FileList(args.files, extension=args.extension, keep_tar_footprint_small=(not args.notarlite))
-    for fh in filelist:
-        rewrite_name = args.outdir + ('.').join(os.path.basename(fh).split('.')[:-1]) + ".rewrite_as_" + weighting + '_' + str(k) + "mers.txt"
-        ## READ IN AND ADD TO SUMMARY
-        with open(fh, 'r') as f:
-            flines = f.readlines()
-        nlines = len(flines)
+    for name, nlines, events in iter_event_sources(args.files, args.archive, args.extension, (not args.notarlite), k, args.genomic_approach):
+        rewrite_name = args.outdir + name + ".rewrite_as_" + weighting + '_' + str(k) + "mers.txt"
+        ## ADD TO SUMMARY
         if nlines > k:
             # get_kmer_pos step also does event re-writing to file inside function
             if args.genomic_approach:
-                mu, sd, start, n, b, chrom, pos, strand = get_genomic_events(flines, nlines)
+                mu, sd, start, n, b, chrom, pos, strand = events
                 if args.uniform or args.weighted:
                     pass
                 elif args.kmer_pos is not False:
 ##                                                                    (mu, sd, start, n, b, k, kmers, chrom, pos, strand, nlines, kmer_pos=None, rewrite_events=False, rewrite_name=False):
                     kmers, kmerdetected = get_genomic_kmer_pos_dist(mu, sd, start, n, b, k, kmers, chrom, pos, strand, nlines, args.kmer_pos, args.rewrite, rewrite_name)
             else:
-                mu, sd, start, n, b = get_events(flines, nlines)
+                mu, sd, start, n, b = events
                 if args.uniform or args.weighted:
                     kmers, kmerdetected = get_kmer_dist(mu, sd, start, n, b, k, kmers, nlines, args.uniform, args.rewrite, rewrite_name)
                 elif args.kmer_pos is not False:
                     kmers, kmerdetected = get_kmer_pos_dist(mu, sd, start, n, b, k, kmers, nlines, args.kmer_pos, args.rewrite, rewrite_name)
             if args.targzout and args.rewrite:
-                arcname = ('.').join(os.path.basename(fh).split('.')[:-1]) + ".rewrite_as_" + weighting + '_' + str(k) + "mers.txt"
+                arcname = name + ".rewrite_as_" + weighting + '_' + str(k) + "mers.txt"
                 tarpit(tarchive, rewrite_name, arcname)
             for kmer, detected in kmerdetected.iteritems():
                 if detected:
@@ -0,0 +1,85 @@
+#!/usr/bin/env python2.7
+
+import os, sys, tempfile, shutil
+import argparse
+from fast5tools.f5class import *
+from fast5tools.samclass import *
+from fast5tools.samf5class import *
+
+parser = argparse.ArgumentParser(description = """
+
+Given a SAM file of reads extracted from fast5s (e.g. with fast5tofastx.py) and the fast5s themselves,
+report the reference position of every event (or raw signal segment) of every aligned read.
+
+Reads are found in the fast5s through a read index: a sorted file of read name -> fast5 path.
+It is made once (from the fast5 paths given) and can be re-used with --index.
+The SAM can be in any sort order and of any size: memory use does not grow with the number of reads.
+
+Output (tab-delimited), one line per event:
+chrom, 0-based reference position of the first base of the event's kmer, strand, read name, event index,
+then event mean, stdv, length -- or with --raw: raw segment mean, stdv, start and length in the raw signal.
+Events whose kmer start does not align to the reference (clipped, inserted) are left out unless --keep_unaligned.
+
+John Urban (2015, 2016, 2017, 2018)
+
+    """, formatter_class = argparse.RawTextHelpFormatter)
+
+
+parser.add_argument('--sam', '-s', type=str, required=True,
+                   help='''Input file in SAM format. Use - for stdin.''')
+
+parser.add_argument('fast5', metavar='fast5', nargs='*',
+                   type= str,
+                   help='''Paths to as many fast5 files and/or directories filled with fast5 files as you want.
+Used to make the read index -- not needed if --index points to an existing index.
+Fast5s inside tarballs cannot be indexed and are skipped (extract them first).''')
+
+parser.add_argument('-i', '--index', type=str, default=None,
+                   help='''Path to read index. When it exists, it is used as is; otherwise it is made from the fast5 paths and kept here.
+Default: a temporary index that is deleted at the end.''')
+
+parser.add_argument('-n', '--names', type=str, default='pore_info',
+                   help='''How reads were named in the fastx that was aligned.
+Choices: ''' + (", ").join(sorted(READ_NAME_FXNS.keys())) + '''
+Default: pore_info (fast5tofastx.py default).''')
+
+parser.add_argument('-r', '--readtype', default="template",
+                   type= str,
+                   help='''Read type that was aligned: template or complement.
+Default: template.''')
+
+parser.add_argument('--raw', action='store_true', default=False,
+                   help='''Report raw signal segment stats instead of event columns (needs events in raw sample indices).''')
+
+parser.add_argument('--median_normalized', action='store_true', default=False,
+                   help='''With --raw, use median-normalized raw signal.''')
+
+parser.add_argument('--keep_unaligned', action='store_true', default=False,
+                   help='''Also report events whose reference position is -1.''')
+
+args = parser.parse_args()
+
+
+#################################################
+#### EXECUTE @@@@@@@@@@@@
+#################################################
+
+if __name__ == "__main__":
+    index_file = args.index
+    if index_file is None:
+        index_file = os.path.join(tempfile.mkdtemp(), "reads.index")
+    if not os.path.exists(index_file):
+        build_fast5_read_index(Fast5List(args.fast5), index_file, args.readtype, args.names)
+
+    index = Fast5ReadIndex(index_file)
+    join = SamFast5Join(Sam(args.sam), index)
+    if args.raw:
+        write_raw_segments_to_reference(sys.stdout, join, args.readtype, args.median_normalized, args.keep_unaligned)
+    else:
+        write_events_to_reference(sys.stdout, join, args.readtype, keep_unaligned=args.keep_unaligned)
+    index.close()
+
+    if args.index is None:
+        shutil.rmtree(os.path.dirname(index_file))
+    if join.missing > 0:
+        sys.stderr.write(str(join.missing) + " aligned reads were not found in the fast5s.\n")
@@ -0,0 +1,78 @@
+## Unaligned BAM encoding (SAM/BAM spec, section 4.2) with struct and numpy -- no pysam/htslib needed.
+## Records are encoded as strings (one per read) so worker processes can make them;
+## fastxwriterclass.BamWriter puts the header and records into BGZF blocks.
+
+import re, struct
+import numpy as np
+
+BAM_MAGIC = "BAM\1"
+BAM_UNMAPPED = 4
+BAM_UNMAPPED_BIN = 4680 ## reg2bin(-1, 0)
+BAM_TAG_RE = re.compile('^[A-Za-z][A-Za-z0-9]$')
+BAM_INT32 = (-2**31, 2**31 - 1)
+
+## 4-bit base codes of "=ACMGRSVTWYHKDBN", indexed by ascii value (anything else is N)
+BAM_SEQ_CODES = np.full(256, 15, dtype=np.uint8)
+for i, base in enumerate("=ACMGRSVTWYHKDBN"):
+    BAM_SEQ_CODES[ord(base)] = i
+    BAM_SEQ_CODES[ord(base.lower())] = i
+
+
+def bam_header(text="@HD\tVN:1.6\tSO:unknown\n"):
+    ''' BAM header (magic, SAM header text, no reference sequences) for unaligned reads.'''
+    return BAM_MAGIC + struct.pack("<i", len(text)) + text + struct.pack("<i", 0)
+
+def encode_seq(seq):
+    ''' seq as 4-bit codes, two bases per byte (first base in the high nibble).'''
+    codes = BAM_SEQ_CODES[np.frombuffer(seq, dtype=np.uint8)]
+    if len(codes) % 2:
+        codes = np.append(codes, np.uint8(0))
+    return ((codes[0::2] << 4) | codes[1::2]).tostring()
+
+def typed_tag_value(tagtype, value):
+    ''' (type, value) for a tag value given as a string and the type of its field: i (int32) or f (float32) when value is one,
+        otherwise Z with value unchanged (e.g. "-"/"None" for missing numbers, integers beyond int32) -- never a lossy conversion to another number type.'''
+    if tagtype == 'i':
+        try:
+            number = int(value)
+        except ValueError:
+            return 'Z', value
+        if BAM_INT32[0] <= number <= BAM_INT32[1]:
+            return 'i', number
+        return 'Z', value
+    elif tagtype == 'f':
+        try:
+            return 'f', float(value)
+        except ValueError:
+            return 'Z', value
+    return 'Z', value
+
+def encode_tag(tag, tagtype, value):
+    ''' One optional field: tag - 2 characters, tagtype - i (int32), f (float32) or Z (string).'''
+    if not BAM_TAG_RE.match(tag):
+        raise ValueError("Invalid BAM tag: " + tag)
+    if tagtype == 'i':
+        return struct.pack("<2sci", tag, 'i', value)
+    elif tagtype == 'f':
+        return struct.pack("<2scf", tag, 'f', value)
+    elif tagtype == 'Z':
+        return tag + 'Z' + str(value) + '\0'
+    raise ValueError("Unsupported BAM tag type: " + tagtype)
+
+def encode_unaligned_record(name, seq, quals=None, tags=(), flag=BAM_UNMAPPED):
+    ''' One unaligned BAM record (block_size included).
+        name  - read name (at most 254 characters)
+        quals - array of phred scores (e.g. Fast5.get_int_quals()), or None for missing qualities
+        tags  - [(tag, type, value)] (see encode_tag)'''
+    name = str(name) ## fast5 attributes can be unicode
+    if len(name) > 254:
+        raise ValueError("BAM read names are limited to 254 characters: " + name)
+    if quals is None:
+        quals = "\xff" * len(seq)
+    else:
+        if len(quals) != len(seq):
+            raise ValueError("Sequence and qualities differ in length: " + name)
+        quals = np.asarray(quals, dtype=np.uint8).tostring()
+    core = struct.pack("<iiBBHHHIiii", -1, -1, len(name) + 1, 255, BAM_UNMAPPED_BIN, 0, flag, len(seq), -1, -1, 0)
+    data = "".join([core, name, "\0", encode_seq(seq), quals] + [encode_tag(*tag) for tag in tags])
+    return struct.pack("<i", len(data)) + data
@@ -0,0 +1,46 @@
+## CIGAR operations on numpy arrays: projecting read coordinates onto the reference without per-base python loops.
+## Used by SamRecord.get_read_to_reference_map() and the Fast5 map_*_to_reference methods.
+
+import re
+import numpy as np
+
+CIGAR_RE = re.compile('(\d+)([MIDNSHP=X])')
+CIGAR_OPS = 'MIDNSHP=X'
+## ops that consume read bases (H included: hard clipped bases are part of the read in the fast5), reference bases, or align a read base to a reference base
+CIGAR_CONSUMES_READ = np.array([op in 'MISH=X' for op in CIGAR_OPS])
+CIGAR_CONSUMES_REF = np.array([op in 'MDN=X' for op in CIGAR_OPS])
+CIGAR_ALIGNS = np.array([op in 'M=X' for op in CIGAR_OPS])
+
+
+def parse_cigar(cigar):
+    ''' Returns (lengths, ops) as int64 arrays, ops being indexes into CIGAR_OPS.'''
+    elements = CIGAR_RE.findall(cigar)
+    lengths = np.array([int(count) for count, op in elements], dtype=np.int64)
+    ops = np.array([CIGAR_OPS.index(op) for count, op in elements], dtype=np.int64)
+    return lengths, ops
+
+def read_to_reference_map(cigar, pos, reverse=False):
+    ''' cigar   - CIGAR string
+        pos     - 1-based leftmost reference position (SAM POS field)
+        reverse - alignment is on the reverse strand (flag 16): the map is then given along the original read,
+                  i.e. reversed relative to SEQ, so it can be indexed with positions in the read from the fast5.
+        Returns an int64 array with one value per read base (including soft and hard clipped bases):
+        the 0-based reference position the base aligns to, or -1 (clips, insertions).'''
+    lengths, ops = parse_cigar(cigar)
+    readlens = np.where(CIGAR_CONSUMES_READ[ops], lengths, 0)
+    reflens = np.where(CIGAR_CONSUMES_REF[ops], lengths, 0)
+    ## reference start of each op and read-base offset within its op
+    refstarts = (pos - 1) + np.cumsum(reflens) - reflens
+    opidx = np.repeat(np.arange(len(ops)), readlens)
+    offsets = np.arange(len(opidx)) - np.repeat(np.cumsum(readlens) - readlens, readlens)
+    refmap = np.where(CIGAR_ALIGNS[ops][opidx], refstarts[opidx] + offsets, -1)
+    if reverse:
+        refmap = refmap[::-1]
+    return refmap
+
+def project_read_positions(refmap, readpos):
+    ''' Reference positions (refmap from read_to_reference_map) of read positions readpos (any int array).
+        Positions outside the read give -1.'''
+    readpos = np.asarray(readpos)
+    inside = (readpos >= 0) & (readpos < len(refmap))
+    return np.where(inside, refmap[np.where(inside, readpos, 0)] if len(refmap) > 0 else -1, -1)
@@ -0,0 +1,227 @@
+## Columnar event archive: the events of every read of a run in one HDF5 file.
+## Layout:
+##   /events/<column>   one contiguous dataset per events column (e.g. mean, stdv, start, length, base),
+##                      all reads concatenated in the order they were added
+##   /reads/name        read names (fast5 basenames)
+##   /reads/offset      events of read i are rows offset[i]:offset[i+1] of every column (offset has nreads+1 values)
+##   /reads/<info>      optional per-read values (e.g. chrom, pos, strand for genome-anchored tombo events)
+## Column order is kept in the "columns" attribute of /events.
+## Datasets are stored contiguous and uncompressed, so EventArchive can memory-map them:
+## loading or slicing a whole run's events is then zero-parse and zero-copy.
+
+import os, tempfile, shutil, h5py
+import numpy as np
+from fast5tools.f5class import memmap_dataset
+
+EVENT_ARCHIVE_FORMAT = "fast5tools-event-archive"
+EVENT_ARCHIVE_VERSION = 1
+
+## Columns kmerParams.py takes from an archive (in this order), and the names they may have:
+## fast5toEvents.py writes them as named here; tombo events (fast5_tombo_extract.py) keep tombo's names (norm_mean, norm_stdev).
+KMER_EVENT_COLUMNS = ('mean', 'stdv', 'start', 'length', 'base')
+KMER_EVENT_COLUMN_ALIASES = {'mean':('mean', 'norm_mean'), 'stdv':('stdv', 'norm_stdev', 'stddev'),
+                             'start':('start',), 'length':('length',), 'base':('base',)}
+
+
+def get_uncastable_columns(columns, dtypes, values):
+    ''' Columns (with their dtypes) whose values (dict-like of arrays, e.g. a structured array) would not cast safely to dtypes:
+        numbers must cast with the same kind (np.can_cast 'same_kind': no float -> int), strings must be strings no wider.
+        Returns ["column (dtype, not target dtype)"].'''
+    mismatched = []
+    for col, dtype in zip(columns, dtypes):
+        array = np.asarray(values[col])
+        if dtype.kind in 'SU' or array.dtype.kind in 'SU':
+            ok = array.dtype.kind == dtype.kind and array.dtype.itemsize <= dtype.itemsize
+        else:
+            ok = np.can_cast(array.dtype, dtype, 'same_kind')
+        if not ok:
+            mismatched.append(col + " (" + str(array.dtype) + ", not " + str(dtype) + ")")
+    return mismatched
+
+def get_kmer_event_records(events):
+    ''' fast5 events (e.g. Fast5.get_events(readtype)) as a structured array of KMER_EVENT_COLUMNS.
+        stdv  - the stdv (or stddev) column, or the square root of variance (non-basecalled input events).
+        base  - central base of each event's model_state kmer; N for events without model_state (input events).'''
+    names = events.dtype.names
+    records = np.empty(len(events), dtype=[('mean', float), ('stdv', float), ('start', float), ('length', float), ('base', 'S1')])
+    records['mean'] = events['mean']
+    if 'stdv' in names or 'stddev' in names:
+        records['stdv'] = events['stdv' if 'stdv' in names else 'stddev']
+    else:
+        records['stdv'] = np.sqrt(events['variance'])
+    records['start'] = events['start']
+    records['length'] = events['length']
+    if 'model_state' in names and len(events) > 0:
+        kmers = np.asarray(events['model_state']).astype(str)
+        width = kmers.dtype.itemsize
+        records['base'] = kmers.view('S1').reshape(len(kmers), width)[:, width//2]
+    else:
+        records['base'] = 'N'
+    return records
+
+def get_kmer_event_column_names(columns):
+    ''' Names of the KMER_EVENT_COLUMNS (in that order) among an archive's columns.
+        Raises ValueError when one is missing.'''
+    names = []
+    for col in KMER_EVENT_COLUMNS:
+        found = [alias for alias in KMER_EVENT_COLUMN_ALIASES[col] if alias in columns]
+        if not found:
+            raise ValueError("Event archive has no " + col + " column (one of: " + (",").join(KMER_EVENT_COLUMN_ALIASES[col]) + "); it has: " + (",").join(columns))
+        names.append(found[0])
+    return names
+
+
+class EventArchiveWriter(object):
+    ''' Streams reads' events into an event archive.
+        Column values are appended to one temp file per column as reads come in (memory use is one read),
+        and copied into contiguous datasets on close().
+        Columns (and their dtypes) are set by the first read added; later reads are cast to them.
+        A read lacking a column (or info key), or whose columns would not cast safely (get_uncastable_columns), is refused
+        with ValueError before anything of it is written. Leaving a with block on an exception discards the archive.'''
+    def __init__(self, filename, columns=None, tmpdir=None):
+        ''' columns - events fields to keep (default: all fields of the first read).'''
+        self.filename = filename
+        self.columns = columns
+        self.dtypes = None
+        self.info_keys = None
+        self.tmpdir = tempfile.mkdtemp(prefix="f5events_", dir=tmpdir)
+        self.colfiles = None
+        self.names = []
+        self.offsets = [0]
+        self.info = []
+
+    def add_read(self, name, events, info=None):
+        ''' name   - read name (e.g. f5.filebasename)
+            events - numpy structured array (e.g. f5.get_events(readtype) or f5.get_tombo_events())
+            info   - optional dict of per-read scalars (same keys for every read).'''
+        if self.colfiles is None:
+            if self.columns is None:
+                self.columns = list(events.dtype.names)
+            self.dtypes = [events.dtype[col] for col in self.columns]
+            self.info_keys = sorted(info.keys()) if info else []
+            self.colfiles = [open(os.path.join(self.tmpdir, str(i)), 'wb') for i in range(len(self.columns))]
+        missing = [col for col in self.columns if col not in events.dtype.names]
+        if missing:
+            raise ValueError(name + " lacks events columns: " + (",").join(missing))
+        mismatched = get_uncastable_columns(self.columns, self.dtypes, events)
+        if mismatched:
+            raise ValueError(name + " has events columns of other types than the first read: " + (",").join(mismatched))
+        if self.info_keys and (not info or any(key not in info for key in self.info_keys)):
+            raise ValueError(name + " lacks read info: " + (",").join(self.info_keys))
+        for col, dtype, fh in zip(self.columns, self.dtypes, self.colfiles):
+            np.asarray(events[col], dtype=dtype).tofile(fh)
+        self.names.append(name)
+        self.offsets.append(self.offsets[-1] + len(events))
+        if self.info_keys:
+            self.info.append([info[key] for key in self.info_keys])
+
+    def _close_colfiles(self):
+        for fh in self.colfiles or []:
+            fh.close()
+
+    def discard(self):
+        ''' Removes the temp files without writing the archive.'''
+        self._close_colfiles()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def close(self):
+        try:
+            out = h5py.File(self.filename, 'w')
+            out.attrs["format"] = EVENT_ARCHIVE_FORMAT
+            out.attrs["version"] = EVENT_ARCHIVE_VERSION
+            events = out.create_group("events")
+            events.attrs["columns"] = np.array(self.columns or [], dtype=str) ## h5py lists keys alphabetically
+            nrows = self.offsets[-1]
+            self._close_colfiles()
+            for i, col in enumerate(self.columns or []):
+                dataset = events.create_dataset(col, shape=(nrows,), dtype=self.dtypes[i])
+                colfile = open(os.path.join(self.tmpdir, str(i)), 'rb')
+                for start in range(0, nrows, 1000000):
+                    block = np.fromfile(colfile, dtype=self.dtypes[i], count=1000000)
+                    dataset[start:start+len(block)] = block
+                colfile.close()
+            reads = out.create_group("reads")
+            reads.create_dataset("name", data=np.array(self.names, dtype=str))
+            reads.create_dataset("offset", data=np.array(self.offsets, dtype=np.int64))
+            for j, key in enumerate(self.info_keys or []):
+                reads.create_dataset(key, data=np.array([e[j] for e in self.info]))
+            out.close()
+        except:
+            if os.path.exists(self.filename):
+                os.remove(self.filename) ## no partial archives
+            raise
+        finally:
+            shutil.rmtree(self.tmpdir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+class EventArchive(object):
+    ''' Reader for event archives written by EventArchiveWriter.
+        Columns are memory-mapped (mmap=False reads them into memory instead), so get_read()/column() slices are views into the file.'''
+    def __init__(self, filename, mmap=True):
+        self.filename = filename
+        h5 = h5py.File(filename, 'r')
+        try:
+            if h5.attrs.get("format") != EVENT_ARCHIVE_FORMAT:
+                raise ValueError("Not a fast5tools event archive: " + filename)
+            load = memmap_dataset if mmap else (lambda dataset: dataset[()])
+            self.columns = list(h5["events"].attrs["columns"])
+            self.events = dict((col, load(h5["events"][col])) for col in self.columns)
+            self.read_names = list(h5["reads/name"][()])
+            self.offsets = h5["reads/offset"][()]
+            self.read_info = dict((key, h5["reads"][key][()]) for key in h5["reads"].keys() if key not in ("name", "offset"))
+        finally:
+            h5.close()
+        self._index = None
+
+    def __len__(self):
+        return len(self.read_names)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.read_names[i], self.get_read(i)
+
+    def get_read_index(self, name):
+        if self._index is None:
+            self._index = dict((name, i) for i, name in enumerate(self.read_names))
+        return self._index[name]
+
+    def get_read(self, read):
+        ''' Events of one read (index or name) as {column: array}.'''
+        if not isinstance(read, (int, long, np.integer)):
+            read = self.get_read_index(read)
+        start, end = self.offsets[read], self.offsets[read+1]
+        return dict((col, self.events[col][start:end]) for col in self.columns)
+
+    def get_read_info(self, read):
+        if not isinstance(read, (int, long, np.integer)):
+            read = self.get_read_index(read)
+        return dict((key, values[read]) for key, values in self.read_info.items())
+
+    def get_lengths(self):
+        ''' Number of events per read.'''
+        return np.diff(self.offsets)
+
+    def column(self, col):
+        ''' Concatenated column over all reads.'''
+        return self.events[col]
+
+
+def is_event_archive(filename):
+    try:
+        h5 = h5py.File(filename, 'r')
+    except Exception:
+        return False
+    try:
+        return h5.attrs.get("format") == EVENT_ARCHIVE_FORMAT
+    finally:
+        h5.close()
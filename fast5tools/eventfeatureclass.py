@@ -0,0 +1,164 @@
+## Per-event feature tables for model training, extracted from whole runs.
+## - get_event_features(): one read's features -- the Events dataset is read once and fields are selected from it,
+##   optionally with stats of each event's raw signal segment (raw_mean, raw_stdv, raw_start, raw_length).
+## - extract_event_features(): runs that over a Fast5List in worker processes (Fast5List.imap) and writes
+##   the features of all reads into shards of about shard_rows events each.
+## Shard formats:
+##   npz     - <prefix>.<n>.npz with one fixed-width array per feature (all reads of the shard concatenated),
+##             read_name and read_offset (events of read i are rows read_offset[i]:read_offset[i+1]).
+##   archive - <prefix>.<n>.events.h5 event archives (see eventarchiveclass): same layout, memory-mappable.
+## Feature dtypes are set by the first read written; later reads are cast to them, so every shard has the same columns and widths.
+## Reads whose features would not cast safely (e.g. float lengths in seconds after int sample counts, longer model_state kmers)
+## are refused with ValueError -- extract_event_features lists them as skipped -- rather than written as wrong values.
+
+import numpy as np
+from functools import partial
+from fast5tools.f5class import segment_stats
+from fast5tools.eventarchiveclass import EventArchiveWriter, EventArchive, get_uncastable_columns
+
+EVENT_FEATURES = ('mean', 'stdv', 'length', 'move', 'model_state')
+RAW_FEATURES = ('raw_mean', 'raw_stdv', 'raw_start', 'raw_length')
+SHARD_FORMATS = ('npz', 'archive')
+
+
+def get_event_features(f5, readtype='template', fields=EVENT_FEATURES, raw_stats=False, median_normalized=False):
+    ''' Returns [(feature, array)] for the events of readtype: the given events fields (those the file has),
+        then, with raw_stats, RAW_FEATURES computed from each event's raw signal segment (segment_stats).'''
+    events = f5.get_events(readtype)
+    features = [(field, events[field]) for field in fields if field in events.dtype.names]
+    if raw_stats:
+        raw, offsets = f5.get_segmented_raw_signal_arrays(readtype, median_normalized, includeclips=False)
+        mean, stdv, lengths = segment_stats(raw, offsets)
+        features += zip(RAW_FEATURES, (mean, stdv, offsets[:-1], lengths))
+    return features
+
+def event_features_read(f5, readtype='template', fields=EVENT_FEATURES, raw_stats=False, median_normalized=False):
+    ''' Per-file work unit for Fast5List.imap: returns (read name, features, None) -- or (abspath, None, reason) when f5 is skipped.
+        Reads are named by their file's abspath (plus "/<read group>" for reads of multi-read files), so names are unique across a run.'''
+    if not (f5.is_not_corrupt() and f5.is_nonempty()):
+        return f5.abspath, None, "corrupt or empty file"
+    if not f5.has_read(readtype):
+        return f5.abspath, None, "no " + readtype + " events"
+    try:
+        name = f5.abspath if getattr(f5, 'read_name', None) is None else f5.abspath + "/" + f5.read_name
+        return name, get_event_features(f5, readtype, fields, raw_stats, median_normalized), None
+    except Exception as e:
+        return f5.abspath, None, type(e).__name__ + ": " + str(e)
+
+
+class EventFeatureShardWriter(object):
+    ''' Writes reads' features into shards <prefix>.<n>.npz (or .events.h5 for format='archive'),
+        starting a new shard once the current one holds shard_rows events (reads are never split across shards).
+        npz shards are built in memory, so memory use is about one shard.'''
+    def __init__(self, prefix, shard_rows=1000000, format='npz'):
+        assert format in SHARD_FORMATS
+        self.prefix = prefix
+        self.shard_rows = shard_rows
+        self.format = format
+        self.columns = None
+        self.dtypes = None
+        self.filenames = []
+        self._new_shard()
+
+    def _new_shard(self):
+        self.names = []
+        self.offsets = [0]
+        self.values = None
+        self.archive = None
+
+    def _shard_filename(self):
+        suffix = ".npz" if self.format == 'npz' else ".events.h5"
+        return self.prefix + "." + str(len(self.filenames)) + suffix
+
+    def add_read(self, name, features):
+        ''' features - [(feature, array)] as returned by get_event_features.'''
+        if self.columns is None:
+            self.columns = [feature for feature, values in features]
+            self.dtypes = [np.asarray(values).dtype for feature, values in features]
+        features = dict(features)
+        missing = [col for col in self.columns if col not in features]
+        if missing:
+            raise ValueError(name + " lacks features: " + (",").join(missing))
+        self._check_dtypes(name, features)
+        if self.format == 'npz':
+            if self.values is None:
+                self.values = [[] for col in self.columns]
+            for values, col, dtype in zip(self.values, self.columns, self.dtypes):
+                values.append(np.asarray(features[col], dtype=dtype))
+        else:
+            if self.archive is None:
+                self.archive = EventArchiveWriter(self._shard_filename())
+            self.archive.add_read(name, self._as_records(features))
+        self.names.append(name)
+        self.offsets.append(self.offsets[-1] + len(features[self.columns[0]]))
+        if self.offsets[-1] >= self.shard_rows:
+            self.flush()
+
+    def _check_dtypes(self, name, features):
+        ## features must cast to the dtypes of the first read (get_uncastable_columns)
+        mismatched = get_uncastable_columns(self.columns, self.dtypes, features)
+        if mismatched:
+            raise ValueError(name + " has features of other types than the first read: " + (",").join(mismatched))
+
+    def _as_records(self, features):
+        ## structured array of the features of one read (what EventArchiveWriter takes)
+        records = np.empty(len(features[self.columns[0]]), dtype=zip(self.columns, self.dtypes))
+        for col in self.columns:
+            records[col] = features[col]
+        return records
+
+    def flush(self):
+        ''' Writes out the current shard (if it has any reads) and starts the next.'''
+        if len(self.names) == 0:
+            return
+        filename = self._shard_filename()
+        if self.format == 'npz':
+            arrays = dict((col, np.concatenate(values)) for col, values in zip(self.columns, self.values))
+            arrays['read_name'] = np.array(self.names, dtype=str)
+            arrays['read_offset'] = np.array(self.offsets, dtype=np.int64)
+            arrays['columns'] = np.array(self.columns, dtype=str)
+            np.savez(filename, **arrays)
+        else:
+            self.archive.close()
+        self.filenames.append(filename)
+        self._new_shard()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def load_event_feature_shard(filename, mmap=True):
+    ''' Returns (features, read names, read offsets) of a shard, features being {feature: array}.
+        archive shards are memory-mapped unless mmap=False.'''
+    if filename.endswith(".npz"):
+        shard = np.load(filename)
+        features = dict((col, shard[col]) for col in shard['columns'])
+        return features, list(shard['read_name']), shard['read_offset']
+    archive = EventArchive(filename, mmap=mmap)
+    return archive.events, archive.read_names, archive.offsets
+
+
+def extract_event_features(fast5list, prefix, readtype='template', fields=EVENT_FEATURES, raw_stats=False, median_normalized=False,
+                           shard_rows=1000000, format='npz', processes=1):
+    ''' Extracts event features of every read in fast5list (a Fast5List) with processes worker processes,
+        writing them to shards (see EventFeatureShardWriter) in input order.
+        Returns (shard filenames, [(abspath, reason)] for skipped files).'''
+    fxn = partial(event_features_read, readtype=readtype, fields=fields, raw_stats=raw_stats, median_normalized=median_normalized)
+    skipped = []
+    with EventFeatureShardWriter(prefix, shard_rows, format) as writer:
+        for name, features, reason in fast5list.imap(fxn, processes=processes):
+            if features is None:
+                skipped.append((name, reason))
+            else:
+                try:
+                    writer.add_read(name, features)
+                except ValueError as e:
+                    skipped.append((name, str(e)))
+    return writer.filenames, skipped
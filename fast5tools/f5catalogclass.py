@@ -0,0 +1,169 @@
+## Persistent per-read metadata catalog for fast5 files.
+## Stores the attributes most often used for filtering (lengths, mean Q, channel, read number, run_id)
+## in a SQLite file keyed by path + mtime + size, so later passes can filter without opening HDF5.
+## Reads of multi-read files get their own rows ("path|read_<id>"), which point back to the file's row via "container".
+
+import os, sqlite3
+from fast5tools.f5class import *
+
+## readtype -> column prefix (2d is not a legal column name start)
+CATALOG_PREFIX = {"template":"template", "complement":"complement", "2d":"twod"}
+
+CATALOG_COLUMNS = ["key", "mtime", "size", "is_ok", "molecule", "molequal",
+                   "template_len", "template_q", "complement_len", "complement_q", "twod_len", "twod_q",
+                   "channel", "read_number", "run_id", "container"]
+
+CATALOG_SCHEMA = '''CREATE TABLE IF NOT EXISTS reads (
+    key TEXT PRIMARY KEY, mtime REAL, size INTEGER, is_ok INTEGER, molecule TEXT, molequal TEXT,
+    template_len INTEGER, template_q REAL, complement_len INTEGER, complement_q REAL, twod_len INTEGER, twod_q REAL,
+    channel TEXT, read_number TEXT, run_id TEXT, container TEXT)'''
+
+
+def _try_attr(fxn, convert):
+    ## Attributes are missing from some file versions -- store NULL rather than fail
+    try:
+        return convert(fxn())
+    except:
+        return None
+
+def get_catalog_record(f5):
+    ''' Per-file work unit for Fast5List.imap.
+        Returns catalog columns is_ok through run_id (see CATALOG_COLUMNS) for one Fast5.'''
+    if not (f5.is_not_corrupt() and f5.is_nonempty()):
+        return (0,) + (None,)*(len(CATALOG_COLUMNS) - 5)
+    record = [1]
+    if f5.has_reads():
+        record += [_try_attr(f5.use_molecule, str), _try_attr(f5.use_molequal, str)]
+    else:
+        record += [None, None]
+    for readtype in ("template", "complement", "2d"):
+        if f5.has_read(readtype):
+            record.append( _try_attr(lambda: f5.get_seq_len(readtype), int) )
+            record.append( _try_attr(lambda: f5.get_mean_qscore(readtype), float) )
+        else:
+            record += [None, None]
+    record.append( _try_attr(f5.get_channel_number, str) )
+    record.append( _try_attr(f5.get_read_number, str) )
+    record.append( _try_attr(f5.get_run_id, str) )
+    return tuple(record)
+
+def get_catalog_records(f5):
+    ''' Per-file work unit for Fast5List.imap(expand_multi_read=False).
+        Returns [(None, record)] for single-read files and [(read group name, record), ...] for multi-read files.'''
+    if f5.is_multi_read():
+        return [(read.read_name, get_catalog_record(read)) for read in MultiFast5(f5.filename, filemode=f5.filemode, f5=f5.f5)]
+    return [(None, get_catalog_record(f5))]
+
+
+class Fast5Catalog(object):
+    def __init__(self, dbpath):
+        ''' dbpath is the SQLite catalog file -- created if it does not exist.'''
+        self.dbpath = dbpath
+        self.db = sqlite3.connect(dbpath)
+        self.db.execute(CATALOG_SCHEMA)
+        if "container" not in [row[1] for row in self.db.execute("PRAGMA table_info(reads)")]:
+            ## catalogs made before multi-read support
+            self.db.execute("ALTER TABLE reads ADD COLUMN container TEXT")
+        self.db.execute("CREATE INDEX IF NOT EXISTS reads_container ON reads (container)")
+        self.db.commit()
+        self.tar_members = {} ## tarball path -> {member name: TarInfo}; avoids linear getmember() lookups
+
+    def close(self):
+        self.db.close()
+
+    def get_key(self, f5list, entry):
+        ''' Returns (key, mtime, size) for an entry of Fast5List.files.
+            Tar members (tarlite) are keyed as "abs/path/to/tarball|member" with the member's mtime and size.
+            Returns None for entries that cannot be keyed stably (e.g. files extracted by --notarlite).'''
+        if entry.startswith("f5tar|"):
+            f5tar, n, member = entry.split("|")
+            tar = f5list.tars["f5tar|" + n + "|"]
+            tarball = os.path.abspath(tar.name)
+            if tarball not in self.tar_members:
+                self.tar_members[tarball] = dict((ti.name, ti) for ti in tar.getmembers())
+            info = self.tar_members[tarball][member]
+            return tarball + "|" + member, float(info.mtime), int(info.size)
+        if f5list.F5_TMP_DIR is not None and entry.startswith(f5list.F5_TMP_DIR):
+            return None
+        stat = os.stat(entry)
+        return os.path.abspath(entry), float(stat.st_mtime), int(stat.st_size)
+
+    def get_stamps(self):
+        ''' key -> (mtime, size) for every file in the catalog (reads of multi-read files share their file's stamps).'''
+        return dict((key, (mtime, size)) for key, mtime, size in self.db.execute("SELECT key, mtime, size FROM reads WHERE container IS NULL"))
+
+    def refresh(self, fast5list, processes=1, commit_every=10000):
+        ''' Adds/updates catalog entries for all fast5s found in fast5list (files, dirs, fofns, tarballs).
+            Only files that are new or whose mtime/size changed are opened.
+            Returns (number of files found, number of files (re)scanned).'''
+        f5list = Fast5List(fast5list, keep_tar_footprint_small=True, expand_multi_read=False)
+        stamps = self.get_stamps()
+        stale_entries = []
+        stale_keys = []
+        for entry in f5list.files:
+            keyinfo = self.get_key(f5list, entry)
+            if keyinfo is not None and stamps.get(keyinfo[0]) != keyinfo[1:]:
+                stale_entries.append(entry)
+                stale_keys.append(keyinfo)
+        f5list.iterfiles = iter(stale_entries)
+        sql = "INSERT OR REPLACE INTO reads VALUES (" + (",").join(["?"]*len(CATALOG_COLUMNS)) + ")"
+        n = 0
+        ## loop over imap itself (not zip) so it always runs to the end and cleans up any tar tmp dir
+        for records in f5list.imap(get_catalog_records, processes=processes):
+            key, mtime, size = stale_keys[n]
+            self.db.execute("DELETE FROM reads WHERE container = ?", (key,))
+            if len(records) == 1 and records[0][0] is None:
+                self.db.execute(sql, stale_keys[n] + records[0][1] + (None,))
+            else:
+                ## multi-read file: a row for the file itself (for its stamps) plus one per read
+                self.db.execute(sql, stale_keys[n] + (1,) + (None,)*(len(CATALOG_COLUMNS) - 4))
+                for read_name, record in records:
+                    self.db.execute(sql, (key + "|" + read_name, mtime, size) + record + (key,))
+            n += 1
+            if n % commit_every == 0:
+                self.db.commit()
+        self.db.commit()
+        return len(f5list.files), n
+
+    def _get_readtype_condition(self, readtype):
+        ## readtype in template, complement, 2d, molecule, MoleQual, all
+        condition = "({0}_len BETWEEN ? AND ? AND {0}_q BETWEEN ? AND ?)"
+        if readtype in CATALOG_PREFIX:
+            return condition.format(CATALOG_PREFIX[readtype]), 1
+        elif readtype in ("molecule", "MoleQual"):
+            choice = "molecule" if readtype == "molecule" else "molequal"
+            return (" OR ").join(["(" + choice + " = '" + rt + "' AND " + condition.format(CATALOG_PREFIX[rt]) + ")" for rt in ("template", "complement", "2d")]), 3
+        elif readtype == "all":
+            return (" OR ").join([condition.format(CATALOG_PREFIX[rt]) for rt in ("template", "complement", "2d")]), 3
+
+    def get_passing_keys(self, readtype="template", minlen=0, maxlen=int(3e9), minq=0, maxq=int(10e3), channels=None, run_ids=None):
+        ''' Returns set of keys whose reads pass the same length/Q criteria as meets_all_criteria()/get_single_read(),
+            optionally restricted to the given channels and/or run_ids.
+            Multi-read files are returned (by their own key) when any of their reads pass.'''
+        condition, n = self._get_readtype_condition(readtype)
+        sql = "SELECT coalesce(container, key) FROM reads WHERE is_ok = 1 AND (" + condition + ")"
+        params = [minlen, maxlen, minq, maxq] * n
+        if channels is not None:
+            channels = [str(e) for e in channels]
+            sql += " AND channel IN (" + (",").join(["?"]*len(channels)) + ")"
+            params += channels
+        if run_ids is not None:
+            run_ids = [str(e) for e in run_ids]
+            sql += " AND run_id IN (" + (",").join(["?"]*len(run_ids)) + ")"
+            params += run_ids
+        return set(key for (key,) in self.db.execute(sql, params))
+
+    def filter_fast5list(self, f5list, readtype="template", minlen=0, maxlen=int(3e9), minq=0, maxq=int(10e3), channels=None, run_ids=None):
+        ''' Restricts what f5list will iterate over to files that pass the criteria according to the catalog.
+            Files missing from the catalog, or changed since it was refreshed, are kept
+            (they will be opened and filtered as usual downstream).
+            Returns the filtered Fast5List.'''
+        passing = self.get_passing_keys(readtype, minlen, maxlen, minq, maxq, channels, run_ids)
+        stamps = self.get_stamps()
+        keep = []
+        for entry in f5list.iterfiles:
+            keyinfo = self.get_key(f5list, entry)
+            if keyinfo is None or stamps.get(keyinfo[0]) != keyinfo[1:] or keyinfo[0] in passing:
+                keep.append(entry)
+        f5list.iterfiles = iter(keep)
+        return f5list
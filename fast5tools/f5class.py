@@ -1,14 +1,25 @@
 ## JOHN URBAN (2015, 2016, 2017, 2018)
 
 #info
-import h5py, os, sys, tarfile, shutil
+import h5py, os, sys, tarfile, shutil, io, tempfile
 import cStringIO as StringIO
-from Bio import SeqIO
 from glob import glob
-from random import randint, shuffle, seed
+from random import randint
 import numpy as np
 from collections import defaultdict
 from string import maketrans
+from multiprocessing import Pool
+from itertools import islice, izip
+from fast5tools.fileListClass import reservoir_sample
+from fast5tools.normops import median_mad, normalize, StreamingMedianMAD
+from fast5tools.cigarops import project_read_positions
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir ## backport for python2
+    except ImportError:
+        scandir = None
 
 #logging
 import logging
@@ -114,27 +125,180 @@ TOMBO_BC=TOMBO + "BaseCalled_template/"
 TOMBO_ALN=TOMBO_BC + 'Alignment/'
 TOMBO_EVENTS=TOMBO_BC+'Events/'
 
+def get_link_names(groupid):
+    ## member names of a low-level h5py group id (much cheaper than Group.keys())
+    names = []
+    groupid.links.iterate(names.append)
+    return tuple(names)
+
+def memmap_dataset(dataset):
+    ''' Read-only numpy memmap of a contiguous, uncompressed h5py dataset -- or its values read into memory when it cannot be mapped
+        (empty, chunked, or compressed datasets, and files opened from file objects, e.g. tar members read into memory).'''
+    offset = dataset.id.get_offset()
+    if offset is None or dataset.chunks is not None or not os.path.isfile(dataset.file.filename):
+        return dataset[()]
+    return np.memmap(dataset.file.filename, dtype=dataset.dtype, mode='r', offset=offset, shape=dataset.shape)
+
+def segment_stats(signal, offsets):
+    ''' Per-segment mean, stdv and length of signal, where segment i is signal[offsets[i]:offsets[i+1]].
+        Vectorized with np.add.reduceat: one pass for the sums, one for the squared deviations from each
+        segment's mean (same arithmetic as ndarray.std, without its cancellation issues) -- no per-segment python work.
+        Integer signals are summed exactly (int64). Empty segments get nan mean/stdv.'''
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    if len(lengths) == 0:
+        return np.zeros(0), np.zeros(0), lengths
+    acc = np.int64 if np.asarray(signal).dtype.kind in "iub" else np.float64
+    ## trailing 0 so every offset (incl. an empty last segment) is a valid reduceat index
+    buf = np.zeros(offsets[-1] - offsets[0] + 1, dtype=acc)
+    buf[:-1] = signal[offsets[0]:offsets[-1]]
+    starts = offsets[:-1] - offsets[0]
+    empty = lengths == 0
+    sums = np.add.reduceat(buf, starts).astype(np.float64)
+    sums[empty] = 0
+    mean = sums/np.maximum(lengths, 1)
+    dev = np.zeros(len(buf))
+    dev[:-1] = buf[:-1] - np.repeat(mean, lengths)
+    sumsq = np.add.reduceat(dev*dev, starts)
+    stdv = np.sqrt(sumsq/np.maximum(lengths, 1))
+    mean[empty] = np.nan
+    stdv[empty] = np.nan
+    return mean, stdv, lengths
+
+def event_lengths_to_data_points(length, sampling_rate):
+    ''' Event lengths as numbers of raw data points: integer lengths are returned as they are,
+        lengths in seconds (older files: float, median < 1) are multiplied by sampling_rate and rounded to uint64.
+        sampling_rate - number, or function returning it (only called when a conversion is needed).
+        Returns None for lengths that look like neither.'''
+    length = np.asarray(length)
+    if len(length) == 0:
+        return length.astype('uint64')
+    if length.dtype.kind in "iu" and np.median(length) >= 1:
+        return length
+    elif length.dtype.kind == "f" and np.median(length) < 1:
+        if callable(sampling_rate):
+            sampling_rate = sampling_rate()
+        return np.rint(length * sampling_rate).astype('uint64')
+
+def event_columns(events, sampling_rate=None):
+    ''' {mean, stdv, length} of a structured events array or events dict (views where possible):
+        stdv is computed from variance in files that only report that;
+        with a sampling_rate (see event_lengths_to_data_points), lengths are given as numbers of raw data points.'''
+    names = events.keys() if isinstance(events, dict) else events.dtype.names
+    columns = {'mean': events['mean'],
+               'stdv': events['stdv'] if 'stdv' in names else np.sqrt(events['variance'])}
+    columns['length'] = events['length'] if sampling_rate is None else event_lengths_to_data_points(events['length'], sampling_rate)
+    return columns
+
+def slice_events(events, start, end):
+    ''' events[start:end] for a structured events array (a view) or for an events dict ({column:array}, views of each column).'''
+    if isinstance(events, dict):
+        return dict((key, values[start:end]) for key, values in events.items())
+    return events[start:end]
+
+def get_rng(rng=None):
+    ''' Random number source for simulations: rng itself when it is already a random state,
+        otherwise a new one seeded with rng (None, int or sequence of ints) -- a numpy Generator when numpy has them (>= 1.17), else a RandomState.'''
+    if rng is None or isinstance(rng, (int, long, list, tuple, np.ndarray)):
+        if hasattr(np.random, 'default_rng'):
+            return np.random.default_rng(rng)
+        return np.random.RandomState(rng)
+    return rng
+
+def simulate_signal(means, stdvs, lengths, dtype='float16', rng=None):
+    ''' Signal made of lengths[i] draws from normal(means[i], stdvs[i]) for each event i, in order.
+        One standard normal draw for the whole signal, scaled and shifted in place by the repeated event stdvs and means.'''
+    lengths = np.asarray(lengths, dtype=np.int64)
+    signal = get_rng(rng).standard_normal(lengths.sum())
+    signal *= np.repeat(stdvs, lengths)
+    signal += np.repeat(means, lengths)
+    return signal.astype(dtype, copy=False)
+
+def format_values(values):
+    ''' Returns the values of a 1D array as strings -- the same text str() gives for each element,
+        but formatted by numpy in C instead of one python str() call per value.'''
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return map(str, values.tolist())
+    return values.astype(str)
+
+def write_delimited(out, columns, coldelim="\t", rowdelim="\n", chunksize=100000):
+    ''' Writes equal-length columns (arrays) to file-like out as a delimited table, chunksize rows at a time.
+        Rows are separated (not terminated) by rowdelim, as in the get_*_string() methods.'''
+    nrows = len(columns[0])
+    for i in range(0, nrows, chunksize):
+        chunk = [format_values(col[i:i+chunksize]) for col in columns]
+        if i > 0:
+            out.write(rowdelim)
+        if len(chunk) == 1:
+            out.write(rowdelim.join(chunk[0]))
+        else:
+            out.write(rowdelim.join(coldelim.join(row) for row in izip(*chunk)))
+
+def split_fastq(blob):
+    ''' Splits a one-record FASTQ blob (the Fastq dataset of a fast5) into (name without "@", seq, separator line, quals)
+        at the offsets of its 3 inner newlines -- no record parsing. Raises ValueError if it is not 4 lines.'''
+    blob = blob.strip()
+    i = blob.index('\n')
+    j = blob.index('\n', i+1)
+    k = blob.index('\n', j+1)
+    if blob.find('\n', k+1) != -1:
+        raise ValueError("FASTQ blob has more than 4 lines")
+    return blob[:i].lstrip('@'), blob[i+1:j], blob[j+1:k], blob[k+1:]
+
+def phred_to_int(quals, offset=33):
+    ''' Quality string -> uint8 array of phred scores (one vectorized subtraction, no per-base python).'''
+    return np.frombuffer(quals, dtype=np.uint8) - np.uint8(offset)
+
+def format_int_quals(name, quals, wrap=60):
+    ''' QUAL (space-separated integer qualities) record for int array quals, named name,
+        with lines wrapped at spaces to at most wrap characters -- the same text Bio.SeqIO.convert gives from fastq to "qual".'''
+    data = " ".join(format_values(quals))
+    lines = [">" + name]
+    while len(data) > wrap:
+        i = data.rfind(" ", 0, wrap+1)
+        lines.append(data[:i])
+        data = data[i+1:]
+    lines.append(data)
+    return "\n".join(lines)
+
+## Paths resolved per layout signature (see Fast5.get_layout_signature) -- filled in as new layouts are seen
+LAYOUT_ATTRS = ("_basecalling_attempted", "LOC_TEMP", "LOC_COMP", "LOC_2D", "ATTR_TEMP", "ATTR_COMP", "ATTR_2D", "SPLIT_HAIRPIN", "GENERAL_PATH")
+_LAYOUT_CACHE = {}
+
+## h5py can open python file-like objects (e.g. tar members read into memory) from 2.9 on
+H5PY_FILEOBJ = tuple(int(e) for e in h5py.__version__.split(".")[:2]) >= (2, 9)
+
 class Fast5(object):
-    def __init__(self, filename, filemode='r'):
+    def __init__(self, filename, filemode='r', fileobj=None, lazy=False):
+        ''' fileobj - optional file-like object (e.g. io.BytesIO) holding the HDF5 data.
+                      When given, it is opened instead of filename (filename is then only used for naming).
+            lazy    - do not open the file (or resolve its layout) until something needs it.
+                      Naming attributes (filename, filebasename, abspath) never open the file.'''
         self.filemode = filemode
         self.filename = filename
+        self.fileobj = fileobj
         self.filebasename = (".").join(filename.split("/")[-1].split(".")[:-1]) ## takes entire basename except ".fast5"
         self.abspath = os.path.abspath(filename)
         self.ATTR_2D = None
         self.ATTR_TEMP = None
         self.ATTR_COMP = None
         self.SPLIT_HAIRPIN = None
+        self._loaded = False
+        if not lazy:
+            self._load()
+
+    def _load(self):
+        ## Opens the file and resolves its layout -- called from __init__, or on first use in lazy mode (see __getattr__)
+        self._loaded = True
         self.is_open = self.open() #self.f5 is the f5 file object
         if self.is_open:# and self.is_nonempty():
             self.file_version = None
-            self._basecalling_attempted = self.basecalling_attempted()
             self.LOC_TEMP = None
             self.LOC_COMP = None
             self._has_read = {}
-            self._has_read["template"] = self.has_template()
-            self._has_read["complement"] = self.has_complement()
-            self._has_read["2d"] = self.has_2d()
             self._has_read["input"] = True # arbitrarily true for now
+            self._resolve_layout()
             self.molecule = None
             self.molequal = None
             self.log = None
@@ -146,19 +310,76 @@ class Fast5(object):
             self.quals_as_int = {"template":None, "complement":None, "2d":None}
             self.info_name = {"template":None, "complement":None, "2d":None}
             self.base_info_name = None
-            self.GENERAL_PATH = None
-            self._get_general_path()
+            self._raw_median_mad = None
+            self._group_attrs = {}
 
+    def __getattr__(self, name):
+        ## Only reached for attributes not set yet: in lazy mode, that is everything _load() sets (f5, is_open, _has_read, ...)
+        if name.startswith("__") or self.__dict__.get("_loaded", True):
+            raise AttributeError(name)
+        self._load()
+        return getattr(self, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
 
     def __str__(self):
         return self.filename
+
+    def get_layout_signature(self):
+        ''' Summarizes the group structure that path resolution depends on: the member names of /, /Analyses,
+            and of its Basecall/Hairpin_Split groups (and their Summary/Configuration groups).
+            Uses low-level link iteration over groups that exist -- no failed lookups.'''
+        root = self.f5["/"].id
+        rootkeys = get_link_names(root)
+        signature = [rootkeys]
+        if "Analyses" in rootkeys:
+            analyses = h5py.h5g.open(root, "Analyses")
+            analyseskeys = get_link_names(analyses)
+            signature.append(analyseskeys)
+            for name in analyseskeys:
+                if name.startswith("Basecall_") or name.startswith("Hairpin_Split_"):
+                    group = h5py.h5g.open(analyses, name)
+                    groupkeys = get_link_names(group)
+                    signature.append((name, groupkeys))
+                    for sub in ("Summary", "Configuration"):
+                        if sub in groupkeys:
+                            signature.append((name, sub, get_link_names(h5py.h5g.open(group, sub))))
+        return tuple(signature)
+
+    def _resolve_layout(self):
+        ## Files sharing a layout signature resolve to the same paths: probe the first one, copy for the rest.
+        signature = self.get_layout_signature()
+        if signature not in _LAYOUT_CACHE:
+            self._basecalling_attempted = self.basecalling_attempted()
+            self._has_read["template"] = self.has_template()
+            self._has_read["complement"] = self.has_complement()
+            self._has_read["2d"] = self.has_2d()
+            self.GENERAL_PATH = None
+            self._get_general_path()
+            self._find_attr_path()
+            self._find_split_hairpin_path()
+            layout = dict((attr, getattr(self, attr)) for attr in LAYOUT_ATTRS)
+            layout["_has_read"] = dict(self._has_read)
+            _LAYOUT_CACHE[signature] = layout
+        layout = _LAYOUT_CACHE[signature]
+        for attr in LAYOUT_ATTRS:
+            setattr(self, attr, layout[attr])
+        self._has_read = dict(layout["_has_read"])
     
     def open(self):
         """
         Open an ONT Fast5 file, assuming HDF5 format
         """
         try:
-            self.f5 = h5py.File(self.filename, self.filemode) 
+            if self.fileobj is not None:
+                self.f5 = h5py.File(self.fileobj, self.filemode)
+            else:
+                self.f5 = h5py.File(self.filename, self.filemode) 
             return True
         except Exception, e:
 ##            sys.stderr.write("Cannot open file: %s \n" % self.filename)
@@ -178,7 +399,7 @@ class Fast5(object):
         """
         Close an open an ONT Fast5 file, assuming HDF5 format
         """
-        if self.is_open:
+        if self._loaded and self.is_open:
             self.f5.close()
 
 ##    def get_file_version(self):
@@ -449,7 +670,20 @@ class Fast5(object):
     
 
     def _get_attr(self, path, attr):
-        return self.f5[path].attrs[attr]
+        return self.get_group_attrs(path)[attr]
+
+    def get_group_attrs(self, path):
+        ''' Returns {name: value} of all attributes of the group at path, read in one pass over the group's attributes
+            on first use and memoized -- so the Summary values used to filter and name a read cost one HDF5 lookup per group.
+            Only for groups whose attributes are not modified while the file is open (basecaller Summary groups).'''
+        if path not in self._group_attrs:
+            self._group_attrs[path] = dict(self.f5[path].attrs.items())
+        return self._group_attrs[path]
+
+    def get_summary(self, readtype):
+        ''' readtype in 2d, template, complement.
+            Returns {attribute: value} of the basecaller Summary group of readtype (sequence_length, mean_qscore, num_events, ...).'''
+        return self.get_group_attrs(self._get_attr_path(readtype))
 
     def _get_attr_path(self, readtype):
         '''readtpye in 2d, template, complement'''
@@ -712,8 +946,7 @@ class Fast5(object):
     def _parse_fastq_info(self, readtype):
         if self.seq[readtype] == None:
             try:
-                (self.given_name[readtype], self.seq[readtype], self.fq_sep[readtype], self.quals[readtype]) = self.f5[self._get_location_path(readtype,"Fastq")][()].strip().split('\n')
-                self.given_name[readtype] = self.given_name[readtype].lstrip('@')
+                (self.given_name[readtype], self.seq[readtype], self.fq_sep[readtype], self.quals[readtype]) = split_fastq(self.f5[self._get_location_path(readtype,"Fastq")][()])
             except:
                 (self.given_name[readtype], self.seq[readtype], self.fq_sep[readtype], self.quals[readtype]) = None, None, None, None
 
@@ -915,15 +1148,19 @@ class Fast5(object):
     def get_quals_only_filename(self, readtype, comments=False):
         return self.get_quals(readtype, name=self.filebasename, comments=comments)
 
+    def get_int_quals(self, readtype):
+        ''' Returns the base qualities of readtype as a uint8 array of phred scores.'''
+        if self.has_read(readtype):
+            self._parse_fastq_info(readtype)
+            return phred_to_int(self.quals[readtype])
+
     ## NOTE: did not add the abs path (or filename) options for thing below -- Add if needed.
-    ## ALT STRATEGY FOR QUAL CONVERSION: qscores = [(ord(q)-33) for q in fq.qual]
     def get_quals_as_int(self, readtype):
         if self.has_read(readtype):
             self._parse_fastq_info(readtype)
             if self.quals_as_int[readtype] == None:
-                self.quals_as_int[readtype] = StringIO.StringIO()
-                SeqIO.convert(StringIO.StringIO('\n'.join(['@'+self._get_pore_info_name(readtype), self.seq[readtype], self.fq_sep[readtype], self.quals[readtype]])), "fastq", self.quals_as_int[readtype], "qual")
-            return self.quals_as_int[readtype].getvalue().rstrip()
+                self.quals_as_int[readtype] = format_int_quals(self._get_pore_info_name(readtype), self.get_int_quals(readtype))
+            return self.quals_as_int[readtype]
 
     def falconize_name(self, readtype, zmw_num, style="old"):
         if style == "old":
@@ -994,8 +1231,15 @@ class Fast5(object):
     def yield_events(self, readtype): ## 20160705 -- make tests
         yield self.f5[self._get_location_path(readtype,"Events")][()]
 
+    def write_events(self, out, readtype):
+        ''' Writes the events table to file-like out as tab-separated text (what get_events_string returns).'''
+        events = self.get_events(readtype)
+        write_delimited(out, [events[name] for name in events.dtype.names])
+
     def get_events_string(self, readtype):
-        return ("\n").join([("\t").join((str(f) for f in e))  for e in self.get_events(readtype)])
+        out = StringIO.StringIO()
+        self.write_events(out, readtype)
+        return out.getvalue()
 
     def get_events_header(self, readtype): ## 20160611-inprogress, make tests
         ## Nov 2017: 'input' breaks this in latest files
@@ -1049,12 +1293,11 @@ class Fast5(object):
     def get_event_moves(self, readtype):
         return self.f5[self._get_location_path(readtype,"Events")]["move"]
 
-    def get_events_dict(self, readtype):
+    def get_events_dict(self, readtype, fields=None):
         ## make it (store in external variables)
-        events_dict = {}
-        for key in self.get_events_header(readtype):
-            events_dict[key] = self.f5[self._get_location_path(readtype,"Events")][key]
-        return events_dict
+        ## the Events dataset is read once; values are views of each field (fields: subset of the events header to keep)
+        events = self.get_events(readtype)
+        return dict((key, events[key]) for key in (events.dtype.names if fields is None else fields))
         
 
     def get_model(self, readtype):
@@ -1144,13 +1387,87 @@ class Fast5(object):
     def get_raw_signal(self, median_normalized=False, scale=100.0):
         if median_normalized:
             raw = self.f5[self.get_raw_signal_path()][()]
-            median = np.median(raw) ## need to update this by subtracting out MAD
-            return scale*raw/median
+            median = self.get_raw_median_mad()[0]
+            signal = scale*raw ## one float array, normalized in place
+            signal /= median
+            return signal
         else:
             return self.f5[self.get_raw_signal_path()][()]
+
+    def get_raw_median_mad(self, cache=True, blocksize=1000000):
+        ''' Returns (median, MAD) of the raw signal, computed once per read and cached (cache=False recomputes).
+            Integer signals (as stored by MinKNOW) are streamed blocksize values at a time into a histogram (exact, no sort);
+            float signals use median_mad() on one scratch copy.'''
+        if cache and self._raw_median_mad is not None:
+            return self._raw_median_mad
+        dataset = self.get_raw_signal_dataset()
+        if np.issubdtype(dataset.dtype, np.integer):
+            stream = StreamingMedianMAD()
+            for start, block in self.iter_raw_windows(blocksize, blocksize=blocksize):
+                stream.update(block)
+            medmad = stream.median_mad()
+        else:
+            medmad = median_mad(dataset[()], overwrite_input=True)
+        if cache:
+            self._raw_median_mad = medmad
+        return medmad
+
+    def get_normalized_raw_signal(self, dtype=np.float32, out=None):
+        ''' Robust z-scores of the raw signal: (raw - median)/MAD, as dtype (float32 by default),
+            computed in place in out when given. Median and MAD come from get_raw_median_mad() (cached per read).'''
+        median, mad = self.get_raw_median_mad()
+        return normalize(self.get_raw_signal_dataset()[()], median, mad, dtype=dtype, out=out)
+
+    def get_raw_signal_dataset(self):
+        ''' The raw signal as an h5py dataset: nothing is read until it is sliced (e.g. ds[start:end]).'''
+        return self.f5[self.get_raw_signal_path()]
+
+    def read_raw_signal(self, out=None, start=0, end=None):
+        ''' Reads raw[start:end] straight into out (a reusable buffer, e.g. np.empty(n, dtype=np.int16)) with read_direct,
+            so reading many reads does not allocate a new array for each. out must hold at least end-start values.
+            Returns the filled part of out (a new array when out is None).'''
+        dataset = self.get_raw_signal_dataset()
+        end = len(dataset) if end is None else min(end, len(dataset))
+        n = max(end - start, 0)
+        if out is None:
+            out = np.empty(n, dtype=dataset.dtype)
+        elif len(out) < n:
+            raise ValueError("Buffer holds %d values, raw signal slice has %d: %s" % (len(out), n, self.filename))
+        if n > 0:
+            dataset.read_direct(out, np.s_[start:end], np.s_[0:n])
+        return out[:n]
+
+    def get_raw_signal_memmap(self):
+        ''' Zero-copy raw signal: a read-only np.memmap onto the signal's bytes in the fast5 file when the dataset is stored
+            contiguous and uncompressed. Chunked/compressed signals (as MinKNOW writes them) and in-memory files are read in instead.'''
+        return memmap_dataset(self.get_raw_signal_dataset())
+
+    def iter_raw_windows(self, size, step=None, start=0, end=None, blocksize=1000000):
+        ''' Yields (window start, window values) over raw[start:end]: windows of size values, one every step values
+            (default step=size, i.e. non-overlapping); the last window may be shorter.
+            The signal is read blocksize values at a time, so the whole read is never held in memory.
+            Windows are views into the current block.'''
+        dataset = self.get_raw_signal_dataset()
+        end = len(dataset) if end is None else min(end, len(dataset))
+        step = size if step is None else step
+        blocksize = max(blocksize, size)
+        bufstart = start
+        buf = dataset[start:min(start + blocksize, end)]
+        for winstart in xrange(start, end, step):
+            winend = min(winstart + size, end)
+            if winend > bufstart + len(buf):
+                bufstart = winstart
+                buf = dataset[winstart:min(winstart + blocksize, end)]
+            yield winstart, buf[winstart - bufstart:winend - bufstart]
     
+    def write_raw_signal(self, out, delimiter='\n', median_normalized=False):
+        ''' Writes the raw signal to file-like out, one value per delimiter (what get_raw_signal_string returns).'''
+        write_delimited(out, [self.get_raw_signal(median_normalized)], rowdelim=delimiter)
+
     def get_raw_signal_string(self, delimiter='\n', median_normalized=False):
-        return (delimiter).join([str(e) for e in self.get_raw_signal(median_normalized)])
+        out = StringIO.StringIO()
+        self.write_raw_signal(out, delimiter, median_normalized)
+        return out.getvalue()
 
 
     def get_raw_attribute(self, attr):
@@ -1194,23 +1511,22 @@ class Fast5(object):
             rawseg['3primeclip'] = np.array([])
         return rawseg
 
+    def write_segmented_raw_signal(self, out, includeclips=True, datadelim=' ', eventdelim='\n', readtype='template', median_normalized=False):
+        ''' Writes the raw signal to file-like out one event per eventdelim, values separated by datadelim
+            (what get_segmented_raw_signal_string returns). Clips are included when includeclips and they have signal.'''
+        raw, offsets = self.get_segmented_raw_signal_arrays(readtype, median_normalized, includeclips=True)
+        first = 0 if includeclips and raw[:offsets[1]].any() else 1
+        last = len(offsets) - 1 if includeclips and raw[offsets[-2]:].any() else len(offsets) - 2
+        values = format_values(raw)
+        for i in range(first, last):
+            if i > first:
+                out.write(eventdelim)
+            out.write(datadelim.join(values[offsets[i]:offsets[i+1]]))
+
     def get_segmented_raw_signal_string(self, includeclips=True, datadelim=' ', eventdelim='\n', readtype='template', median_normalized=False):
-        rawseg = self.get_segmented_raw_signal(readtype, median_normalized)
-        rawstring = ''
-        #add 5'?
-        if includeclips and rawseg['5primeclip'].any():
-            rawstring += (datadelim).join( [str(e) for e in rawseg['5primeclip']] ) + eventdelim
-        #get event-parsed raw
-        for i in range(len(rawseg.keys())-2-1): #-2 b/c 5primeclip and 3primeclip; -1 to avoid eventdelim after last one
-            rawstring += (datadelim).join( [str(e) for e in rawseg[i]] ) + eventdelim
-        #add last event w/o eventdelim
-        i+=1
-        rawstring += (datadelim).join( [str(e) for e in rawseg[i]] )
-        #add 3' ?
-        if includeclips and rawseg['3primeclip'].any():
-            rawstring +=  eventdelim
-            rawstring += (datadelim).join( [str(e) for e in rawseg['3primeclip']] )
-        return rawstring
+        out = StringIO.StringIO()
+        self.write_segmented_raw_signal(out, includeclips, datadelim, eventdelim, readtype, median_normalized)
+        return out.getvalue()
 
     def get_event_from_raw_signal(self, start, raw, name=None):
         ''' start is calculated elsewhere
@@ -1224,35 +1540,59 @@ class Fast5(object):
         else:
             return (mean, stdv, start, length)
 
+    def get_raw_segment_offsets(self, readtype='template'):
+        ''' Event boundaries in the raw signal as an int64 array of length nevents+1: event i is raw[offsets[i]:offsets[i+1]].
+            Requires events given in raw sample indices that tile the signal (no gaps/overlaps).'''
+        events = self.get_events_dict(readtype)
+        starts = np.asarray(events['start'])
+        lengths = np.asarray(events['length'])
+        if starts.dtype.kind not in "iu" or lengths.dtype.kind not in "iu":
+            raise TypeError("event starts/lengths are not raw sample indices: " + self.filename)
+        offsets = np.append(starts, starts[-1] + lengths[-1]).astype(np.int64)
+        if not (offsets[1:-1] == starts[:-1] + lengths[:-1]).all():
+            raise ValueError("events are not contiguous in the raw signal: " + self.filename)
+        return offsets
+
+    def get_segmented_raw_signal_arrays(self, readtype='template', median_normalized=False, includeclips=True):
+        ''' Array form of get_segmented_raw_signal: returns (raw, offsets), where segment i is raw[offsets[i]:offsets[i+1]].
+            With includeclips, the first and last segments are the 5' and 3' clips (possibly empty).
+            Use segment_stats(raw, offsets) for per-segment mean, stdv and length.'''
+        raw = self.get_raw_signal(median_normalized)
+        offsets = self.get_raw_segment_offsets(readtype)
+        if includeclips:
+            offsets = np.concatenate(([0], offsets, [len(raw)]))
+        return raw, offsets
+
+    def get_segmented_raw_signal_stats_columns(self, includeclips=True, readtype='template', median_normalized=False):
+        ''' Column form of get_segmented_raw_signal_stats: returns (names, means, stdvs, starts, lengths),
+            names being a list of strings and the rest arrays.'''
+        raw, offsets = self.get_segmented_raw_signal_arrays(readtype, median_normalized, includeclips=True)
+        mean, stdv, lengths = segment_stats(raw, offsets)
+        keep = np.ones(len(lengths), dtype=bool)
+        keep[0] = includeclips and raw[:offsets[1]].any()
+        keep[-1] = includeclips and raw[offsets[-2]:].any()
+        names = [name for name, k in zip(['5primeclip'] + range(len(lengths)-2) + ['3primeclip'], keep) if k]
+        lengths = lengths[keep]
+        starts = np.cumsum(lengths) - lengths
+        assert lengths.sum() == self.get_raw_duration()
+        return names, mean[keep], stdv[keep], starts, lengths
+
     def get_segmented_raw_signal_stats(self, includeclips=True, readtype='template', median_normalized=False):
-##        print ('\n').join([str(e) for e in 100.0*self.get_raw_signal()/np.median(self.get_raw_signal())])
-        rawseg = self.get_segmented_raw_signal(readtype, median_normalized)
-        rawstats = []
-        sumlen = 0
-        #add 5'?
-        if includeclips and rawseg['5primeclip'].any():
-            event = self.get_event_from_raw_signal(start=0, raw=rawseg['5primeclip'], name='5primeclip')
-            rawstats.append( event )
-            sumlen += event[4]
-        #get event-parsed raw
-        for i in range(len(rawseg.keys())-2): #-2 b/c 5primeclip and 3primeclip
-            event = self.get_event_from_raw_signal(start=sumlen, raw=rawseg[i], name=i)
-            rawstats.append( event )
-            sumlen += event[4]
-        #add 3' ?
-        if includeclips and rawseg['3primeclip'].any():
-            event = self.get_event_from_raw_signal(start=sumlen, raw=rawseg['3primeclip'], name='3primeclip')
-            rawstats.append( event )
-            sumlen += event[4]
-##        assert sumlen == self.get_raw_duration()
-        assert sumlen == self.get_raw_duration()
-        return rawstats
-                
+        ''' Returns list of (name, mean, stdv, start, length) per event (name = event index),
+            plus the 5primeclip and 3primeclip when includeclips and they have signal.
+            start is the position within the concatenation of the reported segments.'''
+        names, mean, stdv, starts, lengths = self.get_segmented_raw_signal_stats_columns(includeclips, readtype, median_normalized)
+        return zip(names, list(mean), list(stdv), starts.tolist(), lengths.tolist())
+
+    def write_segmented_raw_signal_stats(self, out, includeclips=True, readtype='template', median_normalized=False):
+        ''' Writes the segmented raw signal stats to file-like out as tab-separated text (what get_segmented_raw_signal_stats_string returns).'''
+        names, mean, stdv, starts, lengths = self.get_segmented_raw_signal_stats_columns(includeclips, readtype, median_normalized)
+        write_delimited(out, [np.array(names, dtype=str), mean, stdv, starts, lengths])
+
     def get_segmented_raw_signal_stats_string(self, includeclips=True, readtype='template', median_normalized=False):
-        eventstr = ''
-        for event in self.get_segmented_raw_signal_stats(includeclips, readtype, median_normalized):
-           eventstr += ('\t').join([str(e) for e in event]) + '\n'
-        return eventstr.rstrip()
+        out = StringIO.StringIO()
+        self.write_segmented_raw_signal_stats(out, includeclips, readtype, median_normalized)
+        return out.getvalue()
 
     def tombo_exists(self):
         try:
@@ -1372,12 +1712,9 @@ class Fast5(object):
         assert readtype is None or length is None
         if readtype is not None and length is None:
             length = self.get_event_lengths(readtype)
-        if length.dtype in (np.uint64, np.int64) and length[:5].mean() > 1:
-            return length
-        elif length.dtype == np.float64 and length[:5].mean() < 1:
-            return np.array( np.rint(length * self.get_sampling_rate()), dtype = 'uint64')
+        return event_lengths_to_data_points(length, self.get_sampling_rate)
         
-    def simulate_raw_data_from_events(self, readtype="template", dtype='float16', from_input_events=True, add_flanking_signal=False, hairpin_flank=5):
+    def simulate_raw_data_from_events(self, readtype="template", dtype='float16', from_input_events=True, add_flanking_signal=False, hairpin_flank=5, rng=None):
         ''' Latest data is 1D/template-only.
             Earlier data had different models for template and complent.
             Moreover, complement technically had 2 models.
@@ -1385,47 +1722,39 @@ class Fast5(object):
             dtype in int16, float64, float16
             It is int16 in latest files, but default here is float16.
             Can change it to int16 as needed.
-            This takes events from input by default.'''
+            This takes events from input by default.
+            rng - seed (int or sequence of ints) or random state (see get_rng) for reproducible signal. Default: unseeded.
+            Each event contributes length values drawn from normal(mean, stdv): all events are drawn at once.'''
 ##        events = get_strand_events_from_input_events(strand, add_flanking_events, hairpin_flank)
         if from_input_events:
-            events = self.get_strand_events_from_input_events(strand=readtype, add_flanking_events=add_flanking_signal, hairpin_flank=hairpin_flank)
-            try:
-                events['stdv']
-            except:
-                if events['variance']:
-                    events['stdev'] = events['var']**0.5
-            events['length'] = self.convert_sampling_time_length_to_number_of_data_points(readtype=None, length=events['length'])
-
+            events = self.get_strand_input_event_columns(strand=readtype, add_flanking_events=add_flanking_signal, hairpin_flank=hairpin_flank)
+            means, stdvs, lengths = events['mean'], events['stdv'], events['length']
         else: #basecaled events
             ## I did not yet implement adding flanking input events to the basecalled events
-            events = {}
-            events['mean'] = self.get_event_means(readtype)
-            events['stdv'] = self.get_event_stdevs(readtype)
-            events['length'] = self.convert_sampling_time_length_to_number_of_data_points(readtype)
-        nevents = len(events['mean'])
-        raw = []
-        for i in range(nevents):
-            raw += list( np.random.normal(events['mean'][i], events['stdv'][i], events['length'][i]) )
-##        if asint16:
-##            dtype = 'int16'
-        return np.array(raw, dtype=dtype)
+            means = self.get_event_means(readtype)
+            stdvs = self.get_event_stdevs(readtype)
+            lengths = self.convert_sampling_time_length_to_number_of_data_points(readtype)
+        return simulate_signal(means, stdvs, lengths, dtype=dtype, rng=rng)
 
 
     
 
-    def add_simulated_raw_data_f5(self, readtype="template", dtype='float16', force=False, from_input_events=True, add_flanking_signal=False, hairpin_flank=5):
+    def add_simulated_raw_data_f5(self, readtype="template", dtype='float16', force=False, from_input_events=True, add_flanking_signal=False, hairpin_flank=5, rng=None, chunksize=65536):
         ''' from_input_events defaults to True b/c the basecaller used to trim events out meaning the raw signal would not be fully represented.
                 setting it to False results in using the basecalled_events, which may or may not be better for an application.
             Add flanking signal: if template, add signal from events leading up to first template event.
                                     if no 2d or complement is detected, it tries to add any events after the template event end.
                                     Otherwise, it will add the number of events given by hairpin_flank.
                                  if complement, it will prepend the number of events defined by hairpin_flank,
-                                    and will try to add any events following complement end.'''
+                                    and will try to add any events following complement end.
+            Needs the file opened writable (filemode='r+').
+            The signal is stored gzip-compressed in chunks of chunksize values (like MinKNOW raw signal).
+            Returns True when the signal was written, False when a raw signal already exists
+            (with force, only earlier simulated signal is overwritten).'''
         rawpath = self.get_raw_path()
         rawsigpath = self.get_raw_signal_path()
-        if rawsigpath in self.f5 and not force:
-            print rawpath, "already exists. Exiting..."
-            quit() ## Since this will be working on numerous reads, maybe just catch and report but keep going
+        if rawsigpath in self.f5 and not (force and self.f5[rawpath].attrs.get('simulated', False)): #only overwrite sim
+            return False
         readnum = str(self.get_read_number())
         if not 'Raw' in self.f5:
             g1 = self.f5.create_group('Raw')
@@ -1433,26 +1762,19 @@ class Fast5(object):
             g2 = self.f5.create_group('Raw/Reads')
         if not rawpath in self.f5:
             g3 = self.f5.create_group(rawpath)
-        if not rawsigpath in self.f5:
-            ## need to add these attrs: [u'read_number', u'read_id', u'start_mux', u'start_time', u'duration', u'median_before']
-##            g4 = self.f5.create_group(rawsigpath)
-            raw = self.simulate_raw_data_from_events(readtype=readtype, dtype=dtype, from_input_events=from_input_events, add_flanking_signal=add_flanking_signal, hairpin_flank=hairpin_flank)
-            duration = len(raw)
-            self.f5.create_dataset(rawpath+'/Signal',data=raw, compression="gzip", compression_opts=1) #, maxshape=None)
-            self.f5[rawpath].attrs['duration'] = duration
-            self.f5[rawpath].attrs['read_number'] = int(readnum.split('_')[-1])
-            self.f5[rawpath].attrs['read_id'] = self.get_read_id()
-            self.f5[rawpath].attrs['simulated'] = True
-        if rawsigpath in self.f5 and force:
-            if self.f5[rawpath].attrs['simulated']: #only overwrite sim
-                del self.f5[rawpath+'/Signal']
-                raw = self.simulate_raw_data_from_events(readtype=readtype, dtype=dtype, from_input_events=from_input_events, add_flanking_signal=add_flanking_signal, hairpin_flank=hairpin_flank)
-                self.f5[rawpath+'/Signal'] = raw
-
-            self.f5[rawpath].attrs['simulated'] = True
+        ## need to add these attrs: [u'read_number', u'read_id', u'start_mux', u'start_time', u'duration', u'median_before']
+        raw = self.simulate_raw_data_from_events(readtype=readtype, dtype=dtype, from_input_events=from_input_events, add_flanking_signal=add_flanking_signal, hairpin_flank=hairpin_flank, rng=rng)
+        if rawsigpath in self.f5:
+            del self.f5[rawpath+'/Signal']
+        self.f5.create_dataset(rawpath+'/Signal', data=raw, chunks=(max(1, min(len(raw), chunksize)),), compression="gzip", compression_opts=1)
+        self.f5[rawpath].attrs['duration'] = len(raw)
+        self.f5[rawpath].attrs['read_number'] = int(readnum.split('_')[-1])
+        self.f5[rawpath].attrs['read_id'] = self.get_read_id()
+        self.f5[rawpath].attrs['simulated'] = True
         if not '/Analyses/Basecall_1D_000/BaseCalled_'+readtype+'/Events' in self.f5 and '/Analyses/Basecall_2D_000/BaseCalled_'+readtype+'/Events' in self.f5:
             self.f5['/Analyses/Basecall_1D_000/BaseCalled_'+readtype+'/Events'] = h5py.SoftLink('/Analyses/Basecall_2D_000/BaseCalled_'+readtype+'/Events')
             self.f5['/Analyses/Basecall_1D_000/BaseCalled_'+readtype+'/Fastq'] = h5py.SoftLink('/Analyses/Basecall_2D_000/BaseCalled_'+readtype+'/Fastq')
+        return True
         
         ## for current error w/ event_resquiggle look in: https://github.com/nanoporetech/tombo/blob/master/tombo/_event_resquiggle.py
            # resquiggle_read
@@ -1501,14 +1823,14 @@ class Fast5(object):
         start = self.get_strand_start_index_in_input_events(strand)
         end = self.get_strand_end_index_in_input_events(strand)
         if add_flanking_events:
-            if strand is 'template':
+            if strand == 'template':
                 start = 0
                 if self.has_2d() or self.has_complement():
-                    end += 5
+                    end += hairpin_flank
                 else:
                     end = self.get_num_events('input')
-            elif strand is 'complement':
-                start -= 5
+            elif strand == 'complement':
+                start = max(start - hairpin_flank, 0)
                 end = self.get_num_events('input')
         return start, end
 
@@ -1517,79 +1839,82 @@ class Fast5(object):
             that correspond to template or complement from the input events
             as defined by their start and end indexes therein.
             '''
+        return self.get_strand_input_events(strand, add_flanking_events, hairpin_flank)
+
+    def get_strand_input_events(self, strand='template', add_flanking_events=False, hairpin_flank=5, events=None):
+        ''' Input events of strand (flanks as in get_strand_coords_from_input_events) as a structured array.
+            Only rows start:end of the input events dataset are read -- or, when events (the input events array) is given,
+            a view into it is returned (no copy).'''
         start, end = self.get_strand_coords_from_input_events(strand, add_flanking_events, hairpin_flank)
-        return self.get_events(readtype='input')[start:end]
+        if events is None:
+            return self.f5[self._get_location_path('input', "Events")][start:end]
+        return events[start:end]
+
+    def get_strand_input_event_columns(self, strand='template', add_flanking_events=False, hairpin_flank=5, events=None):
+        ''' mean, stdv and length (as a number of raw data points) of the input events of strand, as {column:array}.
+            mean is a view of the events; stdv comes from variance in files that do not report it;
+            lengths are converted from seconds (older files) in one step.'''
+        return event_columns(self.get_strand_input_events(strand, add_flanking_events, hairpin_flank, events), self.get_sampling_rate)
 
 
     def get_strand_events_from_basecalled_events(self, strand='template', add_flanking_events=False, hairpin_flank=5):
-    ## Stopped doing this for the moment b/c an issue arises when input and basecalled events have different structuress and keys
-    ##  Just need to grab only the mean, stdev, start, length from each
-    ##  This is NOT tested.
+    ## Input and basecalled events can have different structures and keys,
+    ##  so only mean, stdev and length (as number of data points) are taken from each.
         '''This simply returns the events from the strand given if add_flanking_events is False
             Otherwise, it returns the basecalled strand events (assuming file is basecalled) with
                 flanking events taking from input events that flank the start and end positions
                 of the basecalled events.
+            Returns {'mean', 'stdev', 'length'}: each column is put together with one concatenate.
+                Lengths are converted to numbers of data points piece by piece, as input and basecalled events
+                can report them in different units.
             '''
-        def get_stdev(given_events,b=None,e=None):
-            if b is None:
-                b = 0
-            if e is None:
-                e = length(given_events['mean'])
-            try:
-                return  given_events['stdv'][b:e]
-            except:
-                return  given_events['variance'][b:e]**0.5
         bc_start = self.get_strand_start_index_in_input_events(strand)
         bc_end = self.get_strand_end_index_in_input_events(strand)
         i_start, i_end = self.get_strand_coords_from_input_events(strand, add_flanking_events, hairpin_flank)
-        bc_events = self.get_events(readtype=strand)
-        i_events = self.get_events(readtype='input')
+        i_events = self.f5[self._get_location_path('input', "Events")]
+        pieces = [i_events[i_start:bc_start], self.get_events(readtype=strand), i_events[bc_end:i_end]]
+        sampling_rate = self.get_sampling_rate()
+        pieces = [event_columns(piece, sampling_rate) for piece in pieces]
         events = {}
-        events['mean'] = np.array(list(i_events['mean'][i_start:bc_start]) + list(bc_events['mean']) + list(i_events['mean'][bc_end:i_end]))
-        events['stdev'] = np.array(list(get_stdev(i_events, i_start, bc_start)) + list(get_stdev(bc_events)) + list(get_stdev(i_events, bc_end, i_end)))
-        events['length'] = list(self.convert_sampling_time_length_to_number_of_data_points(readtype=None, length=i_events['length'][i_start:bc_start]))
-        events['length'] += list(self.convert_sampling_time_length_to_number_of_data_points(readtype=None, length=bc_events['length']))
-        events['length'] += list(self.convert_sampling_time_length_to_number_of_data_points(readtype=None, length=i_events['length'][bc_end:i_end]))
-        events['length'] = np.array(events['length'])
+        for key, column in (('mean', 'mean'), ('stdev', 'stdv'), ('length', 'length')):
+            events[key] = np.concatenate([piece[column] for piece in pieces])
+        events['length'] = events['length'].astype('uint64', copy=False)
         return events
             
 
     def reconstruct_sequence_from_stranded_events(self, readtype="template"):
         ## assumes events are stranded/base-called
+        ## the first model state, then the last move bases of the model state of every event that moved
+        ## done on a (events x k) character matrix, joined once
         events = self.get_events(readtype)
-        length = len(events['mean'])
-        seq = events['model_state'][0]
-        for i in range(1,length):
-            if events['move'][i] > 0:
-                #print events['move'][i] 
-                seq += events['model_state'][i][5-int(events['move'][i]):]
-        return seq
-
-    def map_events_to_read(self, readtype):
+        states = np.ascontiguousarray(events['model_state'])
+        if len(states) == 0:
+            return ''
+        k = states.dtype.itemsize
+        chars = states.view('S1').reshape(len(states), k)
+        move = np.clip(events['move'], 0, k)
+        move[0] = k
+        keep = np.arange(k) >= (k - move)[:,None]
+        return chars[keep].tostring()
+
+    def map_events_to_read(self, readtype="template"):
         ## assumes events are stranded/base-called
-        ## updates events dict with seqindex key:value pairs
         ## i.e. for template, this returns the index in the template sequence for each event
         ##   (where the model state kmer starts in the sequence)
-        events = self.get_events(readtpye)
-        length = len(events['mean'])
-        seqindex = [0]
-        for i in range(1,length):
-            #pos of this event in the read sequence is pos of last event + the move value
-            seqindex.append(seqindex[-1] + int(events['move'][i]))
+        ## pos of each event in the read sequence is pos of last event + its move value (first event is at 0)
+        move = self.get_events(readtype)['move']
+        seqindex = np.cumsum(move, dtype=np.int64)
+        if len(seqindex) > 0:
+            seqindex -= move[0]
         return seqindex
 
 
-    def map_events_to_reference(self, readtype="template"):
-        # by mapping the events to the read and the read to the reference,
-        #    one can map the events to the reference given the CIGAR.
-        # Can accomplish this by either storing alignments in fast5 like Tombo,
-        #     then adding a lot of the samclass functionality to f5class
-        #     or making samclass able to take in a fast5class object to find its SAM stuff
-        #     or can just map reads with location-comments appended to SAM entry,
-        #        then go through the sorted SAM with samclass to get all associated alignments
-        ##       as well as the location to look up events in fast5
-        ##    or can also have events in the SAM comment and do it all in the samclass
-        pass
+    def map_events_to_reference(self, samrecord, readtype="template"):
+        ## assumes events are stranded/base-called and samrecord (samclass.SamRecord) is an alignment of this read's readtype sequence
+        ## maps the events to the read (map_events_to_read) and the read to the reference (the CIGAR, see cigarops)
+        ## returns the 0-based reference position of the first base of each event's model state kmer, -1 where that base is not aligned
+        ## reference name and strand are samrecord.get_rname_field() and samrecord.reference_strand()
+        return project_read_positions(samrecord.get_read_to_reference_map(), self.map_events_to_read(readtype))
 
     def map_stay_events_to_read(self, readtype="template"):
         ## assumes events are stranded/base-called
@@ -1597,38 +1922,28 @@ class Fast5(object):
         ## it will record the same location as many times as there are stays at it
         ## by default position 0 is move 0 but is not a "stay", so start at 1
         ## name can be filepath, readstats, etc
-        events = self.get_events(readtype)
-        length = len(events['mean'])
-        index = 0
-        stay_indexes = []
-        for i in range(1,length):
-            if events['move'][i] == 0:
-                stay_indexes.append( index )
-            else:
-                index += int(events['move'][i])
-        return stay_indexes
+        move = self.get_events(readtype)['move']
+        seqindex = np.cumsum(move, dtype=np.int64)
+        if len(seqindex) > 0:
+            seqindex -= move[0]
+        return seqindex[1:][move[1:] == 0]
+
+    def get_stay_event_coverage(self, readtype="template"):
+        ## assumes events are stranded/base-called
+        ## returns (positions, counts): read positions with at least one stay and the number of stays at each
+        counts = np.bincount(self.map_stay_events_to_read(readtype))
+        positions = np.flatnonzero(counts)
+        return positions, counts[positions]
 
     def map_stay_event_coverage_in_read(self, readtype="template"):
         ## assumes events are stranded/base-called
-        ## makes BED entries of locations of kmers that have move=0
-        ## it will record the same location as many times as there are stays at it
-        ## by default position 0 is move 0 but is not a "stay", so start at 1
-        ## name can be filepath, readstats, etc
-        events = self.get_events(readtype)
-        length = len(events['mean'])
-        seqlen = self.get_seq_len(readtype)
-        index = 0
-        d = defaultdict(int) ##{i:0 for i in range(seqlen)}
-        for i in range(1,length):
-            if events['move'][i] == 0:
-                d[index] += 1
-            else:
-                index += int(events['move'][i])
-        return d
+        ## returns {position:number of stays} for read positions with at least one stay
+        positions, counts = self.get_stay_event_coverage(readtype)
+        return defaultdict(int, izip(positions.tolist(), counts.tolist()))
                 
-    def map_stay_events_to_reference(self, readtype="template"):
-        ## 
-        pass
+    def map_stay_events_to_reference(self, samrecord, readtype="template"):
+        ## reference positions (as in map_events_to_reference) of the stay events (as in map_stay_events_to_read)
+        return project_read_positions(samrecord.get_read_to_reference_map(), self.map_stay_events_to_read(readtype))
 
 
     def map_segmented_raw_signal_to_read(self, readtype="template",mediannorm=False):
@@ -1642,9 +1957,127 @@ class Fast5(object):
         raw = self.get_segmented_raw_signal(readtype, mediannorm)
         pass
 
-    def map_segmented_raw_signal_to_reference(self, readtype="template"):
+    def map_segmented_raw_signal_to_reference(self, samrecord, readtype="template", median_normalized=False):
+        ## returns (raw, offsets, refpos): raw segment i is raw[offsets[i]:offsets[i+1]] (the raw data of event i) and refpos[i] its reference position
+        raw, offsets = self.get_segmented_raw_signal_arrays(readtype, median_normalized, includeclips=False)
+        return raw, offsets, self.map_events_to_reference(samrecord, readtype)
+
+    def is_multi_read(self):
+        ## True when this file is a multi-read (bulk) container -- see MultiFast5
+        return self.is_open and is_multi_read_hdf5(self.f5)
+
+
+
+MULTI_READ_PREFIX = "read_"
+
+def is_multi_read_hdf5(h5):
+    ''' Multi-read fast5s have one "read_<read_id>" group per read at the root (and nothing else).'''
+    if h5.attrs.get('file_type') == 'multi-read':
+        return True
+    keys = h5.keys()
+    return len(keys) > 0 and all(key.startswith(MULTI_READ_PREFIX) for key in keys)
+
+def get_multi_read_path(path):
+    ''' Translates a single-read fast5 path into the equivalent path inside a multi-read "read_<id>" group.
+        /UniqueGlobalKey/X -> X
+        /Raw/Reads/Read_N/Y -> Raw/Y
+        everything else (Analyses, ...) is the same, relative to the read group.'''
+    path = path.strip("/")
+    if path == "UniqueGlobalKey" or path.startswith("UniqueGlobalKey/"):
+        path = path[len("UniqueGlobalKey/"):]
+    elif path.startswith("Raw/Reads/"):
+        path = ("/").join(["Raw"] + path.split("/")[3:])
+    return path
+
+class Fast5ReadGroup(object):
+    ''' Makes one read group of a multi-read file look like the root of a single-read fast5 to Fast5:
+        paths are translated with get_multi_read_path(), attrs are the root attrs (file_version) of the file or read.
+        Anything else is passed on to the h5py group.'''
+    def __init__(self, h5, read_name):
+        self.h5 = h5
+        self.read_name = read_name
+        self.group = h5[read_name]
+
+    def __getitem__(self, path):
+        path = get_multi_read_path(path)
+        if path == "":
+            return self.group
+        if path == "Raw/Reads":
+            ## single-read files have a single Raw/Reads/Read_<read_number> group
+            return {"Read_" + str(self.group["Raw"].attrs["read_number"]) : self.group["Raw"]}
+        return self.group[path]
+
+    def __contains__(self, path):
+        try:
+            self[path]
+            return True
+        except KeyError:
+            return False
+
+    @property
+    def attrs(self):
+        ## files repacked by f5multiops keep each read's original root attrs (file_version) on its group
+        if 'file_version' in self.group.attrs:
+            return self.group.attrs
+        return self.h5.attrs
+
+    def __getattr__(self, name):
+        return getattr(self.group, name)
+
+class Fast5Read(Fast5):
+    ''' One read of a multi-read fast5 with the usual Fast5 accessors.
+        Shares the open h5py file of its MultiFast5, which owns the handle -- so close() does nothing.
+        filename/abspath are the container's; filebasename has the read group name appended so output names stay unique.'''
+    def __init__(self, container, read_name):
+        self.container = container
+        self.read_name = read_name
+        Fast5.__init__(self, container.filename, filemode=container.filemode)
+        self.filebasename = self.filebasename + "." + read_name
+
+    def open(self):
+        try:
+            self.f5 = Fast5ReadGroup(self.container.f5, self.read_name)
+            return True
+        except Exception:
+            return False
+
+    def close(self):
         pass
 
+    def is_multi_read(self):
+        return False
+
+class MultiFast5(object):
+    ''' Multi-read (bulk) fast5 container: many "read_<read_id>" groups in one HDF5 file.
+        The file is opened once; iterating yields a Fast5Read per read group, in file order.
+        f5 - an already open h5py.File to use instead of opening filename (e.g. taken over from a Fast5).'''
+    def __init__(self, filename, filemode='r', fileobj=None, f5=None):
+        self.filename = filename
+        self.filemode = filemode
+        if f5 is not None:
+            self.f5 = f5
+        elif fileobj is not None:
+            self.f5 = h5py.File(fileobj, filemode)
+        else:
+            self.f5 = h5py.File(filename, filemode)
+        self.read_names = [key for key in self.f5.keys() if key.startswith(MULTI_READ_PREFIX)]
+
+    def __len__(self):
+        return len(self.read_names)
+
+    def __iter__(self):
+        for read_name in self.read_names:
+            yield Fast5Read(self, read_name)
+
+    def get_read_ids(self):
+        return [read_name[len(MULTI_READ_PREFIX):] for read_name in self.read_names]
+
+    def get_read(self, read_id):
+        return Fast5Read(self, MULTI_READ_PREFIX + read_id)
+
+    def close(self):
+        self.f5.close()
+
 
 
 
@@ -1667,8 +2100,182 @@ class Fast5(object):
 
 F5_TMP_DIR = ".fast5tools_tmp_dir"
 F5_TMP_DIR = "fast5tools_tmp_dir"
+
+TAR_INDEX_SUFFIX = ".f5idx"
+TAR_INDEX_END = "#end" ## last line of complete sidecars
+
+class Fast5TarIndex(object):
+    ''' Random access to members of an uncompressed tarball.
+        Member name -> (data offset, size, mtime) is read from a sidecar file (tarball + TAR_INDEX_SUFFIX),
+        or built with one pass over the tar headers and cached there when missing or out of date
+        (the sidecar stores the tarball's mtime and size). Sidecars are written to a temp file and renamed into place;
+        one that cannot be parsed or lacks its end line (e.g. truncated) is treated as out of date and rebuilt.
+        Members are then read with a single seek + read instead of walking the archive.
+        Mimics the parts of tarfile.TarFile that Fast5List uses (name, getnames, getmembers, extractfile, extract, close).'''
+    def __init__(self, tarball):
+        self.name = os.path.abspath(tarball)
+        self.index_file = self.name + TAR_INDEX_SUFFIX
+        self.names = []
+        self.members = {}
+        self._fh = None
+        stat = os.stat(self.name)
+        self.stamp = "%r\t%d" % (stat.st_mtime, stat.st_size)
+        if not self._load_index():
+            self._build_index()
+            self._write_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return False
+        names = []
+        members = {}
+        try:
+            f = open(self.index_file, 'r')
+            try:
+                if f.readline().rstrip("\n") != self.stamp:
+                    return False
+                complete = False
+                for line in f:
+                    if line == TAR_INDEX_END + "\n":
+                        complete = True
+                        break
+                    name, offset, size, mtime = line.rstrip("\n").split("\t")
+                    names.append(name)
+                    members[name] = (int(offset), int(size), float(mtime))
+            finally:
+                f.close()
+        except (IOError, OSError, ValueError):
+            return False
+        if not complete:
+            return False
+        self.names = names
+        self.members = members
+        return True
+
+    def _build_index(self):
+        ## mode 'r:' raises tarfile.ReadError for compressed tarballs
+        tar = tarfile.open(self.name, 'r:')
+        for ti in tar:
+            if ti.isfile():
+                self.names.append(ti.name)
+                self.members[ti.name] = (ti.offset_data, ti.size, ti.mtime)
+        tar.close()
+
+    def _write_index(self):
+        ## Not being able to cache (e.g. read-only dir) only costs re-building the index next time
+        ## Written to a temp file in the same dir and renamed into place, so readers (and concurrent runs) never see a partial index
+        tmpname = None
+        try:
+            fd, tmpname = tempfile.mkstemp(prefix=os.path.basename(self.index_file) + ".", dir=os.path.dirname(self.index_file))
+            f = os.fdopen(fd, 'w')
+            f.write(self.stamp + "\n")
+            for name in self.names:
+                offset, size, mtime = self.members[name]
+                f.write(("\t").join([name, str(offset), str(size), repr(mtime)]) + "\n")
+            f.write(TAR_INDEX_END + "\n")
+            f.close()
+            os.chmod(tmpname, 0644) ## mkstemp files are private
+            os.rename(tmpname, self.index_file)
+        except (IOError, OSError):
+            logger.warning("Could not write tar index: " + self.index_file)
+            if tmpname is not None and os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    def getnames(self):
+        return self.names[:]
+
+    def getmembers(self):
+        members = []
+        for name in self.names:
+            ti = tarfile.TarInfo(name)
+            offset, ti.size, ti.mtime = self.members[name]
+            members.append(ti)
+        return members
+
+    def read_member(self, name):
+        offset, size, mtime = self.members[name]
+        if self._fh is None:
+            self._fh = open(self.name, 'rb')
+        self._fh.seek(offset)
+        return self._fh.read(size)
+
+    def extractfile(self, name):
+        return io.BytesIO(self.read_member(name))
+
+    def extract(self, name, path=""):
+        outfile = os.path.join(path, name)
+        if not os.path.isdir(os.path.dirname(outfile)):
+            os.makedirs(os.path.dirname(outfile))
+        f = open(outfile, 'wb')
+        f.write(self.read_member(name))
+        f.close()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+def open_tar(tarball):
+    ''' Returns a Fast5TarIndex for uncompressed tarballs, otherwise a tarfile.TarFile
+        (compressed streams cannot be seeked into, so members are found by walking the archive).'''
+    try:
+        return Fast5TarIndex(tarball)
+    except tarfile.ReadError:
+        return tarfile.open(tarball)
+
+def open_tar_member_fast5(tar, tar_member, tarball, lazy=False):
+    ''' Opens a tar member as a Fast5 without writing it to disk.
+        The member is read with tarfile.extractfile and handed to h5py as an in-memory file object.
+        filename (and abspath) become tarball/tar_member, as in tar_filenames_only mode.'''
+    fileobj = io.BytesIO(tar.extractfile(tar_member).read())
+    return Fast5(os.path.join(tarball, tar_member), fileobj=fileobj, lazy=lazy)
+
+## Per-process cache of open tarfiles used by Fast5List.imap() workers.
+## Each worker opens a given tarball once and re-uses it for all members it is handed.
+_IMAP_TARS = {}
+
+def _imap_open_fast5(filename, filemode, tarball, tmpdir):
+    ''' Opens a Fast5 inside an imap worker.
+        Tar members (tarball is not None) are read in memory when tmpdir is None.
+        Otherwise they are extracted into a worker-specific subdir of tmpdir,
+        opened, and removed right away (same approach as tarlite in Fast5List.next()).'''
+    if tarball is None:
+        return Fast5(filename, filemode=filemode)
+    if tarball not in _IMAP_TARS:
+        _IMAP_TARS[tarball] = open_tar(tarball)
+    if tmpdir is None:
+        return open_tar_member_fast5(_IMAP_TARS[tarball], filename, tarball)
+    workdir = os.path.join(tmpdir, str(os.getpid()))
+    _IMAP_TARS[tarball].extract(filename, path=workdir)
+    newfile = os.path.join(workdir, filename)
+    f5 = Fast5(newfile)
+    os.remove(newfile)
+    return f5
+
+def _fast5_imap_worker(job):
+    ''' job = (fn, expand_multi_read, filename, filemode, tarball, tmpdir)
+        Opens its own Fast5 and always closes the file.
+        Returns a list of results: [fn(f5)], or fn applied to each read of a multi-read file (when expand_multi_read).'''
+    fn, expand_multi_read = job[:2]
+    f5 = _imap_open_fast5(*job[2:])
+    try:
+        if expand_multi_read and f5.is_multi_read():
+            return [fn(read) for read in MultiFast5(f5.filename, filemode=f5.filemode, f5=f5.f5)]
+        return [fn(f5)]
+    finally:
+        f5.close()
+
+
 class Fast5List(object):
-    def __init__(self, fast5list, tar_filenames_only=False, keep_tar_footprint_small=True, filemode='r', downsample=False, random=False, randomseed=False):
+    def __init__(self, fast5list, tar_filenames_only=False, keep_tar_footprint_small=True, filemode='r', downsample=False, random=False, randomseed=False, tar_in_memory=True, lazy=False, expand_multi_read=True, lazy_fast5=False):
+        ## tar_in_memory: with keep_tar_footprint_small (tarlite), read tar members into memory instead of extracting to F5_TMP_DIR.
+        ##                Falls back to extracting when h5py is too old (< 2.9) to open file-like objects.
+        ## lazy: expand dirs and FOFNs as files are iterated over instead of listing everything up front.
+        ##       self.files stays None until get_filenames() (or anything else needing the full list) is called;
+        ##       len() then walks the inputs once to count.
+        ## expand_multi_read: iterate over the reads of multi-read files (as Fast5Read objects) rather than yielding the container file.
+        ## lazy_fast5: yield Fast5(lazy=True) objects -- files are only opened if something beyond their names is used.
+        ##             Multi-read files are then not expanded (that needs opening every file); extracted tar members (notarlite) are opened as usual.
         #ensure type is list
         if isinstance(fast5list, list):
                 self.fast5list = fast5list
@@ -1678,18 +2285,30 @@ class Fast5List(object):
         self._tars_detected = False
         self.tar_filenames_only = tar_filenames_only
         self.keep_tar_footprint_small = keep_tar_footprint_small
+        self.tar_in_memory = tar_in_memory and keep_tar_footprint_small and H5PY_FILEOBJ
         self.nfiles = None
         #self.allfiles = None
         self.iterfiles = None
         self.n_tars = 0
         self.F5_TMP_DIR = None
         self.tars = {} ## for small footprint method
+        self.multi_fast5 = None ## multi-read file being expanded by next()
+        self.multi_reads = None
+        self.expand_multi_read = expand_multi_read
+        self.lazy_fast5 = lazy_fast5
 ##        self._expand_list() ##TODO(?) - make expand fofn optional, so not wasting time in most situations
         ## Pre-process
         self.downsample = downsample
         self.random = random
         self.randomseed = randomseed 
-        self._extract_fast5_files()
+        self.lazy = lazy
+        self._expanded_tars = {} ## lazy mode: tarball -> member entries, so counting does not re-open tars
+        if self.lazy:
+            self.files = None
+            self.iterfiles = self._iter_fast5_files()
+            self._init_downsample()
+        else:
+            self._extract_fast5_files()
 
         
 
@@ -1697,24 +2316,39 @@ class Fast5List(object):
         return self
 
     def next(self):
+        ## reads of a multi-read file currently being expanded come first
+        if self.multi_reads is not None:
+            try:
+                return self.multi_reads.next()
+            except StopIteration:
+                self.multi_reads = None
+                self.multi_fast5.close()
         try:
             #newfile = self.allfiles.next()
             newfile = self.iterfiles.next()
             if self.keep_tar_footprint_small and newfile.startswith("f5tar|"):
                     f5tar, key, tar_member = newfile.split("|")
                     tarkey = "f5tar|" + key + "|"
-                    self.tars[tarkey].extract(tar_member, path=self.F5_TMP_DIR)
-                    newfile = os.path.join(self.F5_TMP_DIR, tar_member)
-                    f5 = Fast5(newfile)
-                    os.remove(newfile)
+                    if self.tar_in_memory:
+                        f5 = open_tar_member_fast5(self.tars[tarkey], tar_member, self.tars[tarkey].name, lazy=self.lazy_fast5)
+                    else:
+                        self.tars[tarkey].extract(tar_member, path=self.F5_TMP_DIR)
+                        newfile = os.path.join(self.F5_TMP_DIR, tar_member)
+                        f5 = Fast5(newfile)
+                        os.remove(newfile)
             else:
-                f5 = Fast5(newfile, filemode=self.filemode)
-            return f5
+                f5 = Fast5(newfile, filemode=self.filemode, lazy=self.lazy_fast5)
         
         except Exception as e:
             if self._tars_detected and os.path.exists(self.F5_TMP_DIR):
                 shutil.rmtree(self.F5_TMP_DIR)
             raise StopIteration
+        if self.expand_multi_read and not self.lazy_fast5 and f5.is_multi_read():
+            ## expand transparently: one open() for all reads in the file
+            self.multi_fast5 = MultiFast5(f5.filename, filemode=self.filemode, f5=f5.f5)
+            self.multi_reads = iter(self.multi_fast5)
+            return self.next()
+        return f5
         
            
 
@@ -1792,9 +2426,9 @@ class Fast5List(object):
         return files
 
     def _expand_tar(self, tarball):
-        if not self._tars_detected and not self.tar_filenames_only:
+        if not self._tars_detected and not self.tar_filenames_only and not self.tar_in_memory:
             self._initialize_tar_tmp_dir()
-        f = tarfile.open(tarball)
+        f = open_tar(tarball) if self.tar_filenames_only or self.keep_tar_footprint_small else tarfile.open(tarball)
         self.n_tars += 1
         if self.tar_filenames_only:
             files = [os.path.join(tarball,fname) for fname in f.getnames() if fname.endswith(".fast5")]
@@ -1812,6 +2446,58 @@ class Fast5List(object):
                 f.close()
         return files
 
+    def _iter_dir(self, d):
+        ## Same files as _expand_dir (glob skips hidden files), without building the list
+        if scandir is None:
+            entries = (name for name in os.listdir(d))
+        else:
+            entries = (entry.name for entry in scandir(d))
+        for name in entries:
+            if name.endswith(".fast5") and not name.startswith("."):
+                yield os.path.join(d, name)
+
+    def _iter_fofn(self, fofn):
+        ## Streaming version of _expand_fofn
+        f = open(fofn,'r')
+        for line in f:
+            fname = line.strip()
+            if fname.endswith(".fast5"):
+                yield fname
+            elif os.path.isdir(fname):
+                for e in self._iter_dir(fname):
+                    yield e
+            elif tarfile.is_tarfile(fname):
+                for e in self._iter_tar(fname):
+                    yield e
+        f.close()
+
+    def _iter_tar(self, tarball):
+        ## Tar member names come from the tar (or its index) all at once anyway; expand each tarball only once
+        if tarball not in self._expanded_tars:
+            self._expanded_tars[tarball] = self._expand_tar(tarball)
+        return iter(self._expanded_tars[tarball])
+
+    def _iter_fast5_files(self):
+        ## Lazy counterpart of _extract_fast5_files: yields entries in the same order
+        for e in self.fast5list:
+            if e.endswith(".fast5"):
+                yield e
+            elif e.endswith(".fofn"):
+                for f in self._iter_fofn(e):
+                    yield f
+            elif os.path.isdir(e):
+                for f in self._iter_dir(e):
+                    yield f
+            elif tarfile.is_tarfile(e):
+                for f in self._iter_tar(e):
+                    yield f
+
+    def _materialize_files(self):
+        ## lazy mode: build self.files for methods that need the whole list
+        if self.files is None:
+            self.files = list(self._iter_fast5_files())
+            self.nfiles = len(self.files)
+
     def _extract_fast5_files(self):
         ##TODO -- also handle FOFNs in list -- i.e. can take FOFN with or without mixture of others
         ##TODO -- handle compressed files, tarchives, etc
@@ -1839,55 +2525,127 @@ class Fast5List(object):
         self.nfiles = len(self.files)
         #self.allfiles = iter(self.files)
         self.iterfiles =  iter(self.files)
+        self._init_downsample()
+
+    def _init_downsample(self):
         if self.downsample:
             if self.random:
                 self.randomseed = self.randomseed if self.randomseed else randint(0,1000000)
             self.down_sample_iter_files(n=self.downsample, random=self.random, randomseed=self.randomseed, sort=True)
 
     def __len__(self):
+        if self.nfiles is None:
+            self.nfiles = sum(1 for e in self._iter_fast5_files())
         return self.nfiles
 
     def __eq__(self, other):
+        self._materialize_files()
+        other._materialize_files()
         return set(self.files) == set(other.files)
 
     def get_filenames(self):
+        self._materialize_files()
         return self.files
 
     def get_basenames(self):
-        return [os.path.basename(e) for e in self.files]
+        return [os.path.basename(e) for e in self.get_filenames()]
 
     def get_dirnames(self):
-        return [os.path.dirname(e) for e in self.files]
+        return [os.path.dirname(e) for e in self.get_filenames()]
 
 
     def get_sample(self, n=1, random=False, sort=True):
         ## This is used w/ a function called get_fast5_list in f5ops
-        files = self.files[:]
+        ## As in down_sample_iter_files, lazy lists are sampled in one pass (O(n) memory) -- the full file list is never built.
+        source = self.files if self.files is not None else self._iter_fast5_files()
         if random:
-            shuffle(files)
-        files = files[:n]
+            files, nseen = reservoir_sample(source, n)
+        else:
+            files = list(islice(source, n))
         if sort:
             files = sorted(files) ## Just trying to return the sampled, potentially random list as sorted
-        return Fast5List(files)
+        sample = Fast5List([f for f in files if not f.startswith("f5tar|")], filemode=self.filemode, expand_multi_read=self.expand_multi_read, lazy_fast5=self.lazy_fast5)
+        if len(sample) < len(files):
+            ## tarlite members: share the open tars (indexed ones are opened by seeking, not re-walking the archive)
+            sample.files = files
+            sample.nfiles = len(files)
+            sample.iterfiles = iter(files)
+            sample.tars = self.tars
+            sample.n_tars = self.n_tars
+            sample.tar_in_memory = self.tar_in_memory
+            sample.F5_TMP_DIR = self.F5_TMP_DIR
+            sample._tars_detected = self._tars_detected
+        return sample
 
     def down_sample_iter_files(self, n=1, random=False, randomseed=False, sort=True):
-        if n >= self.nfiles or n <= 0 or n is None or n is False: ## no downsampling possible, return all
+        ## Random samples are drawn with a single-pass reservoir sampler (O(n) memory),
+        ## so in lazy mode the full file list is never built.
+        if n <= 0 or n is None or n is False: ## no downsampling possible, return all
+            self.reset_iter_files()
+        elif self.files is not None and n >= self.nfiles:
             self.iterfiles =  iter(self.files)
         else:
-            self.downsampled_files = self.files[:]
+            source = self.files if self.files is not None else self._iter_fast5_files()
             if random:
-                if randomseed:
-                    seed(randomseed)
-                shuffle(self.downsampled_files)
-            self.downsampled_files = self.downsampled_files[:n]
-            if sort:
+                self.downsampled_files, nseen = reservoir_sample(source, n, randomseed)
+                if self.files is None:
+                    self.nfiles = nseen
+            else:
+                self.downsampled_files = list(islice(source, n))
+            if sort and (self.nfiles is None or n < self.nfiles):
                 ## Just trying to return the sampled, potentially random list as sorted
                 self.downsampled_files = sorted(self.downsampled_files)
             #print self.downsampled_files
             self.iterfiles =  iter(self.downsampled_files)
 
     def reset_iter_files(self):
-        self.iterfiles =  iter(self.files)
+        if self.files is None:
+            self.iterfiles = self._iter_fast5_files()
+        else:
+            self.iterfiles =  iter(self.files)
+
+    def _iter_imap_jobs(self, fn):
+        ## Consumes self.iterfiles (i.e. respects downsampling) the same way next() does.
+        ## Only paths (and tar member names) are sent to workers -- never open h5py/tarfile handles.
+        for newfile in self.iterfiles:
+            if self.keep_tar_footprint_small and newfile.startswith("f5tar|"):
+                f5tar, key, tar_member = newfile.split("|")
+                tarkey = "f5tar|" + key + "|"
+                tmpdir = None if self.tar_in_memory else os.path.abspath(self.F5_TMP_DIR)
+                yield (fn, self.expand_multi_read, tar_member, self.filemode, self.tars[tarkey].name, tmpdir)
+            else:
+                yield (fn, self.expand_multi_read, newfile, self.filemode, None, None)
+
+    def imap(self, fn, processes=None, ordered=True, chunksize=1):
+        ''' Parallel alternative to "for f5 in Fast5List(...)".
+            Fans file paths out to a pool of worker processes; each worker opens its own Fast5,
+            returns fn(f5), and closes the file. Results are streamed back (generator).
+            Multi-read files are handled by one worker, which calls fn on each of their reads.
+            fn          - must be picklable: a module-level function (or functools.partial of one), not a lambda.
+                          Like the serial loop, it is handed corrupt/empty files too, so it should check
+                          f5.is_not_corrupt() itself. Its return value must also be picklable.
+            processes   - number of worker processes. None uses all CPUs. 1 runs serially in this process.
+            ordered     - True yields results in input order; False yields them as they finish (faster).
+            chunksize   - number of files handed to a worker at a time.'''
+        if processes == 1:
+            for f5 in self:
+                try:
+                    yield fn(f5)
+                finally:
+                    f5.close()
+            return
+        pool = Pool(processes)
+        try:
+            mapper = pool.imap if ordered else pool.imap_unordered
+            for results in mapper(_fast5_imap_worker, self._iter_imap_jobs(fn), chunksize):
+                for result in results:
+                    yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            if self._tars_detected and os.path.exists(self.F5_TMP_DIR):
+                shutil.rmtree(self.F5_TMP_DIR)
 
 
 
@@ -1,5 +1,6 @@
 import numpy as np
 import pandas
+from fast5tools.summaryops import sort_lengths, nx_lx, expected_size, n_and_sum_gt
 
 class Fast5DataFrame(object):
     def __init__(self, df):
@@ -54,6 +55,8 @@ class Fast5DataFrame(object):
 ##        self.allfxn = [self.get_n_molecules,self.get_n_temp_only,self.get_n_comp,self.get_n_no_2d,self.get_n_comp_has_2d,self.get_n_comp_no_2d,self.get_n_2d,self.get_pct_temp_only,self.get_pct_has_comp,self.get_pct_has_2d,self.get_pct_no_2d,self.get_pct_no_2d_because_template_only,self.get_pct_no_2d_that_have_complement,self.get_pct_with_comp_that_has_2d,self.get_pct_with_comp_that_do_not_have_2d,self.get_sum_molecule_lengths,self.get_n_mol_gt,self.get_sum_mol_gt,self.get_pct_mol_gt,self.get_pct_data_from_mol_gt,self.get_mol_nx,self.get_mol_lx,self.get_expected_mol_len,self.get_mean_mol_len,self.get_median_mol_len,self.get_min_mol_len,self.get_max_mol_len,self.get_sum_2d_lengths,self.get_2d_nx,self.get_2d_lx,self.get_expected_2d_len,self.get_mean_2d_len,self.get_median_2d_len,self.get_min_2d_len,self.get_max_2d_len,self.get_sum_temp_lengths,self.get_temp_nx,self.get_temp_lx,self.get_expected_temp_len,self.get_mean_temp_len,self.get_median_temp_len,self.get_min_temp_len,self.get_max_temp_len,self.get_sum_comp_lengths,self.get_comp_nx,self.get_comp_lx,self.get_expected_comp_len,self.get_mean_comp_len,self.get_median_comp_len,self.get_min_comp_len,self.get_max_comp_len]
         self.fxn_header = ["n_molecules","n_temp","n_temp_only","n_comp","n_no_2d","n_comp_has_2d","n_comp_no_2d","n_2d","pct_temp_only","pct_has_comp","pct_has_2d","pct_no_2d","pct_no_2d_because_template_only","pct_no_2d_that_have_complement","pct_with_comp_that_has_2d","pct_with_comp_that_do_not_have_2d","sum_molecule_lengths","n_mol_gt","sum_mol_gt","pct_mol_gt","pct_data_from_mol_gt","mol_nx","mol_lx","expected_mol_len","mean_mol_len","median_mol_len","min_mol_len","q_of_min_mol_len","max_mol_len","q_of_max_mol_len","mean_mol_q","median_mol_q","min_mol_q","len_of_min_mol_q","max_mol_q","len_of_max_mol_q","sum_2d_lengths","n_2d_gt","sum_2d_gt","pct_2d_gt","pct_2ddata_from_2d_gt","2d_nx","2d_lx","expected_2d_len","mean_2d_len","median_2d_len","min_2d_len","q_of_min_2d_len","max_2d_len","q_of_max_2d_len","mean_2d_q","median_2d_q","min_2d_q","len_of_min_2d_q","max_2d_q","len_of_max_2d_q","sum_temp_lengths","n_temp_gt","sum_temp_gt","pct_temp_gt","pct_tempdata_from_temp_gt","temp_nx","temp_lx","expected_temp_len","mean_temp_len","median_temp_len","min_temp_len","q_of_min_temp_len","max_temp_len","q_of_max_temp_len","mean_temp_q","median_temp_q","min_temp_q","len_of_min_temp_q","max_temp_q","len_of_max_temp_q","sum_comp_lengths","n_comp_gt","sum_comp_gt","pct_comp_gt","pct_compdata_from_comp_gt","comp_nx","comp_lx","expected_comp_len","mean_comp_len","median_comp_len","min_comp_len","q_of_min_comp_len","max_comp_len","q_of_max_comp_len","mean_comp_q","median_comp_q","min_comp_q","len_of_min_comp_q","max_comp_q","len_of_max_comp_q"]
         self.allfxn = [self.get_n_molecules,self.get_n_temp,self.get_n_temp_only,self.get_n_comp,self.get_n_no_2d,self.get_n_comp_has_2d,self.get_n_comp_no_2d,self.get_n_2d,self.get_pct_temp_only,self.get_pct_has_comp,self.get_pct_has_2d,self.get_pct_no_2d,self.get_pct_no_2d_because_template_only,self.get_pct_no_2d_that_have_complement,self.get_pct_with_comp_that_has_2d,self.get_pct_with_comp_that_do_not_have_2d,self.get_sum_molecule_lengths,self.get_n_mol_gt,self.get_sum_mol_gt,self.get_pct_mol_gt,self.get_pct_data_from_mol_gt,self.get_mol_nx,self.get_mol_lx,self.get_expected_mol_len,self.get_mean_mol_len,self.get_median_mol_len,self.get_min_mol_len,self.get_q_of_min_mol_len,self.get_max_mol_len,self.get_q_of_max_mol_len,self.get_mean_mol_q,self.get_median_mol_q,self.get_min_mol_q,self.get_len_of_min_mol_q,self.get_max_mol_q,self.get_len_of_max_mol_q,self.get_sum_2d_lengths,self.get_n_2d_gt,self.get_sum_2d_gt,self.get_pct_2d_gt,self.get_pct_2ddata_from_2d_gt,self.get_2d_nx,self.get_2d_lx,self.get_expected_2d_len,self.get_mean_2d_len,self.get_median_2d_len,self.get_min_2d_len,self.get_q_of_min_2d_len,self.get_max_2d_len,self.get_q_of_max_2d_len,self.get_mean_2d_q,self.get_median_2d_q,self.get_min_2d_q,self.get_len_of_min_2d_q,self.get_max_2d_q,self.get_len_of_max_2d_q,self.get_sum_temp_lengths,self.get_n_temp_gt,self.get_sum_temp_gt,self.get_pct_temp_gt,self.get_pct_tempdata_from_temp_gt,self.get_temp_nx,self.get_temp_lx,self.get_expected_temp_len,self.get_mean_temp_len,self.get_median_temp_len,self.get_min_temp_len,self.get_q_of_min_temp_len,self.get_max_temp_len,self.get_q_of_max_temp_len,self.get_mean_temp_q,self.get_median_temp_q,self.get_min_temp_q,self.get_len_of_min_temp_q,self.get_max_temp_q,self.get_len_of_max_temp_q,self.get_sum_comp_lengths,self.get_n_comp_gt,self.get_sum_comp_gt,self.get_pct_comp_gt,self.get_pct_compdata_from_comp_gt,self.get_comp_nx,self.get_comp_lx,self.get_expected_comp_len,self.get_mean_comp_len,self.get_median_comp_len,self.get_min_comp_len,self.get_q_of_min_comp_len,self.get_max_comp_len,self.get_q_of_max_comp_len,self.get_mean_comp_q,self.get_median_comp_q,self.get_min_comp_q,self.get_len_of_min_comp_q,self.get_max_comp_q,self.get_len_of_max_comp_q]
+        self.sorted_lengths = {}
+        self.lengths_q_ge = {}
         self.bool_mol_len_gt = {}
         self.bool_mol_q_ge = {}
         self.n_mol_gt = {}
@@ -99,32 +102,32 @@ class Fast5DataFrame(object):
     
     def get_n_temp_only(self):
         if self.n_temp_only is None:
-            self.n_temp_only = sum(self.temponly)
+            self.n_temp_only = self.temponly.values.sum()
         return self.n_temp_only
     
     def get_n_comp(self):
         if self.n_comp is None:
-            self.n_comp = sum(self.hascomp)
+            self.n_comp = self.hascomp.values.sum()
         return self.n_comp
     
     def get_n_no_2d(self):
         if self.n_no_2d is None:
-            self.n_no_2d = sum(self.no2d)
+            self.n_no_2d = self.no2d.values.sum()
         return self.n_no_2d
     
     def get_n_comp_has_2d(self): #should be same as number with 2d
         if self.n_comp_has_2d is None:
-            self.n_comp_has_2d = sum(self.hascomp[self.has2d])
+            self.n_comp_has_2d = (self.hascomp & self.has2d).values.sum()
         return self.n_comp_has_2d
     
     def get_n_comp_no_2d(self):
         if self.n_comp_no_2d is None:
-            self.n_comp_no_2d = sum(self.hascomp[self.no2d])
+            self.n_comp_no_2d = (self.hascomp & self.no2d).values.sum()
         return self.n_comp_no_2d
     
     def get_n_2d(self):
         if self.n_2d is None:
-            self.n_2d = sum(self.has2d)
+            self.n_2d = self.has2d.values.sum()
         return self.n_2d
     
     def get_pct_temp_only(self):
@@ -156,22 +159,14 @@ class Fast5DataFrame(object):
 ############################################################ 
     def get_sum_molecule_lengths(self):
         if self.sum_molecule_lengths is None:
-            self.sum_molecule_lengths = sum(self.df['mol_len'])
+            self.sum_molecule_lengths = np.sum(self.df['mol_len'].values)
         return self.sum_molecule_lengths
 
     def get_n_mol_gt(self, size=50e3, q=0):
-        try:
-            return self.n_mol_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='mol', force_redo = True)
-            return self.n_mol_gt[size][q]
+        return self._get_n_and_sum_gt('mol', size, q)[0]
 
     def get_sum_mol_gt(self, size=50e3, q=0):
-        try:
-            return self.sum_mol_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='mol', force_redo = True)
-            return self.sum_mol_gt[size][q]
+        return self._get_n_and_sum_gt('mol', size, q)[1]
 
     def get_pct_mol_gt(self, size=50e3,q=0):
         return 100.0*self.get_n_mol_gt(size,q)/self.get_n_molecules()
@@ -181,7 +176,7 @@ class Fast5DataFrame(object):
 
     def get_mol_nx(self, x=[25,50,75], force_redo=False):
         if self.nx_mol is None or force_redo:
-            self.nx_mol, self.lx_mol = self.NX(self.df['mol_len'], x=x, G=self.get_sum_molecule_lengths())
+            self.nx_mol, self.lx_mol = nx_lx(self._get_sorted_lengths('mol'), x=x, G=self.get_sum_molecule_lengths())
         return self.nx_mol
 
     def get_mol_lx(self, x=[25,50,75]):
@@ -191,7 +186,7 @@ class Fast5DataFrame(object):
 
     def get_expected_mol_len(self):
         if self.exp_mol_len is None:
-            self.exp_mol_len = self.e_size(self.df['mol_len'], G = self.get_sum_molecule_lengths())
+            self.exp_mol_len = expected_size(self._get_sorted_lengths('mol'), G = self.get_sum_molecule_lengths())
         return self.exp_mol_len
         
 
@@ -274,18 +269,10 @@ class Fast5DataFrame(object):
         return self.sum_2d_lengths
 
     def get_n_2d_gt(self, size=50e3, q=0):
-        try:
-            return self.n_2d_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='2d', force_redo = True)
-            return self.n_2d_gt[size][q]
+        return self._get_n_and_sum_gt('2d', size, q)[0]
 
     def get_sum_2d_gt(self, size=50e3, q=0):
-        try:
-            return self.sum_2d_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='2d', force_redo = True)
-            return self.sum_2d_gt[size][q]
+        return self._get_n_and_sum_gt('2d', size, q)[1]
 
     def get_pct_2d_gt(self, size=50e3,q=0):
         return 100.0*self.get_n_2d_gt(size,q)/self.get_n_2d()
@@ -295,20 +282,17 @@ class Fast5DataFrame(object):
 
     def get_2d_nx(self, x=[25,50,75], force_redo=False):
         if self.nx_2d is None or force_redo:
-            l = self.df['2d_len'][self.df['2d_len'].notnull()]
-            self.nx_2d, self.lx_2d = self.NX(l, x=x, G=self.get_sum_2d_lengths())
+            self.nx_2d, self.lx_2d = nx_lx(self._get_sorted_lengths('2d'), x=x, G=self.get_sum_2d_lengths())
         return self.nx_2d
 
     def get_2d_lx(self, x=[25,50,75]):
         if self.nx_2d is None:
-            l = self.df['2d_len'][self.df['2d_len'].notnull()]
-            self.nx_2d, self.lx_2d = self.NX(l, x=x, G=self.get_sum_2d_lengths())
+            self.nx_2d, self.lx_2d = nx_lx(self._get_sorted_lengths('2d'), x=x, G=self.get_sum_2d_lengths())
         return self.lx_2d
 
     def get_expected_2d_len(self):
         if self.exp_2d_len is None:
-            l = self.df['2d_len'][self.df['2d_len'].notnull()]
-            self.exp_2d_len = self.e_size(l, G = self.get_sum_2d_lengths())
+            self.exp_2d_len = expected_size(self._get_sorted_lengths('2d'), G = self.get_sum_2d_lengths())
         return self.exp_2d_len
         
 
@@ -390,18 +374,10 @@ class Fast5DataFrame(object):
         return self.sum_temp_lengths
 
     def get_n_temp_gt(self, size=50e3, q=0):
-        try:
-            return self.n_temp_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='temp', force_redo = True)
-            return self.n_temp_gt[size][q]
+        return self._get_n_and_sum_gt('temp', size, q)[0]
 
     def get_sum_temp_gt(self, size=50e3, q=0):
-        try:
-            return self.sum_temp_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='temp', force_redo = True)
-            return self.sum_temp_gt[size][q]
+        return self._get_n_and_sum_gt('temp', size, q)[1]
 
     def get_pct_temp_gt(self, size=50e3,q=0):
         return 100.0*self.get_n_temp_gt(size,q)/self.get_n_temp()
@@ -411,20 +387,17 @@ class Fast5DataFrame(object):
 
     def get_temp_nx(self, x=[25,50,75], force_redo=False):
         if self.nx_temp is None or force_redo:
-            l = self.df['temp_len'][self.df['temp_len'].notnull()]
-            self.nx_temp, self.lx_temp = self.NX(l, x=x, G=self.get_sum_temp_lengths())
+            self.nx_temp, self.lx_temp = nx_lx(self._get_sorted_lengths('temp'), x=x, G=self.get_sum_temp_lengths())
         return self.nx_temp
 
     def get_temp_lx(self,x=[25,50,75]):
         if self.nx_temp is None:
-            l = self.df['temp_len'][self.df['temp_len'].notnull()]
-            self.nx_temp, self.lx_temp = self.NX(l, x=x, G=self.get_sum_temp_lengths())
+            self.nx_temp, self.lx_temp = nx_lx(self._get_sorted_lengths('temp'), x=x, G=self.get_sum_temp_lengths())
         return self.lx_temp
 
     def get_expected_temp_len(self):
         if self.exp_temp_len is None:
-            l = self.df['temp_len'][self.df['temp_len'].notnull()]
-            self.exp_temp_len = self.e_size(l, G = self.get_sum_temp_lengths())
+            self.exp_temp_len = expected_size(self._get_sorted_lengths('temp'), G = self.get_sum_temp_lengths())
         return self.exp_temp_len
         
 
@@ -506,18 +479,10 @@ class Fast5DataFrame(object):
         return self.sum_comp_lengths
 
     def get_n_comp_gt(self, size=50e3, q=0):
-        try:
-            return self.n_comp_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='comp', force_redo = True)
-            return self.n_comp_gt[size][q]
+        return self._get_n_and_sum_gt('comp', size, q)[0]
 
     def get_sum_comp_gt(self, size=50e3, q=0):
-        try:
-            return self.sum_comp_gt[size][q]
-        except:
-            self._define_bools(size=size, q=q, read_type='comp', force_redo = True)
-            return self.sum_comp_gt[size][q]
+        return self._get_n_and_sum_gt('comp', size, q)[1]
 
     def get_pct_comp_gt(self, size=50e3,q=0):
         return 100.0*self.get_n_comp_gt(size,q)/self.get_n_comp()
@@ -527,20 +492,17 @@ class Fast5DataFrame(object):
 
     def get_comp_nx(self, x=[25,50,75], force_redo=False):
         if self.nx_comp is None or force_redo:
-            l = self.df['comp_len'][self.df['comp_len'].notnull()]
-            self.nx_comp, self.lx_comp = self.NX(l, x=x, G=self.get_sum_comp_lengths())
+            self.nx_comp, self.lx_comp = nx_lx(self._get_sorted_lengths('comp'), x=x, G=self.get_sum_comp_lengths())
         return self.nx_comp
 
     def get_comp_lx(self,x=[25,50,75]):
         if self.nx_comp is None:
-            l = self.df['comp_len'][self.df['comp_len'].notnull()]
-            self.nx_comp, self.lx_comp = self.NX(l, x=x, G=self.get_sum_comp_lengths())
+            self.nx_comp, self.lx_comp = nx_lx(self._get_sorted_lengths('comp'), x=x, G=self.get_sum_comp_lengths())
         return self.lx_comp
 
     def get_expected_comp_len(self):
         if self.exp_comp_len is None:
-            l = self.df['comp_len'][self.df['comp_len'].notnull()]
-            self.exp_comp_len = self.e_size(l, G = self.get_sum_comp_lengths())
+            self.exp_comp_len = expected_size(self._get_sorted_lengths('comp'), G = self.get_sum_comp_lengths())
         return self.exp_comp_len
         
 
@@ -654,6 +616,26 @@ class Fast5DataFrame(object):
 ############################################
 ##'''tools'''
 ############################################
+    def _get_sorted_lengths(self, read_type, with_q=False):
+        ''' Lengths of read_type (without NaNs) sorted ascending -- and with_q, their quality scores in the same order.
+            Each length column is sorted once; NX/LX, expected size and the gt counts/sums are all computed from it.'''
+        if read_type not in self.sorted_lengths:
+            self.sorted_lengths[read_type] = sort_lengths(self.df[read_type+'_len'].values, self.df[read_type+'_q'].values)
+        if with_q:
+            return self.sorted_lengths[read_type]
+        return self.sorted_lengths[read_type][0]
+
+    def _get_n_and_sum_gt(self, read_type, size, q=0):
+        ''' (number, sum) of read_type lengths > size among reads with quality >= q.
+            The lengths with quality >= q (still sorted) and their cumulative sum are made once per q; each size is then a binary search.'''
+        if (read_type, q) not in self.lengths_q_ge:
+            lengths, quals = self._get_sorted_lengths(read_type, with_q=True)
+            with np.errstate(invalid='ignore'):
+                lengths = lengths[quals >= q]
+            self.lengths_q_ge[(read_type, q)] = lengths, np.cumsum(lengths)
+        lengths, cumsum = self.lengths_q_ge[(read_type, q)]
+        return n_and_sum_gt(lengths, cumsum, size)
+
     def get_min(self,l):
         idx = l.idxmin()
         m = l[idx]
@@ -685,27 +667,10 @@ class Fast5DataFrame(object):
         Assumes all values in list x are between 0 and 100.
         Interpretation: When NX = NX_value, X% of data (in bp) is contained in reads at least NX_value bp long.
         """
-	if G:
-            l = sorted(list(l[:]))
-            x = sorted(list(x[:]))
-            nxsum = 0
-            L = 0
-            nxvalues = {e:0 for e in x}
-            lxvalues = {e:0 for e in x}
-            for e in x:
-                    xpct = G*e/100.0
-                    while nxsum < xpct and l:
-                            nxsum += l[-1]
-                            L += 1
-                            lastsize = l.pop()
-                    nxvalues[e] = lastsize
-                    lxvalues[e] = L
-            return nxvalues, lxvalues
+        return nx_lx(sort_lengths(l), x=x, G=G)
 
     def e_size(self, l,G=False):
-        if not G:
-            G = sum(l)
-        return sum([e**2 for e in list(l)])/float(G)
+        return expected_size(l, G=G)
         
     def n_lengths_gt(self, l, size):
         #l from df
@@ -0,0 +1,181 @@
+## Repacking single-read fast5 files into multi-read containers (and splitting them back).
+## Layout follows the multi-read files MultiFast5 reads:
+##   /read_<read_id>/{Analyses, Raw, channel_id, context_tags, tracking_id, ...}
+## Single-read root attributes (file_version) and the original file name are kept on the read group
+## so that split_multi_read_file() can restore the single-read files.
+
+import os, h5py
+from fast5tools.f5class import *
+
+SOURCE_FILENAME_ATTR = "fast5tools_source_filename"
+
+
+def copy_hdf5_attrs(src, dst):
+    for key, value in src.attrs.items():
+        dst.attrs[key] = value
+
+def copy_hdf5_object(src, dst, name, compression=None, compression_opts=None):
+    ''' Copies group/dataset src (with all attributes) to dst/name.
+        With compression (gzip, lzf), non-scalar datasets are re-written chunked and compressed;
+        otherwise the HDF5 objects are copied as they are.'''
+    if compression is None:
+        src.file.copy(src, dst, name=name)
+    elif isinstance(src, h5py.Group):
+        group = dst.require_group(name)
+        copy_hdf5_attrs(src, group)
+        for key in src.keys():
+            link = src.get(key, getlink=True)
+            if isinstance(link, (h5py.SoftLink, h5py.ExternalLink)):
+                ## keep links as links (some are dangling in older files), like h5py's copy does
+                group[key] = link
+            else:
+                copy_hdf5_object(src[key], group, key, compression, compression_opts)
+    elif src.shape == () or src.size == 0:
+        ## scalar/empty datasets (e.g. Fastq strings) cannot be chunked
+        src.file.copy(src, dst, name=name)
+    else:
+        dataset = dst.create_dataset(name, data=src[()], chunks=True, compression=compression, compression_opts=compression_opts)
+        copy_hdf5_attrs(src, dataset)
+
+def get_single_read_id(f5):
+    ''' read_id of a single-read Fast5 -- falls back on the file basename for files that do not store one.'''
+    for fxn in (f5.get_raw_read_id, f5.get_read_id):
+        try:
+            return str(fxn())
+        except:
+            pass
+    return f5.filebasename
+
+def add_single_read_to_multi(f5, multi, compression=None, compression_opts=None):
+    ''' Copies an open single-read Fast5 into read_<read_id> of the open (writable) h5py file multi.
+        Returns the read group name.'''
+    read_name = MULTI_READ_PREFIX + get_single_read_id(f5)
+    if read_name in multi:
+        read_name = MULTI_READ_PREFIX + f5.filebasename
+    group = multi.create_group(read_name)
+    copy_hdf5_attrs(f5.f5, group)
+    group.attrs[SOURCE_FILENAME_ATTR] = os.path.basename(f5.filename)
+    for key in f5.f5.keys():
+        if key == "UniqueGlobalKey":
+            for sub in f5.f5[key].keys():
+                copy_hdf5_object(f5.f5[key][sub], group, sub, compression, compression_opts)
+        elif key == "Raw":
+            ## Raw/Reads/Read_N -> Raw (the read number is also in its read_number attribute)
+            reads = f5.f5["Raw/Reads"]
+            copy_hdf5_object(reads[reads.keys()[0]], group, "Raw", compression, compression_opts)
+        else:
+            copy_hdf5_object(f5.f5[key], group, key, compression, compression_opts)
+    return read_name
+
+def write_multi_read_file(outname, fast5list, compression=None, compression_opts=None):
+    ''' Writes every single-read file of fast5list (anything Fast5List takes) into the multi-read file outname.
+        Corrupt/unreadable files and reads of multi-read inputs are skipped.
+        Returns number of reads written.'''
+    multi = h5py.File(outname, 'w')
+    multi.attrs["file_version"] = "2.0"
+    multi.attrs["file_type"] = "multi-read"
+    n = 0
+    for f5 in Fast5List(fast5list, expand_multi_read=False):
+        if f5.is_not_corrupt() and not f5.is_multi_read():
+            add_single_read_to_multi(f5, multi, compression, compression_opts)
+            n += 1
+        f5.close()
+    multi.close()
+    return n
+
+def create_single_read_file(outdir, basename, read_name):
+    ''' Creates (never overwrites) outdir/basename, or -- when that is taken, e.g. by another read packed from a file
+        of the same basename or by a parallel split into outdir -- outdir/<stem>.<read_id>.fast5, then <stem>.<read_id>.<n>.fast5.
+        Returns (outname, open h5py file).'''
+    stem = os.path.splitext(basename)[0]
+    read_id = read_name[len(MULTI_READ_PREFIX):]
+    n = 0
+    while True:
+        if n == 0:
+            outname = os.path.join(outdir, basename)
+        elif n == 1:
+            outname = os.path.join(outdir, stem + "." + read_id + ".fast5")
+        else:
+            outname = os.path.join(outdir, stem + "." + read_id + "." + str(n-1) + ".fast5")
+        try:
+            return outname, h5py.File(outname, 'w-')
+        except IOError:
+            if not os.path.exists(outname):
+                raise
+        n += 1
+
+def split_multi_read_file(filename, outdir, compression=None, compression_opts=None):
+    ''' Writes each read of multi-read file filename into its own single-read fast5 in outdir.
+        Files are named after the file they were packed from (or read_<id>.fast5); existing files are never overwritten
+        (see create_single_read_file).
+        Returns list of files written.'''
+    multi = h5py.File(filename, 'r')
+    written = []
+    for read_name in multi.keys():
+        if not read_name.startswith(MULTI_READ_PREFIX):
+            continue
+        group = multi[read_name]
+        basename = group.attrs.get(SOURCE_FILENAME_ATTR, read_name + ".fast5")
+        outname, single = create_single_read_file(outdir, basename, read_name)
+        for key, value in group.attrs.items():
+            if key != SOURCE_FILENAME_ATTR:
+                single.attrs[key] = value
+        for key in group.keys():
+            if key in ("channel_id", "context_tags", "tracking_id"):
+                copy_hdf5_object(group[key], single.require_group("UniqueGlobalKey"), key, compression, compression_opts)
+            elif key == "Raw":
+                reads = single.require_group("Raw/Reads")
+                copy_hdf5_object(group[key], reads, "Read_" + str(group[key].attrs["read_number"]), compression, compression_opts)
+            else:
+                copy_hdf5_object(group[key], single, key, compression, compression_opts)
+        single.close()
+        written.append(outname)
+    multi.close()
+    return written
+
+def _write_multi_read_file_job(job):
+    ## Pool.imap work unit: job = (outname, files, compression, compression_opts)
+    return job[0], write_multi_read_file(*job)
+
+def _split_multi_read_file_job(job):
+    ## Pool.imap work unit: job = (filename, outdir, compression, compression_opts)
+    return job[0], len(split_multi_read_file(*job))
+
+def get_repack_input_files(fast5list):
+    ## Tar members cannot be handed to worker processes by name -- extract tarballs first
+    files = Fast5List(fast5list, expand_multi_read=False).get_filenames()
+    if any(f.startswith("f5tar|") for f in files):
+        logger.warning("Skipping fast5 files inside tarballs -- extract them first.")
+    return [f for f in files if not f.startswith("f5tar|")]
+
+def repack_to_multi_read(fast5list, outdir, prefix="multi", reads_per_file=4000, processes=1, compression=None, compression_opts=None):
+    ''' Packs the single-read files in fast5list (files, dirs, FOFNs) into multi-read files
+        outdir/<prefix>_<i>.fast5 with up to reads_per_file reads each, writing processes files at a time.
+        Yields (multi-read file name, number of reads written) as files finish, in order.'''
+    files = get_repack_input_files(fast5list)
+    jobs = []
+    for i in range(0, len(files), reads_per_file):
+        outname = os.path.join(outdir, prefix + "_" + str(i/reads_per_file) + ".fast5")
+        jobs.append( (outname, files[i:i+reads_per_file], compression, compression_opts) )
+    return _run_jobs(_write_multi_read_file_job, jobs, processes)
+
+def split_to_single_read(fast5list, outdir, processes=1, compression=None, compression_opts=None):
+    ''' Splits the multi-read files in fast5list into single-read files in outdir.
+        Yields (multi-read file name, number of reads written).'''
+    files = get_repack_input_files(fast5list)
+    jobs = [(filename, outdir, compression, compression_opts) for filename in files]
+    return _run_jobs(_split_multi_read_file_job, jobs, processes)
+
+def _run_jobs(worker, jobs, processes):
+    if processes == 1:
+        for job in jobs:
+            yield worker(job)
+        return
+    pool = Pool(processes)
+    try:
+        for result in pool.imap(worker, jobs):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -1,8 +1,11 @@
 ## JOHN URBAN (2015, 2016)
 
-import os
+import os, zlib
+import numpy as np
+from functools import partial
 from random import shuffle, seed
 from fast5tools.f5class import *
+from fast5tools.bamops import encode_unaligned_record, typed_tag_value
 
 ##
 #### fast5tofastx.py,
@@ -108,6 +111,8 @@ def get_fast5tofastx_output_fxn(outtype):
     elif outtype == "qual_readstatsname_with_filename":
         output = qual_readstatsname_with_filename
     #
+    elif outtype == "bam":
+        output = bam
     return output
 
 def get_fast5tofastx_readtype_fxn(readtype):
@@ -239,12 +244,10 @@ def get_single_read(f5, readtype, minlen, maxlen, minq, maxq, output, *args, **k
         minlen/maxlen - integers.
         minq/maxq - floats
         output is a function'''
-    if f5.has_read(readtype):
-        if f5.get_seq_len(readtype) >= minlen and f5.get_seq_len(readtype) <= maxlen:
-            if f5.get_mean_qscore(readtype) >= minq and f5.get_mean_qscore(readtype) <= maxq:
-                if kwargs['comments']:
-                    kwargs['comments'] = get_comments(kwargs['comments'], f5, readtype, kwargs['samflag'])
-                return output(f5, readtype, *args, **kwargs)
+    if f5.has_read(readtype) and meets_length_and_quality(f5, readtype, minlen, maxlen, minq, maxq):
+        if kwargs['comments']:
+            kwargs['comments'] = get_comments(kwargs['comments'], f5, readtype, kwargs['samflag'])
+        return output(f5, readtype, *args, **kwargs)
 
 def get_template_read(f5, minlen, maxlen, minq, maxq, output, *args, **kwargs):
     return get_single_read(f5, "template", minlen, maxlen, minq, maxq, output, *args, **kwargs)
@@ -263,13 +266,57 @@ def get_molequal_read(f5, minlen, maxlen, minq, maxq, output, *args, **kwargs):
 
 
 def get_all_reads(f5, minlen, maxlen, minq, maxq, output, *args, **kwargs):
+    sep = "" if output is bam else "\n" ## bam records are binary: concatenated as they are
     allreads = ""
     for readtype in ["template", "complement", "2d"]:
         try:
-            allreads += get_single_read(f5, readtype, minlen, maxlen, minq, maxq, output, *args, **kwargs) + '\n'
+            allreads += get_single_read(f5, readtype, minlen, maxlen, minq, maxq, output, *args, **kwargs) + sep
         except:
             pass
-    return allreads.rstrip()
+    return allreads if output is bam else allreads.rstrip()
+
+
+#### fast5tofastx.py, -- per-file work unit for Fast5List.imap()
+def fast5tofastx_read(f5, getread, output, minlen, maxlen, minq, maxq, comments=False, falcon_i=None, samflag=''):
+    ''' Returns the formatted read(s) for f5, or None if the file is corrupt/empty or fails the filters.
+        Module-level (with getread/output from above) so it can be given to Fast5List.imap via functools.partial.'''
+    if f5.is_not_corrupt() and f5.is_nonempty():
+        return getread(f5, minlen, maxlen, minq, maxq, output, comments=comments, falcon_i=falcon_i, samflag=samflag)
+
+SHARD_KEY_FXNS = {'channel': lambda f5: f5.get_channel_number(),
+                  'run_id': lambda f5: f5.get_run_id()}
+
+def fast5tofastx_keyed_read(f5, shard_by=None, **kwargs):
+    ''' Returns (shard key, read) -- fast5tofastx_read(f5, **kwargs) with the output shard it goes to
+        for fast5tofastx.py --shard_by (channel or run_id; None when shard_by is None or there is no read).'''
+    read = fast5tofastx_read(f5, **kwargs)
+    if read and shard_by is not None:
+        return SHARD_KEY_FXNS[shard_by](f5), read
+    return None, read
+
+
+
+#### simulated raw signal -- per-file work unit for Fast5List.imap()
+def add_simulated_raw_data_read(f5, readtype="template", dtype='float16', force=False, from_input_events=True, add_flanking_signal=False, hairpin_flank=5, seed=None, chunksize=65536):
+    ''' Adds simulated raw signal to f5 (see Fast5.add_simulated_raw_data_f5).
+        Returns (f5.abspath, None) when the signal was written, or (f5.abspath, reason) when f5 was skipped.
+        With a seed, each file draws from its own stream seeded with (seed, crc32 of its basename),
+        so signals are reproducible whatever the file order or number of processes.'''
+    if not (f5.is_not_corrupt() and f5.is_nonempty()):
+        return f5.abspath, "corrupt or empty file"
+    rng = None if seed is None else [seed, zlib.crc32(f5.filebasename) & 0xffffffff]
+    try:
+        if f5.add_simulated_raw_data_f5(readtype, dtype, force, from_input_events, add_flanking_signal, hairpin_flank, rng=rng, chunksize=chunksize):
+            return f5.abspath, None
+        return f5.abspath, "raw signal already exists"
+    except Exception as e:
+        return f5.abspath, type(e).__name__ + ": " + str(e)
+
+def add_simulated_raw_data(fast5list, processes=1, **kwargs):
+    ''' Batch version of Fast5.add_simulated_raw_data_f5 over fast5list (a Fast5List made with filemode='r+'),
+        run in processes worker processes (see Fast5List.imap). kwargs are those of add_simulated_raw_data_read.
+        Yields (abspath, None or the reason the file was skipped) for each file, in input order.'''
+    return fast5list.imap(partial(add_simulated_raw_data_read, **kwargs), processes=processes)
 
 
 
@@ -369,6 +416,41 @@ def qual_readstatsname_with_abspath(f5, readtype, *args, **kwargs):
 def intqual(f5, readtype, *args, **kwargs):
     return f5.get_quals_as_int(readtype)
 
+## BAM tags for the key:value fields of the comments made by get_comments (lower case: tags reserved for users by the SAM spec).
+## Event stats keys are prefixed by the read type (e.g. template_skips), which is removed before lookup.
+## (tag, type) of each field of the naming schemes -- types are fixed per field, not guessed from values:
+## identifiers (asic, run, device, ...) are always Z, even when they look like numbers (asic ids can exceed int32, run ids can parse as floats);
+## times stay Z as float32 cannot hold them exactly.
+COMMENT_FIELD_TAGS = {'readtype':('rt','Z'), 'len':('ln','i'), 'Q':('qs','f'), 'channel':('ch','i'), 'Read':('rn','i'),
+                      'asic':('ai','Z'), 'run':('ri','Z'), 'device':('di','Z'), 'model':('mo','Z'), 'filename':('fn','Z'),
+                      'events':('ne','i'), 'calledevents':('nc','i'), 'skips':('nk','i'), 'stays':('ny','i'), 'steps':('np','i'),
+                      'prop_skips':('pk','f'), 'prop_stays':('py','f'), 'prop_steps':('pp','f'),
+                      'skip_prob':('kp','f'), 'stay_prob':('yp','f'), 'step_prob':('tp','f'),
+                      'start_time':('st','Z'), 'time_length':('tl','Z'), 'raw_duration':('rd','i')}
+
+def get_comment_bam_tags(comments, readtype, samflag=''):
+    ''' Returns [(tag, type, value)] for comments (as made by get_comments):
+        with samflag, one F5:Z tag holding the comments -- the tag an aligner copying fastq comments (e.g. minimap2 -y) would give;
+        comments made of the "|"-separated key:value fields of the f5 naming schemes (pore_info, read_stats, ...): one tag per field, typed as in COMMENT_FIELD_TAGS;
+        anything else (free text, file paths): one CO:Z tag.'''
+    if not comments:
+        return []
+    if samflag and comments.startswith(samflag):
+        return [('F5', 'Z', comments[len(samflag):])]
+    fields = comments.split("|")
+    if fields[0] in ("template", "complement", "2d"):
+        fields[0] = "readtype:" + fields[0]
+    keys = [field.split(":", 1)[0] for field in fields]
+    keys = [key[len(readtype):].lstrip("_") if key.startswith(readtype) and key != readtype else key for key in keys]
+    if not all(":" in field and key in COMMENT_FIELD_TAGS for field, key in zip(fields, keys)):
+        return [('CO', 'Z', comments)]
+    return [(COMMENT_FIELD_TAGS[key][0],) + typed_tag_value(COMMENT_FIELD_TAGS[key][1], field.split(":", 1)[1]) for field, key in zip(fields, keys)]
+
+def bam(f5, readtype, *args, **kwargs):
+    ''' Unaligned BAM record (bamops.encode_unaligned_record) named with the pore_info name, comments as tags (get_comment_bam_tags).'''
+    tags = get_comment_bam_tags(kwargs['comments'], readtype, kwargs.get('samflag', ''))
+    return encode_unaligned_record(f5.get_pore_info_name(readtype), f5.get_seq(readtype), f5.get_int_quals(readtype), tags)
+
 def oldfalcon(f5, readtype, *args, **kwargs):
     return f5.get_falcon_fasta(readtype, zmw_num=kwargs['falcon_i'], style="old")
 
@@ -415,17 +497,46 @@ def define_read_type(f5, readtype):
         else:
             return readtype
 
+def meets_length_and_quality(f5, readtype, minlen, maxlen, minq, maxq):
+    ''' Length and mean qscore filters, read from the memoized Summary attributes of readtype (Fast5.get_summary).'''
+    summary = f5.get_summary(readtype)
+    return minlen <= summary["sequence_length"] <= maxlen and minq <= summary["mean_qscore"] <= maxq
+
 def meets_all_criteria(f5, readtype, minlen, maxlen, minq, maxq):
     if f5.is_not_corrupt() and f5.is_nonempty():
         readtype = define_read_type(f5, readtype)
         if f5.has_read(readtype):
-            if f5.get_seq_len(readtype) >= minlen and f5.get_seq_len(readtype) <= maxlen:
-                if f5.get_mean_qscore(readtype) >= minq and f5.get_mean_qscore(readtype) <= maxq:
-                    return True
+            if meets_length_and_quality(f5, readtype, minlen, maxlen, minq, maxq):
+                return True
     else:
         return False
 
 
+## F5 EVENT MAPPING OPERATIONS
+## Run-level versions of the Fast5 event-to-read maps: one array operation per read, no per-event python loops.
+def iter_stay_event_coverage(fast5s, readtype='template', minlen=0, maxlen=int(3e9), minq=0, maxq=int(10e3)):
+    ''' fast5s - iterable of Fast5 objects (e.g. a Fast5List)
+        For each read meeting all criteria, yields (f5, readtype, positions, counts):
+        read positions with at least one stay event and the number of stays at each (see Fast5.get_stay_event_coverage).'''
+    for f5 in fast5s:
+        if meets_all_criteria(f5, readtype, minlen, maxlen, minq, maxq):
+            f5readtype = define_read_type(f5, readtype)
+            positions, counts = f5.get_stay_event_coverage(f5readtype)
+            yield f5, f5readtype, positions, counts
+
+def write_stay_event_coverage_bed(out, fast5s, readtype='template', minlen=0, maxlen=int(3e9), minq=0, maxq=int(10e3)):
+    ''' Writes BED-like lines (name, pos, pos+1, number of stays, abspath) for every stay position of every read to file-like out.
+        Returns the list of abspaths of the Fast5s used (not the Fast5s: holding them would keep every file open).'''
+    used = []
+    for f5, f5readtype, positions, counts in iter_stay_event_coverage(fast5s, readtype, minlen, maxlen, minq, maxq):
+        used.append(f5.abspath)
+        if len(positions) > 0:
+            n = len(positions)
+            write_delimited(out, [np.repeat(f5.get_pore_info_name(f5readtype), n), positions, positions + 1, counts, np.repeat(f5.abspath, n)])
+            out.write("\n")
+    return used
+
+
 ## Fast5List OPs
 ## The function below allows one to sample from the Fast5List
 ## I just tucked this inside Fast5List class though, so it may not be needed.
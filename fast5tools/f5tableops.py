@@ -1,6 +1,7 @@
 ##JOHN URBAN (2015, 2016)
 
 import numpy as np
+from fast5tools.summaryops import sort_lengths, nx_lx, expected_size, n_ge
 ######################
 #  Length stats
 ######################
@@ -41,6 +42,7 @@ def size_stats(l,x, msg=""):
     print msg
     # sort sizes
     l.sort()
+    lengths = sort_lengths(l)
 
     ## get X values for NX stats and sort
     x.sort()
@@ -50,45 +52,45 @@ def size_stats(l,x, msg=""):
     print "N = %d" % (N)
 
     ## Get sum of data
-    A = sum(l)
+    A = np.sum(lengths)
     print "Total length = %d" % (A)
 
     ## Get max length:
-    MAX = max(l)
+    MAX = lengths[-1]
     print "Max length = %d" % (MAX)
 
     ## Get min length:
-    MIN = min(l)
+    MIN = lengths[0]
     print "Min length = %d" % (MIN)
 
     ## Get mean length
-    MEAN = np.mean(l)
+    MEAN = np.mean(lengths)
     print "Mean length = %d" % (MEAN)
 
     ## Get median contig size
-    MEDIAN = np.median(l)
+    MEDIAN = np.median(lengths)
     print "Median length = %d" % (MEDIAN)
 
     ## Get NX values
-    nxvalues = NX(l,x,G=A)
+    nxvalues, lxvalues = nx_lx(lengths,x,G=A)
     for e in x:
         print "N%s length = %d" % (str(e), nxvalues[e])
 
     ## expected read length
-    E = e_size(l,G=A)
+    E = expected_size(lengths,G=A)
     print "Expected size = %d" % (E)
 
     ##number reads >= X 
     print "N reads >= 10kb:"
-    print sum(np.greater_equal(l,50e3))
+    print n_ge(lengths,50e3)
     print "N reads >= 25kb:"
-    print sum(np.greater_equal(l,50e3))
+    print n_ge(lengths,50e3)
     print "N reads >= 50kb:"
-    print sum(np.greater_equal(l,50e3))
+    print n_ge(lengths,50e3)
     print "N reads >= 75kb:"
-    print sum(np.greater_equal(l,75e3))
+    print n_ge(lengths,75e3)
     print "N reads >= 100kb:"
-    print sum(np.greater_equal(l,100e3))
+    print n_ge(lengths,100e3)
     ##TODO: also want size data from reads >=X
     ## ALSO in diff fxn if both length and Q available - do longest with Q>x, etc
     print
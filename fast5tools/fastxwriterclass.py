@@ -0,0 +1,211 @@
+## Buffered fastx output for fast5tofastx.py.
+## - FastxWriter: collects formatted records into large blocks and writes each block with one call,
+##   optionally compressed to gzip or BGZF (bgzip; block-gzip readable by gzip, samtools faidx, tabix, ...).
+##   Blocks are independent gzip members / BGZF blocks, so they can be compressed in parallel:
+##   with threads > 1 a thread pool compresses them (zlib releases the GIL) and they are written back in order.
+## - BamWriter: the same for unaligned BAM (always BGZF).
+## - ShardedFastxWriter: spreads records over several FastxWriters (or BamWriters) -- N files dealt round-robin, or one file per key
+##   (e.g. channel number or run id). At most maxopen files are open at once: the least recently written one is
+##   suspended (flushed and closed) to open another, and reopened for appending when it gets records again.
+
+import sys, zlib, struct
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from fast5tools.bamops import bam_header
+
+COMPRESSIONS = (None, 'gzip', 'bgzip')
+BGZF_BLOCK_SIZE = 65280 ## max uncompressed bytes per BGZF block (as in htslib)
+BGZF_EOF = "\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+
+
+def gzip_member(data, level=6):
+    ''' data compressed as one gzip member (concatenated members are a valid gzip file).'''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+def bgzf_block(data, level=6):
+    ''' data (at most BGZF_BLOCK_SIZE bytes) as one BGZF block: a gzip member whose BC extra field holds the block size.'''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = struct.pack("<BBBBIBBHBBHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(deflated) + 25)
+    return header + deflated + struct.pack("<II", zlib.crc32(data) & 0xffffffff, len(data))
+
+def bgzf_blocks(data, level=6):
+    ''' data compressed as consecutive BGZF blocks.'''
+    return "".join(bgzf_block(data[i:i+BGZF_BLOCK_SIZE], level) for i in range(0, len(data), BGZF_BLOCK_SIZE))
+
+COMPRESS_FXNS = {'gzip':gzip_member, 'bgzip':bgzf_blocks}
+
+
+class FastxWriter(object):
+    ''' Writes records to filename ('-' for stdout) in blocks of about buffersize bytes.
+        compression - None, 'gzip' or 'bgzip'.
+        threads     - number of threads compressing blocks (1 compresses in the calling thread).
+        pool        - ThreadPool to compress with instead of one of its own (e.g. shared by the files of a ShardedFastxWriter).
+        A file can be suspended (closed, buffers freed) and resumed (reopened for appending): gzip output gains new members,
+        BGZF output new blocks, both still valid.'''
+    def __init__(self, filename='-', compression=None, buffersize=4194304, threads=1, level=6, pool=None):
+        assert compression in COMPRESSIONS
+        self.filename = filename
+        self.fh = sys.stdout if filename == '-' else open(filename, 'wb')
+        self.compression = compression
+        self.compress = COMPRESS_FXNS.get(compression)
+        self.buffersize = buffersize
+        self.level = level
+        self.maxpending = 2*threads
+        self.own_pool = pool is None and threads > 1 and compression is not None
+        self.pool = ThreadPool(threads) if self.own_pool else pool
+        self.buffer = []
+        self.buffered = 0
+        self.pending = []
+        self.nrecords = 0
+
+    def write(self, record, key=None):
+        ''' record - formatted read(s) without the final newline (as returned by the f5ops output functions).
+            key    - ignored (same call as ShardedFastxWriter.write).'''
+        self._append(record + "\n")
+        self.nrecords += 1
+
+    def _append(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.buffersize:
+            self.flush()
+
+    def flush(self):
+        ''' Writes (or hands to the compression threads) what is buffered.'''
+        if self.buffered == 0:
+            return
+        data = "".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        if self.compress is None:
+            self.fh.write(data)
+        elif self.pool is None:
+            self.fh.write(self.compress(data, self.level))
+        else:
+            self.pending.append(self.pool.apply_async(self.compress, (data, self.level)))
+            ## write finished blocks in order; wait for the oldest when too many are in flight
+            while self.pending and (len(self.pending) > self.maxpending or self.pending[0].ready()):
+                self.fh.write(self.pending.pop(0).get())
+
+    def _write_pending(self):
+        self.flush()
+        for block in self.pending:
+            self.fh.write(block.get())
+        self.pending = []
+
+    def is_suspended(self):
+        return self.fh is None
+
+    def suspend(self):
+        ''' Writes out everything buffered and closes the file without ending it (no BGZF EOF block) -- see resume().'''
+        assert self.fh is not sys.stdout, "stdout cannot be suspended"
+        self._write_pending()
+        self.fh.close()
+        self.fh = None
+
+    def resume(self):
+        ''' Reopens a suspended file for appending.'''
+        self.fh = open(self.filename, 'ab')
+
+    def close(self):
+        if self.is_suspended():
+            self.resume()
+        self._write_pending()
+        if self.compression == 'bgzip':
+            self.fh.write(BGZF_EOF)
+        if self.own_pool:
+            self.pool.close()
+            self.pool.join()
+        if self.fh is sys.stdout:
+            self.fh.flush()
+        else:
+            self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class BamWriter(FastxWriter):
+    ''' Unaligned BAM: the header, then records already encoded by bamops.encode_unaligned_record,
+        in BGZF blocks (compressed by threads, as for FastxWriter). compression must be bgzip.'''
+    def __init__(self, filename='-', compression='bgzip', buffersize=4194304, threads=1, level=6, pool=None, header=None):
+        assert compression == 'bgzip', "BAM is always BGZF-compressed"
+        FastxWriter.__init__(self, filename, compression, buffersize, threads, level, pool)
+        self._append(bam_header() if header is None else bam_header(header))
+
+    def write(self, record, key=None):
+        ''' record - encoded BAM record(s).'''
+        self._append(record)
+        self.nrecords += 1
+
+
+class ShardedFastxWriter(object):
+    ''' Writes records to files prefix.<shard><suffix>, e.g. reads.0.fastq.gz.
+        nshards - records are dealt round-robin into nshards files (shards 0..nshards-1).
+                  When None, each record goes to the file of the key it is written with (e.g. channel number), opened on first use.
+        The files share one pool of compression threads. buffersize is per file.
+        writer  - FastxWriter, or BamWriter for BAM shards.
+        maxopen - most files open at once (bounds file handles and buffer memory to maxopen*buffersize, e.g. with one file per channel):
+                  the least recently written file is suspended to open another and resumed (appended to) when it gets records again.'''
+    def __init__(self, prefix, suffix, nshards=None, compression=None, buffersize=1048576, threads=1, level=6, writer=FastxWriter, maxopen=256):
+        assert maxopen > 0
+        self.prefix = prefix
+        self.suffix = suffix
+        self.nshards = nshards
+        self.compression = compression
+        self.buffersize = buffersize
+        self.level = level
+        self.threads = threads
+        self.writer = writer
+        self.pool = ThreadPool(threads) if threads > 1 and compression is not None else None
+        self.maxopen = maxopen
+        self.writers = {}
+        self.open_keys = OrderedDict() ## keys of the open files, least recently written first
+        self.nrecords = 0
+        for key in range(nshards or 0):
+            self._get_writer(key)
+
+    def _get_writer(self, key):
+        if key in self.open_keys:
+            del self.open_keys[key]
+        else:
+            if len(self.open_keys) >= self.maxopen:
+                self.writers[self.open_keys.popitem(last=False)[0]].suspend()
+            if key in self.writers:
+                self.writers[key].resume()
+            else:
+                filename = self.prefix + "." + str(key) + self.suffix
+                self.writers[key] = self.writer(filename, self.compression, self.buffersize, self.threads, self.level, self.pool)
+        self.open_keys[key] = True
+        return self.writers[key]
+
+    def write(self, record, key=None):
+        ''' key - shard of record; ignored (round-robin) when nshards was given.'''
+        if self.nshards is not None:
+            key = self.nrecords % self.nshards
+        self._get_writer(key).write(record)
+        self.nrecords += 1
+
+    def get_filenames(self):
+        ''' Returns {shard key: filename}.'''
+        return dict((key, writer.filename) for key, writer in self.writers.items())
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -1,9 +1,25 @@
 import os, tarfile, shutil
 from glob import glob
-from random import randint
+from random import randint, Random
 TMP_DIR = ".fast5tools_tmp_dir"
 TMP_DIR = TMP_DIR[1:] ## not hdden for now
 
+def reservoir_sample(iterable, n, randomseed=False):
+    ''' Uniform random sample of n items from iterable in a single pass, holding only n items in memory.
+        randomseed makes the sample reproducible (False/None/0 = unseeded).
+        Returns (sample, number of items seen). If there were <= n items, sample is all of them in input order.'''
+    rand = Random(randomseed) if randomseed else Random()
+    sample = []
+    i = -1
+    for i, item in enumerate(iterable):
+        if i < n:
+            sample.append(item)
+        else:
+            j = rand.randint(0, i)
+            if j < n:
+                sample[j] = item
+    return sample, i+1
+
 class FileList(object):
     ## will parse list of information on files, expand FOFNs and Tarballs if necessary, etc
     ## then returns one filename at a time for program to do with as needed.
@@ -16,7 +32,7 @@ class FileList(object):
                 self.filelist = filelist
         elif isinstance(filelist, str):
                 self.filelist = [filelist]
-        self.extension = tuple(extension) ## can give a single string or list/tuple
+        self.extension = (extension,) if isinstance(extension, str) else tuple(extension) ## can give a single string or list/tuple
         self._tars_detected = False
         self.tar_filenames_only = tar_filenames_only
         self.keep_tar_footprint_small = keep_tar_footprint_small
@@ -172,12 +188,10 @@ class FileList(object):
         if n >= self.nfiles or n <= 0 or n is None or n is False: ## no downsampling possible, return all
             self.iterfiles =  iter(self.files)
         else:
-            self.downsampled_files = self.files[:]
             if random:
-                if randomseed:
-                    seed(randomseed)
-                shuffle(self.downsampled_files)
-            self.downsampled_files = self.downsampled_files[:n]
+                self.downsampled_files, nseen = reservoir_sample(self.files, n, randomseed)
+            else:
+                self.downsampled_files = self.files[:n]
             if sort:
                 ## Just trying to return the sampled, potentially random list as sorted
                 self.downsampled_files = sorted(self.downsampled_files)
@@ -5,12 +5,14 @@ from Bio import SeqIO
 from collections import Counter, defaultdict
 from math import log10, log
 from itertools import product
+from functools import partial
 import numpy as np
 
 ## Fast5Tools
 from fast5tools.f5class import *
 from fast5tools.f5ops import *
 from fast5tools.fileListClass import *
+from fast5tools.normops import median_normalize
 
 
 ## 2018-04-20
@@ -191,6 +193,14 @@ def regex_parseFast5(fast5dir, seqtype, re_f, re_r, regex_function, outformat, c
 
 
  
+def get_regex_fast5_seq(f5, readtype, minlen, maxlen, minq, maxq):
+    ## Per-file work unit for Fast5List.imap in fast5_regex_parser.py
+    ## Returns (abspath, seq_name, seq) for reads that pass filters, None otherwise.
+    if meets_all_criteria(f5, readtype, minlen, maxlen, minq, maxq):
+        readtype = define_read_type(f5, readtype)
+        return f5.abspath, f5.get_pore_info_name(readtype), f5.get_seq(readtype)
+
+ 
 def get_regex_count(seq, regex):
     ## regex is a re.compile(string) object
     return len(re.findall(regex, seq))
@@ -268,6 +278,14 @@ def kmercount_in_fast5(f5, readtype, k=6, kmerdict=None, rev_comp=False):
     return kmerdict
 
 
+def kmercount_in_fast5_record(f5, readtype, k, rev_comp, minlen, maxlen, minq, maxq):
+    ## Per-file work unit for Fast5List.imap in run_kmer_counting()
+    ## Returns (abspath, kmer count dict) for reads that pass filters, None otherwise.
+    if meets_all_criteria(f5, readtype, minlen, maxlen, minq, maxq):
+        readtype = define_read_type(f5, readtype)
+        return f5.abspath, dict(kmercount_in_fast5(f5, readtype, k=k, rev_comp=rev_comp))
+
+
 def kmercount_in_fastx(fh, fastx='fasta', k=6, kmerdict=None, rev_comp=False):
     if kmerdict is None:
         kmerdict = defaultdict(int)
@@ -325,7 +343,7 @@ def readInTwoKmerTables(kmercounts, refcounts):
 
 
 
-def run_kmer_counting(initial_list, k, readtype, revcomp, nfiles, random, randomseed, notarlite, fasta, fastq, minlen, maxlen, minq, maxq):
+def run_kmer_counting(initial_list, k, readtype, revcomp, nfiles, random, randomseed, notarlite, fasta, fastq, minlen, maxlen, minq, maxq, threads=1):
     ## Tracking files used 
     filesused = ''
     
@@ -343,6 +361,14 @@ def run_kmer_counting(initial_list, k, readtype, revcomp, nfiles, random, random
             filesused += os.path.abspath(fq) + '\n'
             with open(fq) as fh:
                 kmerdict = kmercount_in_fastx(fh, fastx='fastq', k=k, kmerdict=kmerdict, rev_comp=revcomp)
+    elif threads > 1:
+        ## Count kmers per fast5 in worker processes, then merge
+        fxn = partial(kmercount_in_fast5_record, readtype=readtype, k=k, rev_comp=revcomp, minlen=minlen, maxlen=maxlen, minq=minq, maxq=maxq)
+        for record in Fast5List(initial_list, keep_tar_footprint_small=(not notarlite), filemode='r', downsample=nfiles, random=random, randomseed=randomseed).imap(fxn, processes=threads):
+            if record is not None:
+                filesused += record[0] + '\n'
+                for kmer, count in record[1].iteritems():
+                    kmerdict[kmer] += count
     else:
         ## Iterate over fast5s
         for f5 in Fast5List(initial_list, keep_tar_footprint_small=(not notarlite), filemode='r', downsample=nfiles, random=random, randomseed=randomseed):
@@ -353,19 +379,6 @@ def run_kmer_counting(initial_list, k, readtype, revcomp, nfiles, random, random
     return kmerdict, filesused
 
 
-def median_normalize(counts):
-    counts = np.array(counts)
-    med = np.median( counts )
-    diffs = counts - med
-    absdiffs = np.absolute( diffs )
-    mad = np.median( absdiffs )
-    if mad == 0:
-        mad = np.mean( absdiffs )
-    z = diffs / mad
-    return z, med, mad
-
-
-
 def get_kmers(k=6):
     return [''.join(e) for e in [e for e in product('ACGT', repeat=k)]]
 
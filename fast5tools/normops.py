@@ -0,0 +1,108 @@
+## Median/MAD normalization shared by raw-signal (Fast5) and count-based (MedNormAnalysis) code.
+## - median_mad() works on one scratch copy of the data (or in place), using partial sorts rather than full sorts.
+## - StreamingMedianMAD takes a signal chunk by chunk (e.g. from Fast5.iter_raw_windows) and never holds it:
+##   values are binned into a histogram, which is exact for integer signals such as int16 raw data.
+## - normalize() applies (values - shift)/scale in place, in float32 if asked.
+
+import numpy as np
+
+
+def median_mad(values, mad_fallback=True, dtype=np.float64, overwrite_input=False):
+    ''' Returns (median, MAD) where MAD = median(|values - median|).
+        When MAD is 0 and mad_fallback, the mean absolute deviation from the median is used instead.
+        Works on one scratch copy in dtype -- or, with overwrite_input, on values itself (which is then left scrambled).'''
+    if overwrite_input and isinstance(values, np.ndarray) and values.dtype == dtype:
+        work = values
+    else:
+        work = np.array(values, dtype=dtype)
+    med = np.median(work, overwrite_input=True)
+    np.subtract(work, med, out=work)
+    np.absolute(work, out=work)
+    mad = np.median(work, overwrite_input=True)
+    if mad == 0 and mad_fallback:
+        mad = np.mean(work)
+    return med, mad
+
+def normalize(values, shift=0.0, scale=1.0, dtype=np.float32, out=None):
+    ''' Returns (values - shift)/scale as dtype, computed in place in out (or in one new array).'''
+    if out is None:
+        out = np.array(values, dtype=dtype)
+    else:
+        out[...] = values
+    if shift != 0:
+        out -= shift
+    if scale != 1:
+        out /= scale
+    return out
+
+def median_normalize(counts):
+    ''' Robust z-scores: returns (z, median, MAD) with z = (counts - median)/MAD.
+        MAD falls back on the mean absolute deviation when it is 0.'''
+    counts = np.asarray(counts)
+    med, mad = median_mad(counts)
+    z = normalize(counts, med, mad, dtype=np.float64)
+    return z, med, mad
+
+
+def _weighted_rank_value(values, counts, rank):
+    ## value at 0-based rank of a sorted multiset given as sorted unique values and their counts
+    return values[np.searchsorted(np.cumsum(counts), rank, side='right')]
+
+def _weighted_median(values, counts):
+    ## same as np.median of the expanded multiset: mean of the two middle values when n is even
+    n = counts.sum()
+    return 0.5*(_weighted_rank_value(values, counts, (n-1)//2) + _weighted_rank_value(values, counts, n//2))
+
+class StreamingMedianMAD(object):
+    ''' Median and MAD of a signal given in chunks (update()), holding only a histogram of it.
+        Bins are binwidth wide, starting at a multiple of binwidth: with the default binwidth=1,
+        integer signals (e.g. int16 raw data) give exactly what median_mad() gives on the whole signal.
+        For float signals, results are to within binwidth.'''
+    def __init__(self, binwidth=1):
+        self.binwidth = binwidth
+        self.origin = None
+        self.hist = np.zeros(0, dtype=np.int64)
+        self.n = 0
+
+    def update(self, chunk):
+        chunk = np.asarray(chunk)
+        if len(chunk) == 0:
+            return
+        bins = np.floor_divide(chunk, self.binwidth).astype(np.int64)
+        lo = bins.min()
+        if self.origin is None:
+            self.origin = lo
+        if lo < self.origin:
+            self.hist = np.concatenate((np.zeros(self.origin - lo, dtype=np.int64), self.hist))
+            self.origin = lo
+        counts = np.bincount(bins - self.origin, minlength=len(self.hist))
+        if len(counts) > len(self.hist):
+            counts[:len(self.hist)] += self.hist
+            self.hist = counts
+        else:
+            self.hist += counts
+        self.n += len(chunk)
+
+    def get_bin_values(self):
+        ## value each bin stands for: the value itself for integer bins, else the bin center
+        values = (self.origin + np.arange(len(self.hist))) * self.binwidth
+        if self.binwidth != 1:
+            values = values + 0.5*self.binwidth
+        return values
+
+    def median(self):
+        present = self.hist > 0
+        return _weighted_median(self.get_bin_values()[present], self.hist[present])
+
+    def median_mad(self, mad_fallback=True):
+        ''' Returns (median, MAD) as median_mad() does.'''
+        present = self.hist > 0
+        values = self.get_bin_values()[present]
+        counts = self.hist[present]
+        med = _weighted_median(values, counts)
+        deviations = np.absolute(values - med)
+        order = np.argsort(deviations, kind='mergesort')
+        mad = _weighted_median(deviations[order], counts[order])
+        if mad == 0 and mad_fallback:
+            mad = (deviations*counts).sum()/float(counts.sum())
+        return med, mad
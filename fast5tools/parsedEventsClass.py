@@ -1,18 +1,19 @@
 
 from fast5tools.hmm_class import *
 from fast5tools.tools import *
+from fast5tools.f5class import slice_events, event_columns
 
 
 
 class ParsedEvents(object):
     def __init__(self, events=None, f5=None, lead_size=50, hp_half_size=40, max_cutoff=90, max_second_cutoff=70, min_num_lg_events=3, end_trim_size=0, verbose=False, hpfxn=1):
-        ## events is events dict captured from fast5class
-        ## if f5class object provided, it can capture the events automatically
+        ## events is events dict or structured events array captured from fast5class
+        ## if f5class object provided, it can capture the events automatically (input events array read in one go)
         assert (events is not None) or (f5 is not None)
-        if events:
+        if events is not None:
             self.events = events
-        elif f5:
-            self.events = f5.get_events_dict(readtype="input")
+        else:
+            self.events = f5.get_events(readtype="input")
         self.nevents = len(self.events['mean'])
 
         ## find lead
@@ -64,12 +65,25 @@ class ParsedEvents(object):
             self.complement_end = None
         
 
+    def get_strand_events(self, strand="template"):
+        ## events of template (up to but not including hpstart) or complement (empty when no hairpin was detected)
+        ## as views of self.events -- see f5class.slice_events
+        if strand == "template":
+            return slice_events(self.events, self.template_start, self.template_end)
+        elif self.hairpin_detected:
+            return slice_events(self.events, self.complement_start, self.complement_end)
+        return slice_events(self.events, 0, 0)
+
+    def get_strand_event_columns(self, strand="template", sampling_rate=None):
+        ## mean, stdv and length (as number of data points when sampling_rate is given) -- see f5class.event_columns
+        return event_columns(self.get_strand_events(strand), sampling_rate)
+
     def get_template_means(self):
-        return self.events['mean'][self.template_start:self.template_end] ##up to but not including hpstart
+        return self.get_strand_events("template")['mean'] ##up to but not including hpstart
     
     def get_complement_events(self):
         if self.hairpin_detected:
-            return self.events['mean'][self.complement_start:self.complement_end]
+            return self.get_strand_events("complement")['mean']
         else:
             return np.array([])
 
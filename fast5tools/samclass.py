@@ -2,6 +2,7 @@ import os, sys, re, pybedtools, pandas, operator
 from collections import defaultdict
 import numpy as np
 from string import maketrans
+from fast5tools.cigarops import read_to_reference_map
 
 isthis = {'gt':operator.gt, 'ge':operator.ge, 'lt':operator.lt, 'le':operator.le, 'eq':operator.eq, 'ne':operator.ne} 
 
@@ -433,6 +434,11 @@ class SamRecord(object):
     def get_cigar_list(self):
         return [(int(count),char) for count,char in re.findall('(\d+)([MIDNSHP=X])', self.get_cigar_field())]
 
+    def get_read_to_reference_map(self):
+        ''' 0-based reference position of every base of the original read (in fast5/basecalled orientation, clipped bases included),
+            -1 where a base does not align (clips, insertions). See cigarops.read_to_reference_map.'''
+        return read_to_reference_map(self.get_cigar_field(), self.get_pos_field(), reverse=self.on_negative_strand())
+
 ##    def convert_cigar_element_
 
     def get_edit_dist_with_clipping(self):
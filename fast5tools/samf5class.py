@@ -0,0 +1,191 @@
+## Joining alignments (SAM) back to the fast5s their reads came from.
+## - Fast5ReadIndex: read name -> fast5 location, kept on disk as a sorted text file and searched by bisection,
+##   so runs of millions of reads are looked up without holding the index in memory.
+## - SamFast5Join: streams SAM records (e.g. a samclass.Sam, in any sort order) and pairs each aligned record with its Fast5,
+##   one open fast5 at a time.
+## - write_events_to_reference / write_raw_segments_to_reference: per-event or per-raw-segment reference positions
+##   (Fast5.map_events_to_reference, Fast5.map_segmented_raw_signal_to_reference) as tab-delimited lines.
+
+import os, tempfile, shutil, heapq
+import numpy as np
+from fast5tools.f5class import Fast5, MultiFast5, segment_stats, write_delimited, logger
+
+## how reads were named when the fastx given to the aligner was made (fast5tofastx.py)
+READ_NAME_FXNS = {'pore_info': lambda f5, readtype: f5.get_pore_info_name(readtype),
+                  'read_stats': lambda f5, readtype: f5.get_read_stats_name(readtype),
+                  'event_stats': lambda f5, readtype: f5.get_event_stats_name(readtype),
+                  'read_event_stats': lambda f5, readtype: f5.get_read_and_event_stats_name(readtype),
+                  'pore_info_with_abspath': lambda f5, readtype: f5.get_pore_info_name_with_abspath(readtype),
+                  'read_id': lambda f5, readtype: f5.get_read_id()}
+
+
+def build_fast5_read_index(fast5s, filename, readtype='template', names='pore_info', chunksize=1000000, tmpdir=None):
+    ''' Writes a Fast5ReadIndex file for fast5s (e.g. a Fast5List): one "name<tab>abspath<tab>read group" line per read that has readtype,
+        sorted by name. Lines are sorted chunksize at a time and merged, so memory use is bounded by chunksize.
+        names - key of READ_NAME_FXNS, or a function of (f5, readtype), giving the read names used in the SAM.
+        Fast5s inside tarballs cannot be indexed (their extracted paths do not outlive iteration) and are skipped.'''
+    namefxn = READ_NAME_FXNS[names] if isinstance(names, str) else names
+    tmpdir = tempfile.mkdtemp(prefix="f5index_", dir=tmpdir)
+    try:
+        chunkfiles = []
+        lines = []
+        skipped = 0
+        def flush(lines):
+            lines.sort()
+            chunkfile = os.path.join(tmpdir, str(len(chunkfiles)))
+            with open(chunkfile, 'w') as fh:
+                fh.writelines(lines)
+            chunkfiles.append(chunkfile)
+        for f5 in fast5s:
+            if not os.path.isfile(f5.abspath): ## tar members: tarball/member, or an extracted file already removed
+                skipped += 1
+                continue
+            if f5.is_not_corrupt() and f5.is_nonempty() and f5.has_read(readtype):
+                group = getattr(f5, 'read_name', '.') ## multi-read files: read group in the container
+                lines.append(("\t").join([namefxn(f5, readtype), f5.abspath, group]) + "\n")
+                if len(lines) >= chunksize:
+                    flush(lines)
+                    lines = []
+        flush(lines)
+        if skipped:
+            logger.warning("Skipped %d fast5 files inside tarballs -- extract them first to index them." % skipped)
+        handles = [open(chunkfile) for chunkfile in chunkfiles]
+        with open(filename, 'w') as out:
+            out.writelines(heapq.merge(*handles))
+        for fh in handles:
+            fh.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+class Fast5ReadIndex(object):
+    ''' Read name -> fast5 lookups in an index file written by build_fast5_read_index.
+        Each lookup bisects the file by byte offset (O(log n) seeks); only the file handle is held in memory.'''
+    def __init__(self, filename, filemode='r'):
+        self.filename = filename
+        self.filemode = filemode
+        self.fh = open(filename, 'rb')
+        self.size = os.path.getsize(filename)
+
+    def _line_after(self, offset):
+        ## first complete line starting after offset (the first line when offset is 0)
+        self.fh.seek(offset)
+        if offset > 0:
+            self.fh.readline()
+        return self.fh.readline()
+
+    def get(self, name):
+        ''' Returns (abspath, read group or None) for read name, or None when name is not in the index.'''
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line = self._line_after(mid)
+            if line and line.split("\t", 1)[0] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        line = self._line_after(lo)
+        fields = line.rstrip("\n").split("\t")
+        if fields[0] != name:
+            return None
+        return fields[1], (None if fields[2] == '.' else fields[2])
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def open_fast5(self, name):
+        ''' Fast5 (or Fast5Read for a multi-read file) of read name, or None when it cannot be found
+            (including index entries whose file has since been moved/removed or cannot be read).
+            Names ending in "filename:<abspath>" (pore_info_with_abspath naming) are also found without the index.'''
+        location = self.get(name)
+        if location is None and "filename:" in name:
+            path = name.split("filename:")[-1]
+            location = (path, None) if os.path.exists(path) else None
+        if location is None:
+            return None
+        path, group = location
+        if not os.path.isfile(path):
+            return None
+        if group is None:
+            f5 = Fast5(path, filemode=self.filemode)
+            if not f5.is_not_corrupt():
+                return None
+            return f5
+        try:
+            multi = MultiFast5(path, filemode=self.filemode)
+        except IOError:
+            return None
+        if group not in multi.read_names:
+            multi.close()
+            return None
+        return multi.get_read(group[len("read_"):])
+
+    def close(self):
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class SamFast5Join(object):
+    ''' Iterating yields (samrecord, f5) for every aligned record of samrecords (a samclass.Sam or any iterable of SamRecords)
+        whose read is found in index (a Fast5ReadIndex). Each Fast5 is closed when the next record is requested.
+        Records whose read is not found are counted in self.missing.'''
+    def __init__(self, samrecords, index):
+        self.samrecords = samrecords
+        self.index = index
+        self.missing = 0
+
+    def __iter__(self):
+        for record in self.samrecords:
+            if not record.is_aligned():
+                continue
+            f5 = self.index.open_fast5(record.get_qname_field())
+            if f5 is None:
+                self.missing += 1
+                continue
+            try:
+                yield record, f5
+            finally:
+                f5.close()
+                if hasattr(f5, 'container'):
+                    f5.container.close()
+
+
+def _reference_columns(record, refpos, keep):
+    ## chrom, refpos, strand, read name columns for the kept events
+    n = int(keep.sum())
+    strand = "+" if record.reference_strand() > 0 else "-"
+    return [np.repeat(record.get_rname_field(), n), refpos[keep], np.repeat(strand, n), np.repeat(record.get_qname_field(), n), np.flatnonzero(keep)]
+
+def write_events_to_reference(out, join, readtype='template', columns=('mean', 'stdv', 'length'), keep_unaligned=False):
+    ''' Writes one line per event of every joined read to file-like out:
+        chrom, 0-based reference position, strand, read name, event index, then the given events columns.
+        Events whose kmer start is not aligned (reference position -1) are left out unless keep_unaligned.'''
+    for record, f5 in join:
+        if not f5.has_read(readtype):
+            continue
+        events = f5.get_events(readtype)
+        refpos = f5.map_events_to_reference(record, readtype)
+        keep = np.ones(len(refpos), dtype=bool) if keep_unaligned else refpos >= 0
+        if keep.any():
+            write_delimited(out, _reference_columns(record, refpos, keep) + [events[col][keep] for col in columns])
+            out.write("\n")
+
+def write_raw_segments_to_reference(out, join, readtype='template', median_normalized=False, keep_unaligned=False):
+    ''' Writes one line per raw signal segment (the raw data of one event) of every joined read to file-like out:
+        chrom, 0-based reference position, strand, read name, event index, segment mean, stdv, start and length in the raw signal.
+        Needs events in raw sample indices (see Fast5.get_raw_segment_offsets).'''
+    for record, f5 in join:
+        if not f5.has_read(readtype):
+            continue
+        raw, offsets, refpos = f5.map_segmented_raw_signal_to_reference(record, readtype, median_normalized)
+        mean, stdv, lengths = segment_stats(raw, offsets)
+        keep = np.ones(len(refpos), dtype=bool) if keep_unaligned else refpos >= 0
+        if keep.any():
+            write_delimited(out, _reference_columns(record, refpos, keep) + [mean[keep], stdv[keep], offsets[:-1][keep], lengths[keep]])
+            out.write("\n")
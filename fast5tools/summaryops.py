@@ -0,0 +1,54 @@
+## Length summary statistics from one sort of a length column.
+## Used by Fast5DataFrame (fast5standardSummary.py) and f5tableops (fast5TableSummary.py):
+## lengths are sorted once, then NX/LX, expected size and the number/sum of lengths > size for any set of sizes
+## come from cumulative sums and np.searchsorted instead of python loops over reads.
+## Results keep the types of the pure python versions they replace (numpy scalars of the column's dtype), so printed output is unchanged.
+
+import numpy as np
+
+
+def sort_lengths(lengths, quals=None):
+    ''' Returns lengths without NaNs, sorted ascending (stable), and -- when quals (same length as lengths) is given --
+        (sorted lengths, quals in the same order).'''
+    lengths = np.asarray(lengths)
+    keep = ~np.isnan(lengths) if lengths.dtype.kind == 'f' else np.ones(len(lengths), dtype=bool)
+    order = np.flatnonzero(keep)[np.argsort(lengths[keep], kind='mergesort')]
+    if quals is None:
+        return lengths[order]
+    return lengths[order], np.asarray(quals)[order]
+
+def nx_lx(sorted_lengths, x=[25,50,75], G=False):
+    ''' Returns ({X: NX}, {X: LX}) for ascending sorted_lengths, G being the total length (usually sorted_lengths.sum()).
+        NX: X% of G is in reads at least NX long; LX: the number of those reads (longest first).
+        Returns None when G is 0/False (as NX has always done).'''
+    if not G:
+        return None
+    desc = sorted_lengths[::-1]
+    cumsum = np.cumsum(desc)
+    nxvalues = {}
+    lxvalues = {}
+    for e in sorted(x):
+        L = min(int(np.searchsorted(cumsum, G*e/100.0, side='left')) + 1, len(desc))
+        nxvalues[e] = desc[L-1]
+        lxvalues[e] = L
+    return nxvalues, lxvalues
+
+def expected_size(lengths, G=False):
+    ''' Expected length of the read a random base is in: sum(length**2)/G (G defaults to sum(lengths)).'''
+    lengths = np.asarray(lengths)
+    if not G:
+        G = lengths.sum()
+    return (lengths**2).sum()/float(G)
+
+def n_and_sum_gt(sorted_lengths, cumsum, size):
+    ''' Returns (number, sum) of the lengths > size, from ascending sorted_lengths and their np.cumsum
+        (one np.searchsorted per size) -- sum is 0 when there are none.'''
+    i = int(np.searchsorted(sorted_lengths, size, side='right'))
+    n = len(sorted_lengths) - i
+    if n == 0:
+        return 0, 0
+    return n, cumsum[-1] - (cumsum[i-1] if i > 0 else 0)
+
+def n_ge(sorted_lengths, size):
+    ''' Number of the ascending sorted_lengths >= size.'''
+    return len(sorted_lengths) - int(np.searchsorted(sorted_lengths, size, side='left'))
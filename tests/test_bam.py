@@ -0,0 +1,131 @@
+import gzip
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from fast5tools.f5class import Fast5List
+from fast5tools.f5ops import get_fast5tofastx_output_fxn, get_template_read, get_all_reads, get_comment_bam_tags
+from fast5tools.bamops import encode_unaligned_record, BAM_UNMAPPED
+from fast5tools.fastxwriterclass import BamWriter
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06"]
+
+
+def read_bam(filename):
+    ## (header text, [(name, flag, seq, quals, tags)]) -- a minimal decoder of what bamops writes
+    data = gzip.open(filename).read()
+    assert data[:4] == "BAM\1"
+    l_text = struct.unpack("<i", data[4:8])[0]
+    text = data[8:8+l_text]
+    offset = 8 + l_text + 4
+    records = []
+    while offset < len(data):
+        block_size = struct.unpack("<i", data[offset:offset+4])[0]
+        record = data[offset+4:offset+4+block_size]
+        offset += 4 + block_size
+        l_read_name, mapq, bin_, n_cigar, flag, l_seq = struct.unpack("<BBHHHI", record[8:20])
+        name = record[32:32+l_read_name-1]
+        pos = 32 + l_read_name
+        packed = np.frombuffer(record[pos:pos+(l_seq+1)//2], dtype=np.uint8)
+        codes = np.column_stack([packed >> 4, packed & 15]).ravel()[:l_seq]
+        seq = "".join("=ACMGRSVTWYHKDBN"[code] for code in codes)
+        pos += (l_seq + 1) // 2
+        quals = np.frombuffer(record[pos:pos+l_seq], dtype=np.uint8).tolist()
+        pos += l_seq
+        tags = []
+        while pos < len(record):
+            tag, tagtype = record[pos:pos+2], record[pos+2]
+            if tagtype == 'Z':
+                end = record.index("\0", pos+3)
+                tags.append((tag, 'Z', record[pos+3:end]))
+                pos = end + 1
+            else:
+                tags.append((tag, tagtype, struct.unpack("<" + tagtype, record[pos+3:pos+7])[0]))
+                pos += 7
+        records.append((name, flag, seq, quals, tags))
+    return text, records
+
+
+class TestUnalignedBam(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dirs = [os.path.join(data_path, d) for d in data_dirs]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_records_match_fastq(self):
+        bam = get_fast5tofastx_output_fxn("bam")
+        filename = os.path.join(self.tmpdir, "reads.bam")
+        expected = []
+        with BamWriter(filename, buffersize=10000, threads=2) as writer:
+            for f5 in Fast5List(self.dirs):
+                read = get_template_read(f5, 0, int(3e9), 0, int(10e3), bam, comments="pore_info", samflag='')
+                if read:
+                    writer.write(read)
+                    expected.append((f5.get_pore_info_name("template"), f5.get_seq("template"), f5.get_int_quals("template").tolist(), f5.get_channel_number(), f5.get_asic_id()))
+        text, records = read_bam(filename)
+        self.assertTrue(text.startswith("@HD"))
+        self.assertEqual(len(records), len(expected))
+        for (name, flag, seq, quals, tags), (ename, eseq, equals, channel, asic) in zip(records, expected):
+            self.assertEqual((name, flag, seq, quals), (ename, BAM_UNMAPPED, eseq, equals))
+            tags = dict((tag, value) for tag, tagtype, value in tags)
+            self.assertEqual(tags['rt'], 'template')
+            self.assertEqual(tags['ch'], int(channel))
+            self.assertEqual(tags['ai'], asic)
+
+    def test_identifiers_round_trip(self):
+        ## asic ids can exceed int32 (here 3576578805) -- must come back exactly, as text
+        bam = get_fast5tofastx_output_fxn("bam")
+        filename = os.path.join(self.tmpdir, "reads.bam")
+        asics = []
+        with BamWriter(filename) as writer:
+            for f5 in Fast5List([os.path.join(data_path, "t007-flomin107-sqklsk308-r94_250bps_nsk007_2d")]):
+                read = get_template_read(f5, 0, int(3e9), 0, int(10e3), bam, comments="pore_info", samflag='')
+                if read:
+                    writer.write(read)
+                    asics.append((f5.get_asic_id(), f5.get_run_id()))
+        records = read_bam(filename)[1]
+        self.assertTrue(len(records) > 0)
+        self.assertEqual(len(records), len(asics))
+        for record, (asic, run) in zip(records, asics):
+            tags = dict((tag, (tagtype, value)) for tag, tagtype, value in record[4])
+            self.assertEqual(tags['ai'], ('Z', asic))
+            self.assertEqual(tags['ri'], ('Z', run))
+
+    def test_all_reads_concatenated(self):
+        bam = get_fast5tofastx_output_fxn("bam")
+        filename = os.path.join(self.tmpdir, "reads.bam")
+        nreads = 0
+        with BamWriter(filename) as writer:
+            for f5 in Fast5List(self.dirs):
+                reads = get_all_reads(f5, 0, int(3e9), 0, int(10e3), bam, comments=False, samflag='')
+                if reads:
+                    writer.write(reads)
+                nreads += sum(f5.has_read(readtype) for readtype in ("template", "complement", "2d"))
+        self.assertEqual(len(read_bam(filename)[1]), nreads)
+
+    def test_comment_tags(self):
+        self.assertEqual(get_comment_bam_tags("F5:Z:template|len:10", "template", "F5:Z:"), [('F5', 'Z', "template|len:10")])
+        self.assertEqual(get_comment_bam_tags("template|len:10|Q:7.5|channel:3|Read:12", "template"),
+                         [('rt', 'Z', 'template'), ('ln', 'i', 10), ('qs', 'f', 7.5), ('ch', 'i', 3), ('rn', 'i', 12)])
+        self.assertEqual(get_comment_bam_tags("2d|asic:3576578805|run:1234e5|device:7|len:-", "2d"),
+                         [('rt', 'Z', '2d'), ('ai', 'Z', '3576578805'), ('ri', 'Z', '1234e5'), ('di', 'Z', '7'), ('ln', 'Z', '-')])
+        self.assertEqual(get_comment_bam_tags("/path/to/read.fast5", "template"), [('CO', 'Z', "/path/to/read.fast5")])
+        self.assertEqual(get_comment_bam_tags(False, "template"), [])
+
+    def test_odd_length_and_missing_quals(self):
+        filename = os.path.join(self.tmpdir, "reads.bam")
+        with BamWriter(filename) as writer:
+            writer.write(encode_unaligned_record("r1", "ACGTN", [1, 2, 3, 4, 5]))
+            writer.write(encode_unaligned_record("r2", "acg"))
+        records = read_bam(filename)[1]
+        self.assertEqual(records[0][:4], ("r1", BAM_UNMAPPED, "ACGTN", [1, 2, 3, 4, 5]))
+        self.assertEqual(records[1][:4], ("r2", BAM_UNMAPPED, "ACG", [255, 255, 255]))
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from fast5tools.f5class import Fast5, Fast5List
+from fast5tools.eventarchiveclass import EventArchive, EventArchiveWriter, is_event_archive, get_kmer_event_records, get_kmer_event_column_names, KMER_EVENT_COLUMNS
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06"]
+r9_fast5 = "rundata/t007-flomin107-sqklsk308-r95-450bps/examp1.fast5"
+
+
+class TestEventArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "run.events.h5")
+        self.reads = []
+        for f5 in Fast5List([os.path.join(data_path, d) for d in data_dirs]):
+            if f5.has_read("template"):
+                self.reads.append((f5.filebasename + str(len(self.reads)), f5.get_events("template")))
+        with EventArchiveWriter(self.filename) as archive:
+            for i, (name, events) in enumerate(self.reads):
+                archive.add_read(name, events, {"pos":i, "strand":"+-"[i % 2]})
+            archive.add_read("empty", self.reads[0][1][:0], {"pos":-1, "strand":"."})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        self.assertTrue(is_event_archive(self.filename))
+        for mmap in (True, False):
+            archive = EventArchive(self.filename, mmap=mmap)
+            self.assertEqual(archive.columns, list(self.reads[0][1].dtype.names))
+            self.assertEqual(len(archive), len(self.reads) + 1)
+            for i, (name, events) in enumerate(self.reads):
+                read = archive.get_read(name)
+                for col in archive.columns:
+                    self.assertTrue((read[col] == events[col]).all())
+                self.assertEqual(archive.get_read_info(i), {"pos":i, "strand":"+-"[i % 2]})
+            self.assertEqual(len(archive.get_read("empty")["mean"]), 0)
+            self.assertEqual(archive.get_lengths().tolist(), [len(e) for n, e in self.reads] + [0])
+            self.assertEqual(len(archive.column("mean")), sum(len(e) for n, e in self.reads))
+        self.assertTrue(isinstance(EventArchive(self.filename).column("mean"), np.memmap))
+        self.assertFalse(is_event_archive(os.path.join(data_path, "01", "example.fast5")))
+
+    def test_kmer_event_columns(self):
+        filename = os.path.join(self.tmpdir, "kmer.events.h5")
+        with EventArchiveWriter(filename) as archive:
+            for name, events in self.reads:
+                archive.add_read(name, get_kmer_event_records(events))
+        archive = EventArchive(filename)
+        self.assertEqual(archive.columns, list(KMER_EVENT_COLUMNS))
+        self.assertEqual(get_kmer_event_column_names(archive.columns), list(KMER_EVENT_COLUMNS))
+        for name, events in self.reads:
+            read = archive.get_read(name)
+            self.assertTrue((read['mean'] == events['mean']).all())
+            self.assertTrue((read['stdv'] == events['stdv']).all())
+            self.assertTrue((read['start'] == events['start']).all())
+            self.assertTrue((read['length'] == events['length']).all())
+            self.assertEqual(read['base'].tolist(), [kmer[len(kmer)//2] for kmer in events['model_state']])
+        ## tombo names are found too; raw events tables (no base column) are refused
+        self.assertEqual(get_kmer_event_column_names(['norm_mean', 'norm_stdev', 'start', 'length', 'base']), ['norm_mean', 'norm_stdev', 'start', 'length', 'base'])
+        self.assertRaises(ValueError, get_kmer_event_column_names, EventArchive(self.filename).columns)
+
+    def test_mismatched_reads_refused(self):
+        filename = os.path.join(self.tmpdir, "mixed.events.h5")
+        r9 = Fast5(r9_fast5)
+        r9_events = r9.get_events("template")
+        r9.close()
+        counts = np.zeros(3, dtype=[('mean', float), ('length', np.uint64)])
+        seconds = np.zeros(2, dtype=[('mean', float), ('length', float)])
+        with EventArchiveWriter(filename) as archive:
+            archive.add_read("r7", self.reads[0][1])
+            ## R9 events have no model_level: nothing of the read may be written
+            self.assertRaises(ValueError, archive.add_read, "r9", r9_events)
+            archive.add_read("r7b", self.reads[1][1])
+        archive = EventArchive(filename)
+        self.assertEqual(archive.read_names, ["r7", "r7b"])
+        self.assertEqual(len(archive.column("model_level")), len(self.reads[0][1]) + len(self.reads[1][1]))
+        with EventArchiveWriter(filename) as archive:
+            archive.add_read("samples", counts)
+            self.assertRaises(ValueError, archive.add_read, "seconds", seconds)
+        self.assertEqual(EventArchive(filename).read_names, ["samples"])
+
+    def test_exception_discards_archive(self):
+        filename = os.path.join(self.tmpdir, "failed.events.h5")
+        tmpdir = os.path.join(self.tmpdir, "spool")
+        os.mkdir(tmpdir)
+        try:
+            with EventArchiveWriter(filename, tmpdir=tmpdir) as archive:
+                archive.add_read("r7", self.reads[0][1])
+                raise RuntimeError("interrupted")
+        except RuntimeError:
+            pass
+        self.assertFalse(os.path.exists(filename))
+        self.assertEqual(os.listdir(tmpdir), [])
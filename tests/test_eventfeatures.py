@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from fast5tools.f5class import Fast5, Fast5List
+from fast5tools.eventfeatureclass import extract_event_features, load_event_feature_shard, get_event_features, EventFeatureShardWriter
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06"]
+raw_fast5 = "rundata/t007-flomin107-sqklsk308-r95-450bps/examp1.fast5"
+
+
+class TestEventFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = [os.path.join(data_path, d) for d in data_dirs]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shards_hold_every_read(self):
+        for format in ("npz", "archive"):
+            prefix = os.path.join(self.tmpdir, format)
+            shards, skipped = extract_event_features(Fast5List(self.paths), prefix, shard_rows=10000, format=format)
+            self.assertTrue(len(shards) > 1)
+            expected = [(f5.abspath, f5.get_events("template")) for f5 in Fast5List(self.paths) if f5.has_read("template")]
+            self.assertEqual(len(skipped), len(Fast5List(self.paths)) - len(expected))
+            i = 0
+            for shard in shards:
+                features, names, offsets = load_event_feature_shard(shard)
+                self.assertEqual(sorted(features), ['length', 'mean', 'model_state', 'move', 'stdv'])
+                for j, name in enumerate(names):
+                    self.assertEqual(name, expected[i][0])
+                    for col in features:
+                        self.assertTrue((features[col][offsets[j]:offsets[j+1]] == expected[i][1][col]).all())
+                    i += 1
+            self.assertEqual(i, len(expected))
+
+    def test_raw_stats(self):
+        f5 = Fast5(raw_fast5)
+        features = dict(get_event_features(f5, fields=("mean",), raw_stats=True))
+        raw, offsets = f5.get_segmented_raw_signal_arrays(includeclips=False)
+        self.assertEqual(features['raw_start'].tolist(), offsets[:-1].tolist())
+        self.assertEqual(features['raw_length'].tolist(), np.diff(offsets).tolist())
+        self.assertTrue(np.allclose(features['raw_mean'], [raw[start:end].mean() for start, end in zip(offsets[:-1], offsets[1:])]))
+        self.assertEqual(len(features['raw_mean']), len(features['mean']))
+        f5.close()
+
+    def test_mismatched_dtypes_refused(self):
+        for format in ("npz", "archive"):
+            prefix = os.path.join(self.tmpdir, format)
+            first = [('length', np.array([10, 20])), ('model_state', np.array(["ACGTA", "CGTAC"]))]
+            with EventFeatureShardWriter(prefix, format=format) as writer:
+                writer.add_read("first", first)
+                writer.add_read("narrower", [('length', np.array([5], dtype=np.int32)), ('model_state', np.array(["ACG"]))])
+                self.assertRaises(ValueError, writer.add_read, "seconds", [('length', np.array([0.002])), ('model_state', np.array(["ACGTA"]))])
+                self.assertRaises(ValueError, writer.add_read, "6mers", [('length', np.array([7])), ('model_state', np.array(["ACGTAC"]))])
+            features, names, offsets = load_event_feature_shard(writer.filenames[0])
+            self.assertEqual(list(names), ["first", "narrower"])
+            self.assertEqual(features['length'].tolist(), [10, 20, 5])
+            self.assertEqual(features['model_state'].tolist(), ["ACGTA", "CGTAC", "ACG"])
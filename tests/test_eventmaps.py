@@ -0,0 +1,81 @@
+import unittest
+import cStringIO as StringIO
+
+import numpy as np
+
+from fast5tools.f5class import Fast5, event_columns
+from fast5tools.f5ops import write_stay_event_coverage_bed
+
+
+example_fast5 = "rundata/01/example.fast5"
+
+
+class TestEventMaps(unittest.TestCase):
+
+    def setUp(self):
+        self.f5 = Fast5(example_fast5)
+        self.events = self.f5.get_events("template")
+
+    def tearDown(self):
+        self.f5.close()
+
+    def test_maps_match_event_loop(self):
+        seq = self.events['model_state'][0]
+        seqindex = [0]
+        stays = []
+        for state, move in zip(self.events['model_state'][1:], self.events['move'][1:]):
+            if move > 0:
+                seq += state[5-move:]
+            else:
+                stays.append(seqindex[-1] + move)
+            seqindex.append(seqindex[-1] + move)
+        self.assertEqual(self.f5.reconstruct_sequence_from_stranded_events("template"), seq)
+        self.assertEqual(self.f5.map_events_to_read("template").tolist(), seqindex)
+        self.assertEqual(self.f5.map_stay_events_to_read("template").tolist(), stays)
+        coverage = self.f5.map_stay_event_coverage_in_read("template")
+        self.assertEqual(dict(coverage), dict((pos, stays.count(pos)) for pos in set(stays)))
+
+    def test_stay_coverage_bed(self):
+        out = StringIO.StringIO()
+        used = write_stay_event_coverage_bed(out, [self.f5])
+        self.assertEqual(used, [self.f5.abspath])
+        lines = [line.split("\t") for line in out.getvalue().rstrip("\n").split("\n")]
+        positions, counts = self.f5.get_stay_event_coverage("template")
+        self.assertEqual([int(line[1]) for line in lines], positions.tolist())
+        self.assertEqual([int(line[3]) for line in lines], counts.tolist())
+        self.assertEqual(lines[0][4], self.f5.abspath)
+
+
+class TestStrandInputEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.f5 = Fast5("rundata/05/example.fast5")
+        self.input_events = self.f5.get_events("input")
+
+    def tearDown(self):
+        self.f5.close()
+
+    def test_strand_slices(self):
+        for strand in ("template", "complement"):
+            for flank in (False, True):
+                start, end = self.f5.get_strand_coords_from_input_events(strand, flank)
+                events = self.f5.get_strand_input_events(strand, flank)
+                self.assertTrue((events == self.input_events[start:end]).all())
+                view = self.f5.get_strand_input_events(strand, flank, events=self.input_events)
+                self.assertTrue(np.may_share_memory(view, self.input_events))
+                columns = self.f5.get_strand_input_event_columns(strand, flank, events=self.input_events)
+                self.assertTrue(np.may_share_memory(columns['mean'], self.input_events))
+                self.assertTrue((columns['length'] == self.input_events['length'][start:end]).all())
+
+    def test_basecalled_events_with_flanks(self):
+        sampling_rate = self.f5.get_sampling_rate()
+        for strand in ("template", "complement"):
+            bc_events = event_columns(self.f5.get_events(strand), sampling_rate)
+            bc_start = self.f5.get_strand_start_index_in_input_events(strand)
+            start, end = self.f5.get_strand_coords_from_input_events(strand, True)
+            events = self.f5.get_strand_events_from_basecalled_events(strand, True)
+            n = bc_start - start
+            self.assertTrue((events['mean'][:n] == self.input_events['mean'][start:bc_start]).all())
+            self.assertTrue((events['mean'][n:n+len(bc_events['mean'])] == bc_events['mean']).all())
+            self.assertTrue((events['length'][n:n+len(bc_events['mean'])] == bc_events['length']).all())
+            self.assertEqual(events['length'].dtype, np.uint64)
@@ -0,0 +1,58 @@
+import os
+import h5py
+import shutil
+import tempfile
+import unittest
+
+from fast5tools.f5class import Fast5List
+from fast5tools.f5catalogclass import Fast5Catalog
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06"]
+
+
+class TestFast5Catalog(unittest.TestCase):
+
+    def setUp(self):
+        self.dirs = [os.path.join(data_path, d) for d in data_dirs]
+        self.tmpdir = tempfile.mkdtemp()
+        self.catalog = Fast5Catalog(os.path.join(self.tmpdir, "catalog.sqlite"))
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_refresh_only_scans_new_files(self):
+        nfound, nscanned = self.catalog.refresh(self.dirs)
+        self.assertEqual(nfound, nscanned)
+        nfound, nscanned = self.catalog.refresh(self.dirs)
+        self.assertEqual(nscanned, 0)
+
+    def test_filter_matches_hdf5_filter(self):
+        self.catalog.refresh(self.dirs)
+        expected = [f5.filename for f5 in Fast5List(self.dirs) if f5.has_read("template") and f5.get_seq_len("template") >= 3000]
+        f5list = self.catalog.filter_fast5list(Fast5List(self.dirs), "template", minlen=3000)
+        self.assertEqual([f5.filename for f5 in f5list], expected)
+
+    def test_multi_read_file_rows(self):
+        singles = [os.path.join(d, "example.fast5") for d in self.dirs]
+        multi = os.path.join(self.tmpdir, "multi.fast5")
+        out = h5py.File(multi, "w")
+        for i, fname in enumerate(singles):
+            src = h5py.File(fname, "r")
+            for key in src.keys():
+                if key == "UniqueGlobalKey":
+                    for sub in src[key].keys():
+                        src.copy(key + "/" + sub, out, name="read_%d/%s" % (i, sub))
+                else:
+                    src.copy(key, out, name="read_%d/%s" % (i, key))
+            src.close()
+        out.close()
+        nfound, nscanned = self.catalog.refresh([multi])
+        self.assertEqual((nfound, nscanned), (1, 1))
+        self.assertEqual(self.catalog.refresh([multi]), (1, 0))
+        n_reads = self.catalog.db.execute("SELECT count(*) FROM reads WHERE container IS NOT NULL").fetchone()[0]
+        self.assertEqual(n_reads, len(singles))
+        self.assertEqual(self.catalog.get_passing_keys("template"), set([os.path.abspath(multi)]))
+        self.assertEqual(self.catalog.get_passing_keys("template", minlen=int(1e9)), set())
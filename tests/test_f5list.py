@@ -0,0 +1,205 @@
+import glob
+import os
+import h5py
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from fast5tools import f5class
+from fast5tools.f5class import Fast5, Fast5List, Fast5TarIndex, MultiFast5, TAR_INDEX_SUFFIX
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06"]
+
+
+def get_filename(f5):
+    return f5.filename
+
+def get_template_seq(f5):
+    return f5.get_seq("template")
+
+
+class TestFast5List(unittest.TestCase):
+
+    def setUp(self):
+        self.dirs = [os.path.join(data_path, d) for d in data_dirs]
+
+    def test_imap_serial_matches_iteration(self):
+        expected = [f5.filename for f5 in Fast5List(self.dirs)]
+        self.assertEqual(list(Fast5List(self.dirs).imap(get_filename, processes=1)), expected)
+
+    def test_imap_ordered(self):
+        expected = [f5.filename for f5 in Fast5List(self.dirs)]
+        self.assertEqual(list(Fast5List(self.dirs).imap(get_filename, processes=2)), expected)
+
+    def test_imap_unordered(self):
+        expected = [f5.filename for f5 in Fast5List(self.dirs)]
+        found = list(Fast5List(self.dirs).imap(get_filename, processes=2, ordered=False, chunksize=2))
+        self.assertEqual(sorted(found), sorted(expected))
+
+    def test_layout_cache_matches_probing(self):
+        filenames = sorted(glob.glob(os.path.join(data_path, "*", "*.fast5")))
+        cached = [Fast5(fname) for fname in filenames]
+        for fname, f5 in zip(filenames, cached):
+            f5class._LAYOUT_CACHE.clear()
+            probed = Fast5(fname)
+            if probed.is_open:
+                for attr in f5class.LAYOUT_ATTRS + ("_has_read",):
+                    self.assertEqual(getattr(f5, attr), getattr(probed, attr))
+            probed.close()
+            f5.close()
+
+    def test_summary_attrs_match_file(self):
+        for f5 in Fast5List(self.dirs):
+            for readtype in ("template", "complement", "2d"):
+                if f5.has_read(readtype):
+                    attrs = f5.f5[f5._get_attr_path(readtype)].attrs
+                    self.assertEqual(f5.get_seq_len(readtype), attrs["sequence_length"])
+                    self.assertEqual(f5.get_mean_qscore(readtype), attrs["mean_qscore"])
+                    self.assertEqual(sorted(f5.get_summary(readtype)), sorted(attrs.keys()))
+                    self.assertTrue(f5.get_summary(readtype) is f5.get_summary(readtype))
+
+    def test_lazy_fast5_opens_on_first_use(self):
+        filenames = sorted(glob.glob(os.path.join(data_path, "*", "*.fast5")))
+        for fname in filenames:
+            eager = Fast5(fname)
+            with Fast5(fname, lazy=True) as lazy:
+                self.assertEqual(lazy.filebasename, eager.filebasename)
+                self.assertFalse("f5" in lazy.__dict__)
+                self.assertEqual(lazy.is_not_corrupt(), eager.is_not_corrupt())
+                if eager.is_open:
+                    self.assertEqual(lazy._has_read, eager._has_read)
+                    self.assertEqual(lazy.get_seq("template"), eager.get_seq("template"))
+            if eager.is_open:
+                self.assertFalse(lazy.f5.id.valid)
+            eager.close()
+        unopened = Fast5(filenames[0], lazy=True)
+        unopened.close()
+        self.assertFalse("f5" in unopened.__dict__)
+        self.assertEqual([str(f5) for f5 in Fast5List(self.dirs, lazy_fast5=True)], Fast5List(self.dirs).get_filenames())
+
+    def test_lazy_matches_eager(self):
+        eager = Fast5List(self.dirs)
+        lazy = Fast5List(self.dirs, lazy=True)
+        self.assertEqual(lazy.files, None)
+        self.assertEqual([f5.filename for f5 in lazy], [f5.filename for f5 in eager])
+        lazy = Fast5List(self.dirs, lazy=True)
+        self.assertEqual(len(lazy), len(eager))
+        self.assertEqual(lazy.files, None)
+        self.assertEqual(lazy.get_filenames(), eager.get_filenames())
+
+    def test_random_downsample_lazy_matches_eager(self):
+        eager = [f5.filename for f5 in Fast5List(self.dirs, downsample=3, random=True, randomseed=11)]
+        lazy = Fast5List(self.dirs, downsample=3, random=True, randomseed=11, lazy=True)
+        self.assertEqual(lazy.files, None)
+        self.assertEqual([f5.filename for f5 in lazy], eager)
+        self.assertEqual(len(eager), 3)
+        self.assertEqual(eager, sorted(eager))
+
+    def test_get_sample_lazy(self):
+        allfiles = Fast5List(self.dirs).get_filenames()
+        for random in (False, True):
+            lazy = Fast5List(self.dirs, lazy=True)
+            sample = [f5.filename for f5 in lazy.get_sample(n=3, random=random)]
+            self.assertEqual(lazy.files, None) ## sampled in one pass, without building the file list
+            self.assertEqual(len(sample), 3)
+            self.assertEqual(sample, sorted(sample))
+            self.assertTrue(set(sample) <= set(allfiles))
+        self.assertEqual([f5.filename for f5 in Fast5List(self.dirs, lazy=True).get_sample(n=3)], sorted(allfiles[:3]))
+
+    def test_lazy_fofn(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fofn = os.path.join(tmpdir, "files.fofn")
+            f = open(fofn, "w")
+            f.write("\n".join(self.dirs) + "\n")
+            f.close()
+            expected = Fast5List(self.dirs).get_filenames()
+            self.assertEqual([f5.filename for f5 in Fast5List(fofn, lazy=True)], expected)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_tar_members_read_in_memory(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            tarball = os.path.join(tmpdir, "run.tar.gz")
+            tar = tarfile.open(tarball, "w:gz")
+            for d in self.dirs:
+                tar.add(os.path.join(d, "example.fast5"), arcname=os.path.basename(d) + ".fast5")
+            tar.close()
+            expected = [get_template_seq(f5) for f5 in Fast5List([os.path.join(d, "example.fast5") for d in self.dirs])]
+            f5list = Fast5List(tarball)
+            self.assertTrue(f5list.tar_in_memory)
+            self.assertEqual(sorted(get_template_seq(f5) for f5 in f5list), sorted(expected))
+            self.assertEqual(f5list.F5_TMP_DIR, None)
+            self.assertEqual(sorted(Fast5List(tarball).imap(get_template_seq, processes=2)), sorted(expected))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_tar_index_random_access(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            tarball = os.path.join(tmpdir, "run.tar")
+            tar = tarfile.open(tarball, "w")
+            for d in self.dirs:
+                tar.add(os.path.join(d, "example.fast5"), arcname=os.path.basename(d) + ".fast5")
+            tar.close()
+            index = Fast5TarIndex(tarball)
+            self.assertTrue(os.path.exists(tarball + TAR_INDEX_SUFFIX))
+            tar = tarfile.open(tarball)
+            self.assertEqual(index.getnames(), tar.getnames())
+            for name in tar.getnames():
+                self.assertEqual(index.extractfile(name).read(), tar.extractfile(name).read())
+            tar.close()
+            self.assertEqual(Fast5TarIndex(tarball).members, index.members)
+            index.close()
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["run.tar", "run.tar" + TAR_INDEX_SUFFIX])
+            ## truncated sidecars (valid stamp) are rebuilt, not trusted
+            lines = open(tarball + TAR_INDEX_SUFFIX).readlines()
+            for truncated in ("".join(lines[:3]), "".join(lines[:3]) + lines[3][:5]):
+                open(tarball + TAR_INDEX_SUFFIX, 'w').write(truncated)
+                self.assertEqual(Fast5TarIndex(tarball).members, index.members)
+                self.assertEqual(open(tarball + TAR_INDEX_SUFFIX).readlines(), lines)
+            expected = sorted(get_template_seq(f5) for f5 in Fast5List([os.path.join(d, "example.fast5") for d in self.dirs]))
+            self.assertEqual(sorted(get_template_seq(f5) for f5 in Fast5List(tarball)), expected)
+            sample = [get_template_seq(f5) for f5 in Fast5List(tarball, downsample=3, random=True, randomseed=7)]
+            self.assertEqual(len(sample), 3)
+            self.assertTrue(set(sample) <= set(expected))
+            self.assertEqual(len([get_template_seq(f5) for f5 in Fast5List(tarball).get_sample(n=2, random=True)]), 2)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_multi_read_files_are_expanded(self):
+        singles = [os.path.join(d, "example.fast5") for d in self.dirs] + [os.path.join(data_path, "t005", "example.fast5")]
+        tmpdir = tempfile.mkdtemp()
+        try:
+            multi = os.path.join(tmpdir, "multi.fast5")
+            out = h5py.File(multi, "w")
+            for i, fname in enumerate(singles):
+                read = "read_%d" % i
+                src = h5py.File(fname, "r")
+                for key in src.keys():
+                    if key == "UniqueGlobalKey":
+                        for sub in src[key].keys():
+                            src.copy(key + "/" + sub, out, name=read + "/" + sub)
+                    elif key == "Raw":
+                        src.copy("Raw/Reads/" + src["Raw/Reads"].keys()[0], out, name=read + "/Raw")
+                    else:
+                        src.copy(key, out, name=read + "/" + key)
+                src.close()
+            out.close()
+            expected = [(f5.get_seq("template"), f5.get_channel_number(), f5.get_run_id(), f5.get_read_number()) for f5 in Fast5List(singles)]
+            container = MultiFast5(multi)
+            self.assertEqual(len(container), len(singles))
+            self.assertEqual([(f5.get_seq("template"), f5.get_channel_number(), f5.get_run_id(), f5.get_read_number()) for f5 in container], expected)
+            raw = list(container)[-1].get_raw_signal()
+            container.close()
+            t005 = Fast5(singles[-1])
+            self.assertTrue((raw == t005.get_raw_signal()).all())
+            t005.close()
+            self.assertEqual([get_template_seq(f5) for f5 in Fast5List(tmpdir)], [e[0] for e in expected])
+            self.assertEqual(list(Fast5List(tmpdir).imap(get_template_seq, processes=2)), [e[0] for e in expected])
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from fast5tools.f5class import Fast5, Fast5List, MultiFast5
+from fast5tools.f5multiops import repack_to_multi_read, split_to_single_read, write_multi_read_file, split_multi_read_file
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06", "t005"]
+
+
+def get_read_info(f5):
+    return (f5.get_seq("template"), f5.get_channel_number(), f5.get_run_id(), f5.get_read_number(), f5.get_file_version())
+
+
+class TestRepack(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        ## unique basenames, so split files can be matched back to their originals
+        self.files = []
+        for d in data_dirs:
+            self.files.append(os.path.join(self.tmpdir, d + ".fast5"))
+            os.symlink(os.path.abspath(os.path.join(data_path, d, "example.fast5")), self.files[-1])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_repack_and_split(self):
+        expected = [get_read_info(f5) for f5 in Fast5List(self.files)]
+        for compression, processes in ((None, 1), ("gzip", 2)):
+            multidir = os.path.join(self.tmpdir, "multi_" + str(compression))
+            singledir = os.path.join(self.tmpdir, "single_" + str(compression))
+            os.mkdir(multidir)
+            os.mkdir(singledir)
+            written = list(repack_to_multi_read(self.files, multidir, reads_per_file=3, processes=processes, compression=compression))
+            self.assertEqual([n for filename, n in written], [3, 3, 1])
+            ## reads come back in read group (read_id) order
+            self.assertEqual(sorted(get_read_info(f5) for f5 in Fast5List(multidir)), sorted(expected))
+            container = MultiFast5(written[-1][0])
+            raw = list(container)[0].get_raw_signal()
+            container.close()
+            t005 = Fast5(self.files[-1])
+            self.assertTrue((raw == t005.get_raw_signal()).all())
+            t005.close()
+            self.assertEqual(sum(n for filename, n in split_to_single_read(multidir, singledir, processes=processes)), len(self.files))
+            for fname, info in zip(self.files, expected):
+                split = Fast5(os.path.join(singledir, os.path.basename(fname)))
+                original = Fast5(fname)
+                self.assertEqual(split.get_all_attributes(), original.get_all_attributes())
+                self.assertEqual(get_read_info(split), info)
+                split.close()
+                original.close()
+
+    def test_split_same_basenames(self):
+        ## rundata/*/example.fast5 all share one basename: none may overwrite another
+        files = [os.path.join(data_path, d, "example.fast5") for d in data_dirs]
+        expected = sorted(get_read_info(f5) for f5 in Fast5List(files))
+        multiname = os.path.join(self.tmpdir, "multi.fast5")
+        self.assertEqual(write_multi_read_file(multiname, files), len(files))
+        singledir = os.path.join(self.tmpdir, "single")
+        os.mkdir(singledir)
+        written = split_multi_read_file(multiname, singledir)
+        self.assertEqual(len(set(written)), len(files))
+        self.assertEqual(sorted(os.path.join(singledir, f) for f in os.listdir(singledir)), sorted(written))
+        self.assertTrue(os.path.join(singledir, "example.fast5") in written)
+        self.assertEqual(sorted(get_read_info(f5) for f5 in Fast5List(written)), expected)
+        ## splitting again into the same outdir keeps the earlier files
+        again = split_multi_read_file(multiname, singledir)
+        self.assertEqual(len(set(written + again)), 2*len(files))
+        self.assertEqual(len(os.listdir(singledir)), 2*len(files))
@@ -0,0 +1,172 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import cStringIO as StringIO
+
+import h5py
+
+import numpy as np
+
+from fast5tools.f5class import Fast5, Fast5List, MultiFast5, segment_stats, simulate_signal, write_delimited
+from fast5tools.f5multiops import write_multi_read_file
+from fast5tools.f5ops import add_simulated_raw_data
+
+
+raw_fast5 = "rundata/t007-flomin107-sqklsk308-r95-450bps/examp1.fast5"
+
+
+class TestRawSegmentation(unittest.TestCase):
+
+    def setUp(self):
+        self.f5 = Fast5(raw_fast5)
+
+    def tearDown(self):
+        self.f5.close()
+
+    def test_segment_stats_matches_numpy(self):
+        signal = np.array([3, 5, 7, 1, 1, 2, 9, 4], dtype=np.int16)
+        offsets = [0, 3, 3, 5, 8]
+        mean, stdv, lengths = segment_stats(signal, offsets)
+        self.assertEqual(lengths.tolist(), [3, 0, 2, 3])
+        for i in (0, 2, 3):
+            seg = signal[offsets[i]:offsets[i+1]]
+            self.assertAlmostEqual(mean[i], seg.mean())
+            self.assertAlmostEqual(stdv[i], seg.std())
+        self.assertTrue(np.isnan(mean[1]) and np.isnan(stdv[1]))
+
+    def test_arrays_match_segmented_dict(self):
+        for median_normalized in (False, True):
+            rawseg = self.f5.get_segmented_raw_signal(median_normalized=median_normalized)
+            raw, offsets = self.f5.get_segmented_raw_signal_arrays(median_normalized=median_normalized)
+            self.assertEqual(len(offsets), len(rawseg) + 1)
+            self.assertTrue((raw[offsets[0]:offsets[1]] == rawseg['5primeclip']).all())
+            self.assertTrue((raw[offsets[-2]:offsets[-1]] == rawseg['3primeclip']).all())
+            for i in range(len(rawseg) - 2):
+                self.assertTrue((raw[offsets[i+1]:offsets[i+2]] == rawseg[i]).all())
+
+    def test_stats_match_per_event(self):
+        stats = self.f5.get_segmented_raw_signal_stats()
+        rawseg = self.f5.get_segmented_raw_signal()
+        start = 0
+        for name, mean, stdv, evstart, length in stats:
+            seg = rawseg[name]
+            self.assertEqual((evstart, length), (start, len(seg)))
+            self.assertTrue(np.isclose(mean, seg.mean(), rtol=1e-12))
+            self.assertTrue(np.isclose(stdv, seg.std(), rtol=1e-12))
+            start += length
+
+
+class TestWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.f5 = Fast5(raw_fast5)
+
+    def tearDown(self):
+        self.f5.close()
+
+    def test_write_delimited_chunks(self):
+        columns = [np.arange(7, dtype=np.uint64), np.linspace(0, 1, 7).astype(np.float32), np.array(list("abcdefg"))]
+        expected = "\n".join("\t".join(str(col[i]) for col in columns) for i in range(7))
+        for chunksize in (1, 3, 7, 100):
+            out = StringIO.StringIO()
+            write_delimited(out, columns, chunksize=chunksize)
+            self.assertEqual(out.getvalue(), expected)
+
+    def test_strings_match_per_value_formatting(self):
+        events = self.f5.get_events("template")
+        self.assertEqual(self.f5.get_events_string("template"), "\n".join("\t".join(str(f) for f in e) for e in events))
+        for median_normalized in (False, True):
+            raw = self.f5.get_raw_signal(median_normalized)
+            self.assertEqual(self.f5.get_raw_signal_string(" ", median_normalized), " ".join(str(e) for e in raw))
+        rawseg = self.f5.get_segmented_raw_signal()
+        segments = [rawseg['5primeclip']] + [rawseg[i] for i in range(len(rawseg) - 2)] + [rawseg['3primeclip']]
+        expected = "|".join(",".join(str(e) for e in seg) for seg in segments)
+        self.assertEqual(self.f5.get_segmented_raw_signal_string(datadelim=",", eventdelim="|"), expected)
+        expected = "\n".join("\t".join(str(e) for e in event) for event in self.f5.get_segmented_raw_signal_stats())
+        self.assertEqual(self.f5.get_segmented_raw_signal_stats_string(), expected)
+
+
+class TestRawAccess(unittest.TestCase):
+
+    def setUp(self):
+        self.f5 = Fast5(raw_fast5)
+        self.raw = self.f5.get_raw_signal()
+
+    def tearDown(self):
+        self.f5.close()
+
+    def test_read_raw_signal_into_buffer(self):
+        buf = np.zeros(len(self.raw) + 10, dtype=np.int16)
+        signal = self.f5.read_raw_signal(buf)
+        self.assertTrue(signal.base is buf)
+        self.assertTrue((signal == self.raw).all())
+        self.assertTrue((self.f5.read_raw_signal(buf, 100, 200) == self.raw[100:200]).all())
+        self.assertTrue((self.f5.read_raw_signal() == self.raw).all())
+        self.assertRaises(ValueError, self.f5.read_raw_signal, buf[:10])
+
+    def test_iter_raw_windows(self):
+        windows = list(self.f5.iter_raw_windows(1000, blocksize=2500))
+        self.assertEqual([s for s, w in windows], range(0, len(self.raw), 1000))
+        self.assertTrue((np.concatenate([w for s, w in windows]) == self.raw).all())
+        for start, window in self.f5.iter_raw_windows(300, step=200, start=50, end=5000, blocksize=700):
+            self.assertTrue((window == self.raw[start:min(start + 300, 5000)]).all())
+
+    def test_memmap_only_for_contiguous_signal(self):
+        self.assertFalse(isinstance(self.f5.get_raw_signal_memmap(), np.memmap))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "contiguous.fast5")
+            shutil.copy(raw_fast5, filename)
+            h5 = h5py.File(filename, "r+")
+            path = self.f5.get_raw_signal_path()
+            del h5[path]
+            h5.create_dataset(path, data=self.raw)
+            h5.close()
+            f5 = Fast5(filename)
+            signal = f5.get_raw_signal_memmap()
+            self.assertTrue(isinstance(signal, np.memmap))
+            self.assertTrue((signal == self.raw).all())
+            f5.close()
+            ## reads of a multi-read file held in memory (e.g. a tar member) cannot be mapped: read in instead
+            multiname = os.path.join(tmpdir, "multi.fast5")
+            write_multi_read_file(multiname, [filename])
+            multi = MultiFast5(multiname, fileobj=io.BytesIO(open(multiname, 'rb').read()))
+            read = list(multi)[0]
+            self.assertEqual(read.fileobj, None)
+            signal = read.get_raw_signal_memmap()
+            self.assertFalse(isinstance(signal, np.memmap))
+            self.assertTrue((signal == self.raw).all())
+            multi.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestSimulation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name, fast5 in (("sim.fast5", "rundata/01/example.fast5"), ("raw.fast5", raw_fast5)):
+            shutil.copy(fast5, os.path.join(self.tmpdir, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_simulate_signal(self):
+        means = np.array([10.0, 50.0, 90.0])
+        lengths = np.array([4000, 0, 3000])
+        signal = simulate_signal(means, np.array([1.0, 1.0, 2.0]), lengths, dtype='float64', rng=3)
+        self.assertEqual(len(signal), 7000)
+        self.assertTrue(abs(signal[:4000].mean() - 10) < 0.1 and abs(signal[4000:].std() - 2) < 0.1)
+        self.assertTrue((simulate_signal(means, means/10, lengths, rng=3) == simulate_signal(means, means/10, lengths, rng=3)).all())
+
+    def test_batch_reports_skips(self):
+        results = dict(add_simulated_raw_data(Fast5List([self.tmpdir], filemode='r+'), force=True, seed=1))
+        self.assertEqual(results[os.path.join(self.tmpdir, "sim.fast5")], None)
+        self.assertEqual(results[os.path.join(self.tmpdir, "raw.fast5")], "raw signal already exists")
+        f5 = Fast5(os.path.join(self.tmpdir, "sim.fast5"))
+        signal = f5.get_raw_signal_dataset()
+        self.assertEqual(signal.compression, "gzip")
+        self.assertEqual(len(signal), f5.simulate_raw_data_from_events(rng=0).shape[0])
+        f5.close()
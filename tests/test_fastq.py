@@ -0,0 +1,33 @@
+import os
+import unittest
+import cStringIO as StringIO
+
+from Bio import SeqIO
+
+from fast5tools.f5class import Fast5List, split_fastq, phred_to_int
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06"]
+
+
+class TestFastqParsing(unittest.TestCase):
+
+    def setUp(self):
+        self.dirs = [os.path.join(data_path, d) for d in data_dirs]
+
+    def test_split_fastq(self):
+        self.assertEqual(split_fastq("@read1 x\nACGT\n+\n!#+I\n"), ("read1 x", "ACGT", "+", "!#+I"))
+        self.assertEqual(phred_to_int("!#+I").tolist(), [0, 2, 10, 40])
+        self.assertRaises(ValueError, split_fastq, "@read1\nACGT\n+\n")
+        self.assertRaises(ValueError, split_fastq, "@read1\nACGT\n+\n!!!!\n@read2")
+
+    def test_int_quals_match_biopython(self):
+        for f5 in Fast5List(self.dirs):
+            for readtype in ("template", "complement", "2d"):
+                if f5.has_read(readtype):
+                    name = f5._get_pore_info_name(readtype)
+                    quals = StringIO.StringIO()
+                    SeqIO.convert(StringIO.StringIO(f5.get_fastq(readtype, name=name)), "fastq", quals, "qual")
+                    self.assertEqual(f5.get_quals_as_int(readtype), quals.getvalue().rstrip())
+                    self.assertEqual(f5.get_int_quals(readtype).tolist(), [ord(q) - 33 for q in f5.quals[readtype]])
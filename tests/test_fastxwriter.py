@@ -0,0 +1,91 @@
+import gzip
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from fast5tools.fastxwriterclass import FastxWriter, ShardedFastxWriter, BGZF_EOF
+
+
+records = [">read%d\n%s" % (i, "ACGT" * (i % 50 + 1)) for i in range(5000)]
+expected = "".join(record + "\n" for record in records)
+
+
+def read_bgzf_block_sizes(filename):
+    ## total sizes of the BGZF blocks of filename, from their BC extra fields
+    sizes = []
+    with open(filename, 'rb') as fh:
+        data = fh.read()
+    offset = 0
+    while offset < len(data):
+        bsize = struct.unpack("<H", data[offset+16:offset+18])[0] + 1
+        sizes.append(bsize)
+        offset += bsize
+    return sizes
+
+
+class TestFastxWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_compression_round_trip(self):
+        for compression in (None, 'gzip', 'bgzip'):
+            for threads in (1, 3):
+                filename = os.path.join(self.tmpdir, "reads.fa")
+                with FastxWriter(filename, compression=compression, buffersize=10000, threads=threads) as writer:
+                    for record in records:
+                        writer.write(record)
+                opener = open if compression is None else gzip.open
+                self.assertEqual(opener(filename).read(), expected)
+
+    def test_bgzf_blocks(self):
+        filename = os.path.join(self.tmpdir, "reads.fa.gz")
+        with FastxWriter(filename, compression='bgzip', buffersize=200000, threads=2) as writer:
+            for record in records:
+                writer.write(record)
+        sizes = read_bgzf_block_sizes(filename)
+        self.assertEqual(sum(sizes), os.path.getsize(filename))
+        self.assertTrue(len(sizes) > 2)
+        self.assertTrue(open(filename, 'rb').read().endswith(BGZF_EOF))
+
+    def test_round_robin_shards(self):
+        prefix = os.path.join(self.tmpdir, "reads")
+        with ShardedFastxWriter(prefix, ".fasta.gz", nshards=3, compression='gzip', buffersize=10000, threads=2) as writer:
+            for record in records:
+                writer.write(record)
+            filenames = writer.get_filenames()
+        self.assertEqual(sorted(filenames.values()), [prefix + "." + str(i) + ".fasta.gz" for i in range(3)])
+        for i in range(3):
+            self.assertEqual(gzip.open(filenames[i]).read(), "".join(record + "\n" for record in records[i::3]))
+
+    def test_keyed_shards(self):
+        prefix = os.path.join(self.tmpdir, "reads")
+        with ShardedFastxWriter(prefix, ".fasta") as writer:
+            for i, record in enumerate(records):
+                writer.write(record, key=i % 7)
+            filenames = writer.get_filenames()
+        self.assertEqual(sorted(filenames), range(7))
+        self.assertEqual(open(filenames[5]).read(), "".join(record + "\n" for record in records[5::7]))
+
+    def test_max_open_shards(self):
+        prefix = os.path.join(self.tmpdir, "reads")
+        for compression in (None, 'gzip', 'bgzip'):
+            with ShardedFastxWriter(prefix, ".fasta", compression=compression, buffersize=1000, threads=2, maxopen=3) as writer:
+                for i, record in enumerate(records):
+                    writer.write(record, key=i % 7)
+                    self.assertTrue(sum(not w.is_suspended() for w in writer.writers.values()) <= 3)
+                filenames = writer.get_filenames()
+            opener = open if compression is None else gzip.open
+            for key in range(7):
+                self.assertEqual(opener(filenames[key]).read(), "".join(record + "\n" for record in records[key::7]))
+                if compression == 'bgzip':
+                    ## suspending does not end the file: one EOF block, at the end
+                    data = open(filenames[key], 'rb').read()
+                    self.assertEqual(data.count(BGZF_EOF), 1)
+                    self.assertTrue(data.endswith(BGZF_EOF))
+                    self.assertEqual(sum(read_bgzf_block_sizes(filenames[key])), len(data))
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from fast5tools.f5class import Fast5
+from fast5tools.normops import median_mad, median_normalize, normalize, StreamingMedianMAD
+
+
+raw_fast5 = "rundata/t007-flomin107-sqklsk308-r95-450bps/examp1.fast5"
+
+
+def numpy_median_mad(values):
+    med = np.median(values)
+    absdiffs = np.absolute(values - med)
+    mad = np.median(absdiffs)
+    if mad == 0:
+        mad = np.mean(absdiffs)
+    return med, mad
+
+
+class TestNormOps(unittest.TestCase):
+
+    def test_median_mad_matches_numpy(self):
+        rng = np.random.RandomState(7)
+        for values in (rng.randint(200, 900, 1001), rng.normal(size=1000), np.array([5, 5, 5, 5, 9])):
+            self.assertEqual(median_mad(values), numpy_median_mad(values))
+            z, med, mad = median_normalize(values)
+            self.assertTrue(np.allclose(z, (values - med)/mad))
+        values = rng.normal(size=100)
+        copy = values.copy()
+        median_mad(values)
+        self.assertTrue((values == copy).all())
+        self.assertEqual(normalize(values, 1.0, 2.0).dtype, np.float32)
+
+    def test_streaming_matches_in_memory(self):
+        rng = np.random.RandomState(11)
+        values = rng.randint(-50, 1200, 10001).astype(np.int16)
+        stream = StreamingMedianMAD()
+        for start in range(0, len(values), 777):
+            stream.update(values[start:start+777])
+        self.assertEqual(stream.median_mad(), numpy_median_mad(values))
+        floats = rng.normal(100, 10, 5000)
+        stream = StreamingMedianMAD(binwidth=0.01)
+        stream.update(floats[:2500])
+        stream.update(floats[2500:])
+        for approx, exact in zip(stream.median_mad(), numpy_median_mad(floats)):
+            self.assertTrue(abs(approx - exact) <= 0.01)
+
+    def test_fast5_raw_normalization(self):
+        f5 = Fast5(raw_fast5)
+        raw = f5.get_raw_signal()
+        med, mad = numpy_median_mad(raw)
+        self.assertEqual(f5.get_raw_median_mad(blocksize=1000), (med, mad))
+        self.assertTrue(f5.get_raw_median_mad() is f5.get_raw_median_mad())
+        self.assertTrue((f5.get_raw_signal(median_normalized=True) == 100.0*raw/np.median(raw)).all())
+        z = f5.get_normalized_raw_signal()
+        self.assertEqual(z.dtype, np.float32)
+        self.assertTrue(np.allclose(z, (raw - med)/mad, atol=1e-5))
+        f5.close()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import cStringIO as StringIO
+
+from fast5tools.f5class import Fast5List
+from fast5tools.cigarops import read_to_reference_map, project_read_positions
+from fast5tools.samf5class import build_fast5_read_index, Fast5ReadIndex, SamFast5Join, write_events_to_reference
+
+
+data_path = "rundata"
+data_dirs = ["01", "02", "03", "04", "05", "06"]
+
+
+class AlignedRecord(object):
+    ## the parts of samclass.SamRecord SamFast5Join looks at (samclass needs pybedtools/pandas)
+    def __init__(self, qname):
+        self.qname = qname
+
+    def is_aligned(self):
+        return True
+
+    def get_qname_field(self):
+        return self.qname
+
+
+class TestCigarOps(unittest.TestCase):
+
+    def test_read_to_reference_map(self):
+        refmap = read_to_reference_map("2H3S4M1I2D3M", 100)
+        self.assertEqual(refmap.tolist(), [-1]*5 + [99, 100, 101, 102, -1, 105, 106, 107])
+        self.assertEqual(read_to_reference_map("2H3S4M1I2D3M", 100, reverse=True).tolist(), refmap[::-1].tolist())
+        self.assertEqual(project_read_positions(refmap, [5, 9, 12, 13, -1]).tolist(), [99, -1, 107, -1, -1])
+
+
+class TestFast5ReadIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "reads.index")
+        self.paths = [os.path.join(data_path, d) for d in data_dirs]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_lookups(self):
+        build_fast5_read_index(Fast5List(self.paths), self.filename, chunksize=2)
+        expected = dict((f5.get_pore_info_name("template"), f5.abspath) for f5 in Fast5List(self.paths) if f5.has_read("template"))
+        with Fast5ReadIndex(self.filename) as index:
+            for name, abspath in expected.items():
+                self.assertEqual(index.get(name), (abspath, None))
+                f5 = index.open_fast5(name)
+                self.assertEqual(f5.get_pore_info_name("template"), name)
+                f5.close()
+            self.assertFalse("" in index)
+            self.assertFalse(max(expected) + "x" in index)
+            self.assertEqual(index.open_fast5("not_a_read"), None)
+
+    def test_stale_entries_are_missing(self):
+        build_fast5_read_index(Fast5List(self.paths), self.filename)
+        with open(self.filename, 'a') as fh:
+            fh.write("~stale1\t" + os.path.join(self.tmpdir, "removed.fast5") + "\t.\n")
+            fh.write("~stale2\t" + os.path.abspath(self.filename) + "\t.\n") ## exists, but not a fast5
+        records = [AlignedRecord(name) for name in ("~stale1", "~stale2")]
+        with Fast5ReadIndex(self.filename) as index:
+            self.assertEqual(index.open_fast5("~stale1"), None)
+            self.assertEqual(index.open_fast5("~stale2"), None)
+            join = SamFast5Join(records, index)
+            out = StringIO.StringIO()
+            write_events_to_reference(out, join)
+            self.assertEqual(out.getvalue(), "")
+            self.assertEqual(join.missing, 2)
+
+    def test_tar_members_skipped(self):
+        tarball = os.path.join(self.tmpdir, "run.tar.gz")
+        tar = tarfile.open(tarball, "w:gz")
+        tar.add(os.path.join(self.paths[0], "example.fast5"), arcname="example.fast5")
+        tar.close()
+        build_fast5_read_index(Fast5List([tarball, self.paths[1]]), self.filename)
+        paths = [line.split("\t")[1] for line in open(self.filename)]
+        self.assertTrue(len(paths) > 0)
+        self.assertTrue(all(os.path.isfile(path) for path in paths))
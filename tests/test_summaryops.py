@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from fast5tools.summaryops import sort_lengths, nx_lx, expected_size, n_and_sum_gt, n_ge
+from fast5tools.f5tableops import NX, e_size
+
+
+class TestSummaryOps(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        self.lengths = rng.randint(1, 50000, size=2000).astype(float)
+        self.lengths[rng.rand(2000) < 0.05] = np.nan
+        self.quals = rng.rand(2000) * 15
+        self.quals[rng.rand(2000) < 0.05] = np.nan
+        self.clean = sorted(l for l in self.lengths.tolist() if not np.isnan(l))
+
+    def test_sort_lengths(self):
+        lengths, quals = sort_lengths(self.lengths, self.quals)
+        self.assertEqual(lengths.tolist(), self.clean)
+        pairs = sorted([(l, q) for l, q in zip(self.lengths.tolist(), self.quals.tolist()) if not np.isnan(l)], key=lambda p: p[0])
+        np.testing.assert_array_equal(quals, [q for l, q in pairs])
+
+    def test_nx_lx_matches_nx(self):
+        x = [10, 25, 50, 75, 90, 100]
+        G = sum(self.clean)
+        nxvalues, lxvalues = nx_lx(sort_lengths(self.lengths), x, G=G)
+        self.assertEqual(nxvalues, NX(self.clean, x, G=G))
+        for e in x:
+            self.assertTrue(sum(self.clean[-lxvalues[e]:]) >= G*e/100.0)
+            self.assertTrue(sum(self.clean[-lxvalues[e]+1:]) < G*e/100.0 or lxvalues[e] == 1)
+        self.assertEqual(nx_lx(sort_lengths(self.lengths), x, G=0), None)
+
+    def test_expected_size(self):
+        G = sum(self.clean)
+        self.assertAlmostEqual(expected_size(sort_lengths(self.lengths), G=G), e_size(self.clean, G=G))
+        self.assertAlmostEqual(expected_size(self.clean), e_size(self.clean, G=G))
+
+    def test_counts_and_sums(self):
+        lengths = sort_lengths(self.lengths)
+        cumsum = np.cumsum(lengths)
+        for size in (0, 1, 999, 10000, 25000, 49998, 50000, 1e6):
+            n, total = n_and_sum_gt(lengths, cumsum, size)
+            self.assertEqual(n, sum(l > size for l in self.clean))
+            self.assertEqual(total, sum(l for l in self.clean if l > size))
+            self.assertEqual(n_ge(lengths, size), sum(l >= size for l in self.clean))